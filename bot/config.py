@@ -38,6 +38,55 @@ class Config:
         "/Users/Apple/telegram-bot-api/build/telegram-bot-api"
     )
 
+    # Кеш плейлистів uakino: зберігати також у MongoDB (переживає перезапуск)
+    PLAYLIST_CACHE_MONGO = os.getenv("PLAYLIST_CACHE_MONGO", "1") == "1"
+
+    # Максимальна висота відео при виборі HLS-варіанту (0 — без обмеження, за замовчуванням)
+    MAX_VIDEO_HEIGHT = {
+        "movie": int(os.getenv("MAX_HEIGHT_MOVIE", "0")),
+        "series": int(os.getenv("MAX_HEIGHT_SERIES", "0")),
+        "anime_movie": int(os.getenv("MAX_HEIGHT_ANIME_MOVIE", "0")),
+        "anime_series": int(os.getenv("MAX_HEIGHT_ANIME_SERIES", "0")),
+    }
+
+    # Кількість паралельних завантажень HLS-сегментів на один файл
+    HLS_SEGMENT_CONCURRENCY = int(os.getenv("HLS_SEGMENT_CONCURRENCY", "8"))
+
+    # Кількість паралельних процесів libx264 при стисканні (0 = кількість ядер)
+    ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "0"))
+
+    # Що робити з фільмом більшим за ліміт Telegram:
+    # "compress" — перекодувати, "split" — розрізати без перекодування на частини
+    OVERSIZE_MODE = os.getenv("OVERSIZE_MODE", "compress")
+
+    # Глобальний пул медіа-задач (ffmpeg): одночасні завантаження/ремукси та перекодування
+    MEDIA_REMUX_SLOTS = int(os.getenv("MEDIA_REMUX_SLOTS", "2"))
+    MEDIA_ENCODE_SLOTS = int(os.getenv("MEDIA_ENCODE_SLOTS", "1"))
+    # Нова задача чекає, поки на диску менше ніж стільки ГБ
+    MEDIA_MIN_FREE_GB = float(os.getenv("MEDIA_MIN_FREE_GB", "5"))
+    # Перекодування чекає, поки loadavg на ядро вище цього значення
+    MEDIA_MAX_LOAD = float(os.getenv("MEDIA_MAX_LOAD", "1.5"))
+    # Пріоритет ffmpeg (nice 0-19), щоб бот лишався чутливим
+    MEDIA_NICE = int(os.getenv("MEDIA_NICE", "10"))
+
+    # Як часто (сек) оновлюється повідомлення з прогресом завантаження
+    PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "10"))
+
+    # Черга задач у MongoDB: серії виконують воркери (worker.py і сам бот)
+    TASK_QUEUE = os.getenv("TASK_QUEUE", "0") == "1"
+    # Скільки серій одночасно обробляє один воркер (0 — бот сам не виконує задачі)
+    WORKER_SLOTS = int(os.getenv("WORKER_SLOTS", "2"))
+    # Оренда задачі (сек); воркер продовжує її heartbeat-ом, після — задачу бере інший
+    TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "120"))
+    TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "5"))
+    # Пауза перед повтором: TASK_RETRY_BASE * 2^(спроба-1) сек
+    TASK_RETRY_BASE = int(os.getenv("TASK_RETRY_BASE", "60"))
+    # Bot API сервер для воркера на іншій машині
+    WORKER_BOT_API_URL = os.getenv("WORKER_BOT_API_URL", "http://localhost:8082")
+    # Чи запущено цей сервер з --local (файли передаються шляхом на диску).
+    # 0 — файли вивантажуються через multipart (FSInputFile), як у звичайному API
+    WORKER_BOT_API_LOCAL = os.getenv("WORKER_BOT_API_LOCAL", "1") == "1"
+
     @classmethod
     def validate(cls):
         """Перевірка наявності обов'язкових налаштувань"""
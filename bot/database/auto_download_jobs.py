@@ -1,7 +1,93 @@
+import hashlib
+import logging
 from datetime import datetime, timezone
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from bot.database import db
 
+logger = logging.getLogger(__name__)
+
+# Statuses in which a job still owns its active_fingerprint
+_ACTIVE_STATUSES = ("running", "paused")
+
+
+def job_fingerprint(series_id: str, season: int, dubbing: str) -> str:
+    """
+    Identity of what a job downloads. At most one active (running/paused)
+    job per fingerprint exists — the unique index on active_fingerprint
+    enforces it. Requests are merged by episode, see _merge_into_active_job.
+    """
+    key = f"{series_id}|{season}|{dubbing or ''}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _job_pairs(job: dict) -> list[tuple[int, int]]:
+    """(season, number) of every episode; a whole-series job spans seasons."""
+    seasons = job.get("episode_seasons") or [job["season"]] * len(job["episode_numbers"])
+    return list(zip(seasons, job["episode_numbers"]))
+
+
+async def _merge_into_active_job(doc: dict) -> tuple[str | None, list[tuple[str, int, int]]]:
+    """
+    Merge a job request into the active jobs of the same series and dubbing.
+    Episodes are compared as (season, number) pairs, so a whole-series
+    request, a season and /checkUpdates see each other's episodes whatever
+    their fingerprints. The missing ones go to the job with the same
+    fingerprint or, failing that, to a whole-series job, which takes any season.
+    Returns (id of the job that has or took the episodes, []), or
+    (None, missing (url, season, number) episodes) when a new job is needed.
+    The status is left as is: a paused job is resumed by start_job, which
+    also queues its tasks or starts its loop.
+    """
+    seasons = doc.get("episode_seasons") or [doc["season"]] * len(doc["episode_numbers"])
+    requested = list(zip(doc["episode_urls"], seasons, doc["episode_numbers"]))
+    while True:
+        cursor = db.auto_download_jobs.find({
+            "series_id": doc["series_id"],
+            "dubbing": doc["dubbing"],
+            "active_fingerprint": {"$exists": True},
+        })
+        active = await cursor.to_list(length=None)
+        owners = {}
+        for job in active:
+            for pair in _job_pairs(job):
+                owners.setdefault(pair, job)
+        new = [(url, season, num) for url, season, num in requested
+               if (season, num) not in owners]
+        if not new:
+            if not requested:
+                return None, []
+            _, season, num = requested[0]
+            return str(owners[(season, num)]["_id"]), []
+
+        target = next(
+            (job for job in active if job["active_fingerprint"] == doc["active_fingerprint"]),
+            None,
+        ) or next((job for job in active if job.get("kind") == "whole_series"), None)
+        if target is None:
+            return None, new
+        update = {
+            "$push": {
+                "episode_urls": {"$each": [url for url, _, _ in new]},
+                "episode_numbers": {"$each": [num for _, _, num in new]},
+            },
+            "$inc": {"total_episodes": len(new)},
+        }
+        if target.get("episode_seasons"):
+            update["$push"]["episode_seasons"] = {"$each": [season for _, season, _ in new]}
+        # Optimistic: the job must not have grown or finished since it was read
+        result = await db.auto_download_jobs.update_one(
+            {"_id": target["_id"], "active_fingerprint": target["active_fingerprint"],
+             "total_episodes": target["total_episodes"]},
+            update,
+        )
+        if result.matched_count:
+            logger.info(
+                f"Job request merged into active job {target['_id']} "
+                f"({len(new)} new episodes)"
+            )
+            return str(target["_id"]), []
+
 
 async def create_job(
     series_id: str,
@@ -12,23 +98,100 @@ async def create_job(
     admin_id: int,
     content_type: str = "series",
     episode_numbers: list[int] | None = None,
-) -> str:
+    episode_seasons: list[int] | None = None,
+) -> tuple[str, bool]:
+    """
+    Create a download job, or return the active job of the same series and
+    dubbing with the requested episodes merged into it — the same episodes
+    are never downloaded by two jobs. Episodes another active job already
+    has (a season vs. a whole-series job) are left out of a new one.
+    Returns (job_id, merged): merged is True when an existing job took the
+    request (or already had all of its episodes).
+    episode_seasons: season of every episode — a whole-series job (kind
+    "whole_series", season 0) that runs all seasons as one pipeline.
+    """
+    episode_numbers = episode_numbers or list(range(1, len(episode_urls) + 1))
+    if episode_seasons:
+        season = 0
+    fingerprint = job_fingerprint(series_id, season, dubbing)
     doc = {
         "series_id": series_id,
         "series_title": series_title,
         "season": season,
         "dubbing": dubbing,
         "episode_urls": episode_urls,
-        "episode_numbers": episode_numbers or list(range(1, len(episode_urls) + 1)),
+        "episode_numbers": episode_numbers,
         "total_episodes": len(episode_urls),
         "current_episode": 0,
         "status": "running",
         "admin_id": admin_id,
         "content_type": content_type,
         "created_at": datetime.now(timezone.utc),
+        "fingerprint": fingerprint,
+        "active_fingerprint": fingerprint,
+    }
+    if episode_seasons:
+        doc["kind"] = "whole_series"
+        doc["episode_seasons"] = episode_seasons
+    return await _insert_or_merge(doc)
+
+
+async def create_movie_job(
+    url: str,
+    dubbing: str,
+    admin_id: int,
+    content_type: str,
+    movie: dict,
+) -> tuple[str, bool]:
+    """
+    Create a single-movie job (kind "movie"). It has one "episode" — the
+    movie page — so the scheduler, resume and de-duplication of series jobs
+    apply as is; the work itself is checkpointed in "stages".
+    Returns (job_id, merged), as create_job.
+    content_type: 'movie' | 'anime_movie'
+    movie: {"title", "title_en", "year", "imdb", "poster_url", "series_name", "part_number"}
+    """
+    fingerprint = job_fingerprint(url, 0, dubbing)
+    doc = {
+        "kind": "movie",
+        "series_id": url,
+        "series_title": movie["title"],
+        "season": 0,
+        "dubbing": dubbing,
+        "episode_urls": [url],
+        "episode_numbers": [1],
+        "total_episodes": 1,
+        "current_episode": 0,
+        "status": "running",
+        "admin_id": admin_id,
+        "content_type": content_type,
+        "movie": movie,
+        "stages": {},
+        "created_at": datetime.now(timezone.utc),
+        "fingerprint": fingerprint,
+        "active_fingerprint": fingerprint,
     }
-    result = await db.auto_download_jobs.insert_one(doc)
-    return str(result.inserted_id)
+    return await _insert_or_merge(doc)
+
+
+async def _insert_or_merge(doc: dict) -> tuple[str, bool]:
+    while True:
+        job_id, new = await _merge_into_active_job(doc)
+        if job_id:
+            return job_id, True
+        # Only the episodes no active job of the series has yet
+        insert = dict(doc)
+        insert["episode_urls"] = [url for url, _, _ in new]
+        insert["episode_numbers"] = [num for _, _, num in new]
+        insert["total_episodes"] = len(new)
+        if doc.get("episode_seasons"):
+            insert["episode_seasons"] = [season for _, season, _ in new]
+        try:
+            result = await db.auto_download_jobs.insert_one(insert)
+            return str(result.inserted_id), False
+        except DuplicateKeyError:
+            # A concurrent request created it first — merge into that one
+            continue
 
 
 async def update_job_progress(job_id: str, current_episode: int) -> None:
@@ -39,10 +202,54 @@ async def update_job_progress(job_id: str, current_episode: int) -> None:
 
 
 async def set_job_status(job_id: str, status: str) -> None:
-    """status: 'running' | 'paused' | 'done' | 'error'"""
+    """
+    status: 'running' | 'paused' | 'done' | 'error'
+    A finished job gives up its fingerprint, so the season can be queued again.
+    """
+    update = {"$set": {"status": status}}
+    if status not in _ACTIVE_STATUSES:
+        update["$unset"] = {"active_fingerprint": ""}
+    await db.auto_download_jobs.update_one({"_id": ObjectId(job_id)}, update)
+
+
+async def finish_running_job(job_id: str, total_episodes: int) -> bool:
+    """
+    Mark a running job done. False if it wasn't running (someone else
+    finished or paused it) or episodes were merged in since total_episodes was read.
+    """
+    result = await db.auto_download_jobs.update_one(
+        {"_id": ObjectId(job_id), "status": "running", "total_episodes": total_episodes},
+        {"$set": {"status": "done"}, "$unset": {"active_fingerprint": ""}}
+    )
+    return result.modified_count == 1
+
+
+async def set_job_stage(job_id: str, stage: str, value) -> None:
+    """Checkpoint of a movie job: stage finished, with whatever it produced."""
+    await db.auto_download_jobs.update_one(
+        {"_id": ObjectId(job_id)},
+        {"$set": {f"stages.{stage}": value}}
+    )
+
+
+async def update_segment_manifest(job_id: str, episode: int | str, manifest: dict) -> None:
+    """
+    Record the on-disk segment store of an episode:
+    {"dir", "playlist_url", "segments", "done"}.
+    """
+    manifest = {**manifest, "updated_at": datetime.now(timezone.utc)}
+    await db.auto_download_jobs.update_one(
+        {"_id": ObjectId(job_id)},
+        {"$set": {f"segment_manifests.{episode}": manifest}}
+    )
+
+
+async def clear_segment_manifest(job_id: str, episode: int | str | None = None) -> None:
+    """Forget one episode's segment store, or all of them when episode is None."""
+    field = "segment_manifests" if episode is None else f"segment_manifests.{episode}"
     await db.auto_download_jobs.update_one(
         {"_id": ObjectId(job_id)},
-        {"$set": {"status": status}}
+        {"$unset": {field: ""}}
     )
 
 
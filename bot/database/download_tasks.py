@@ -0,0 +1,182 @@
+"""
+Per-episode task documents of download jobs (download_tasks collection).
+
+With TASK_QUEUE enabled a job is split into one task per episode. Worker
+processes claim tasks atomically with find_one_and_update and hold them under
+a lease that they extend with heartbeats; a task whose lease ran out (its
+worker crashed or lost the database) is claimable again. Failed attempts are
+retried with exponential backoff until TASK_MAX_ATTEMPTS.
+
+status: 'queued' | 'leased' | 'done' | 'failed' | 'paused'
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from bot.database import db
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enqueue_job_tasks(job: dict) -> None:
+    """
+    Create the tasks of a job from its current_episode on (idempotent) and
+    put paused or failed ones back in the queue — used both for new jobs
+    and for resuming a paused one.
+    """
+    job_id = str(job["_id"])
+    now = _now()
+    episode_numbers = job.get("episode_numbers") or list(range(1, job["total_episodes"] + 1))
+    ops = [
+        UpdateOne(
+            {"job_id": job_id, "idx": idx},
+            {"$setOnInsert": {
+                "job_id": job_id,
+                "idx": idx,
+                "episode": episode_numbers[idx],
+                "status": "queued",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": now,
+            }},
+            upsert=True,
+        )
+        for idx in range(job["current_episode"], job["total_episodes"])
+    ]
+    if ops:
+        await db.download_tasks.bulk_write(ops, ordered=False)
+    await db.download_tasks.update_many(
+        {"job_id": job_id, "status": {"$in": ["paused", "failed"]}},
+        {"$set": {"status": "queued", "attempts": 0, "next_attempt_at": now},
+         "$unset": {"last_error": ""}},
+    )
+
+
+async def claim_task(worker_id: str, lease_seconds: int) -> dict | None:
+    """
+    Atomically take the next due task: a queued one whose backoff is over,
+    or a leased one whose lease expired. Oldest job first, episodes in order.
+    """
+    now = _now()
+    return await db.download_tasks.find_one_and_update(
+        {"$or": [
+            {"status": "queued", "next_attempt_at": {"$lte": now}},
+            {"status": "leased", "lease_expires_at": {"$lt": now}},
+        ]},
+        {
+            "$set": {
+                "status": "leased",
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                "heartbeat_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", 1), ("idx", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def heartbeat_task(task_id: ObjectId, worker_id: str, lease_seconds: int) -> bool:
+    """Extend the lease. False if the task is no longer ours (expired, paused)."""
+    now = _now()
+    result = await db.download_tasks.update_one(
+        {"_id": task_id, "status": "leased", "lease_owner": worker_id},
+        {"$set": {"heartbeat_at": now,
+                  "lease_expires_at": now + timedelta(seconds=lease_seconds)}},
+    )
+    return result.matched_count == 1
+
+
+async def complete_task(task_id: ObjectId, worker_id: str, skipped: bool = False) -> bool:
+    result = await db.download_tasks.update_one(
+        {"_id": task_id, "status": "leased", "lease_owner": worker_id},
+        {"$set": {"status": "done", "skipped": skipped, "finished_at": _now()},
+         "$unset": {"lease_owner": "", "lease_expires_at": ""}},
+    )
+    return result.matched_count == 1
+
+
+async def fail_task(task: dict, worker_id: str, error: str,
+                    max_attempts: int, retry_base: int) -> str:
+    """
+    Record a failed attempt: back to the queue after retry_base * 2^(n-1)
+    seconds, or 'failed' for good after max_attempts. Returns the new status.
+    """
+    attempts = task.get("attempts", 1)
+    if attempts >= max_attempts:
+        status, update = "failed", {"finished_at": _now()}
+    else:
+        status = "queued"
+        update = {"next_attempt_at": _now() + timedelta(seconds=retry_base * 2 ** (attempts - 1))}
+    await db.download_tasks.update_one(
+        {"_id": task["_id"], "status": "leased", "lease_owner": worker_id},
+        {"$set": {"status": status, "last_error": error[:500], **update},
+         "$unset": {"lease_owner": "", "lease_expires_at": ""}},
+    )
+    return status
+
+
+async def release_task(task_id: ObjectId, worker_id: str) -> None:
+    """Give a task back without counting the attempt (worker shutting down)."""
+    await db.download_tasks.update_one(
+        {"_id": task_id, "status": "leased", "lease_owner": worker_id},
+        {"$set": {"status": "queued", "next_attempt_at": _now()},
+         "$inc": {"attempts": -1},
+         "$unset": {"lease_owner": "", "lease_expires_at": ""}},
+    )
+
+
+async def pause_job_tasks(job_id: str) -> None:
+    """Take a job's unfinished tasks out of the queue; leased ones lose their lease."""
+    await db.download_tasks.update_many(
+        {"job_id": job_id, "status": {"$in": ["queued", "leased"]}},
+        {"$set": {"status": "paused"},
+         "$unset": {"lease_owner": "", "lease_expires_at": ""}},
+    )
+
+
+async def get_job_task_counts(job_id: str) -> dict[str, int]:
+    """{status: count} of a job's tasks; skipped episodes are counted as 'skipped'."""
+    pipeline = [
+        {"$match": {"job_id": job_id}},
+        {"$group": {
+            "_id": {"$cond": [{"$eq": ["$skipped", True]}, "skipped", "$status"]},
+            "count": {"$sum": 1},
+        }},
+    ]
+    counts = {}
+    async for row in db.download_tasks.aggregate(pipeline):
+        counts[row["_id"]] = row["count"]
+    return counts
+
+
+async def get_first_unfinished_idx(job_id: str) -> int | None:
+    """
+    Index of the first episode not done yet — the job's resume point.
+    None if the job has no tasks.
+    """
+    task = await db.download_tasks.find_one(
+        {"job_id": job_id, "status": {"$ne": "done"}},
+        {"idx": 1}, sort=[("idx", 1)],
+    )
+    if task:
+        return task["idx"]
+    last = await db.download_tasks.find_one({"job_id": job_id}, {"idx": 1}, sort=[("idx", -1)])
+    return last["idx"] + 1 if last else None
+
+
+async def task_exists(job_id: str, idx: int) -> bool:
+    return await db.download_tasks.count_documents({"job_id": job_id, "idx": idx}, limit=1) > 0
+
+
+async def get_failed_tasks(job_id: str) -> list[dict]:
+    cursor = db.download_tasks.find(
+        {"job_id": job_id, "status": "failed"},
+        {"idx": 1, "episode": 1, "last_error": 1},
+    ).sort("idx", 1)
+    return await cursor.to_list(length=None)
@@ -24,10 +24,40 @@ class MongoDB:
             # Перевірка підключення
             await self.client.admin.command('ping')
             logger.info(f"✅ Підключено до MongoDB: {config.MONGODB_DB}")
+            await self.create_indexes()
         except Exception as e:
             logger.error(f"❌ Помилка підключення до MongoDB: {e}")
             raise
 
+    async def create_indexes(self):
+        """Створення індексів (ідемпотентно, викликається при підключенні)"""
+        await self.playlist_cache.create_index(
+            [("news_id", 1), ("edittime", 1)], unique=True
+        )
+        # Застарілі плейлисти (старий dle_edittime) видаляються автоматично
+        await self.playlist_cache.create_index(
+            "created_at", expireAfterSeconds=7 * 24 * 3600
+        )
+        # Одне активне завдання на серіал + сезон + озвучку (дублікати зливаються)
+        await self.auto_download_jobs.create_index(
+            "active_fingerprint", unique=True, sparse=True
+        )
+        # Пошук активних завдань серіалу з тією ж озвучкою для злиття серій
+        await self.auto_download_jobs.create_index(
+            [("series_id", 1), ("dubbing", 1)],
+            partialFilterExpression={"active_fingerprint": {"$exists": True}},
+        )
+        # Черга задач завантаження: одна задача на серію
+        await self.download_tasks.create_index(
+            [("job_id", 1), ("idx", 1)], unique=True
+        )
+        await self.download_tasks.create_index(
+            [("status", 1), ("next_attempt_at", 1), ("created_at", 1), ("idx", 1)]
+        )
+        await self.download_tasks.create_index(
+            [("status", 1), ("lease_expires_at", 1)]
+        )
+
     async def close(self):
         """Закриття з'єднання з MongoDB"""
         if self.client:
@@ -65,6 +95,16 @@ class MongoDB:
         """Колекція завдань автозавантаження"""
         return self.db.auto_download_jobs
 
+    @property
+    def playlist_cache(self):
+        """Кеш AJAX-плейлистів uakino (news_id + dle_edittime)"""
+        return self.db.playlist_cache
+
+    @property
+    def download_tasks(self):
+        """Задачі завантаження по серіях (черга для воркерів)"""
+        return self.db.download_tasks
+
 
 # Глобальний екземпляр
 db = MongoDB()
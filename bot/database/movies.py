@@ -18,9 +18,13 @@ async def create_movie(
     duration: int = 0,
     series_name: str = None,
     part_number: int = None,
+    video_parts: list[dict] = None,
 ) -> dict:
     """
     Створити новий мультфільм
+
+    video_parts: впорядкований список частин відео, якщо файл розрізано
+    ({"video_file_id", "file_size", "duration"}); video_file_id — перша частина
     """
     movie_data = {
         "title": title,
@@ -44,6 +48,8 @@ async def create_movie(
         movie_data["series_name"] = series_name
     if part_number:
         movie_data["part_number"] = part_number
+    if video_parts:
+        movie_data["video_parts"] = video_parts
 
     result = await db.videos.insert_one(movie_data)
     movie_data["_id"] = result.inserted_id
@@ -298,6 +304,29 @@ async def get_episode(series_id: str, season: int, episode: int) -> Optional[dic
     return None
 
 
+async def get_season_episode_numbers(series_id: str, season: int) -> set[int]:
+    """
+    Номери серій, що вже є в сезоні — лише ключі, без завантаження всього
+    документа серіалу (сезони, лайки тощо)
+    """
+    from bson import ObjectId
+
+    pipeline = [
+        {"$match": {"_id": ObjectId(series_id)}},
+        {"$project": {
+            "_id": 0,
+            "episodes": {"$map": {
+                "input": {"$objectToArray": {"$ifNull": [f"$seasons.{season}", {}]}},
+                "in": "$$this.k",
+            }},
+        }},
+    ]
+    docs = await db.videos.aggregate(pipeline).to_list(length=1)
+    if not docs:
+        return set()
+    return {int(k) for k in docs[0]["episodes"] if k.isdigit()}
+
+
 async def get_series_seasons(series_id: str) -> list:
     """Отримати список сезонів серіалу"""
     from bson import ObjectId
@@ -630,6 +659,29 @@ async def update_movie_field(movie_id: str, field: str, value) -> bool:
     return result.modified_count > 0
 
 
+async def replace_movie_video(movie_id: str, video_file_id: str, video_type: str,
+                              file_size: int = 0, duration: int = 0) -> bool:
+    """
+    Замінити відео фільму. Частини розрізаного фільму (video_parts)
+    видаляються — інакше send_movie_video і далі надсилав би старі частини
+    """
+    from bson import ObjectId
+
+    result = await db.videos.update_one(
+        {"_id": ObjectId(movie_id)},
+        {
+            "$set": {
+                "video_file_id": video_file_id,
+                "video_type": video_type,
+                "file_size": file_size,
+                "duration": duration,
+            },
+            "$unset": {"video_parts": ""},
+        }
+    )
+    return result.modified_count > 0
+
+
 async def update_episode_video(series_id: str, season: int, episode: int, video_file_id: str, video_type: str, file_size: int = 0, duration: int = 0) -> bool:
     """Оновити відео серії"""
     from bson import ObjectId
@@ -824,9 +876,13 @@ async def create_anime_movie(
     duration: int = 0,
     series_name: str = None,
     part_number: int = None,
+    video_parts: list[dict] = None,
 ) -> dict:
     """
     Створити новий аніме-фільм
+
+    video_parts: впорядкований список частин відео, якщо файл розрізано
+    ({"video_file_id", "file_size", "duration"}); video_file_id — перша частина
     """
     movie_data = {
         "title": title,
@@ -850,6 +906,8 @@ async def create_anime_movie(
         movie_data["series_name"] = series_name
     if part_number:
         movie_data["part_number"] = part_number
+    if video_parts:
+        movie_data["video_parts"] = video_parts
 
     result = await db.videos.insert_one(movie_data)
     movie_data["_id"] = result.inserted_id
@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+from bot.database import db
+
+
+async def get_cached_playlist(news_id: str, edittime: str) -> str | None:
+    doc = await db.playlist_cache.find_one(
+        {"news_id": news_id, "edittime": edittime},
+        {"html": 1},
+    )
+    return doc["html"] if doc else None
+
+
+async def save_cached_playlist(news_id: str, edittime: str, html: str) -> None:
+    await db.playlist_cache.update_one(
+        {"news_id": news_id, "edittime": edittime},
+        {"$set": {"html": html, "created_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
@@ -11,6 +11,8 @@ from aiogram.fsm.context import FSMContext
 
 from bot.config import config
 from bot.utils.timezone import now_kyiv, utc_to_kyiv, kyiv_to_utc_naive
+from bot.utils import convert_video_to_mp4, cleanup_temp_files, upload_input
+from bot.utils.ffmpeg_runner import get_video_info
 from bot.states import (
     AddMovieStates, AddBatchMovieStates, DeleteContentStates,
     EditContentStates, AddSuperBatchMovieStates,
@@ -33,6 +35,7 @@ from bot.database.movies import (
     delete_episode,
     update_movie_field,
     update_episode_video,
+    replace_movie_video,
     toggle_content_visibility,
     search_movie_series_names,
     get_all_movie_series_names,
@@ -77,6 +80,95 @@ def get_forwarded_chat_id(message: Message) -> int | None:
     return None
 
 
+# Фонові конвертації в MP4; посилання тримаємо, щоб задачі не зібрав GC
+_conversion_tasks: set[asyncio.Task] = set()
+
+
+def _needs_mp4_conversion(document) -> bool:
+    """Відео-документ не у MP4 (mkv, avi тощо) — Telegram-плеєр його не відтворює."""
+    mime_type = document.mime_type or ""
+    return mime_type.startswith("video/") and mime_type != "video/mp4"
+
+
+async def _offer_mp4_conversion(message: Message, target: str) -> None:
+    """
+    Після збереження відео-документа не у MP4 пропонує адміну сконвертувати
+    його у фоні. target: "m:<movie_id>" або "e:<series_id>:<сезон>:<серія>".
+    """
+    if not message.document or not _needs_mp4_conversion(message.document):
+        return
+    await message.answer(
+        "ℹ️ Відео збережено документом — Telegram-плеєр його не відтворює.\n"
+        "Можна сконвертувати його в MP4 у фоні, бот повідомить про результат.",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text="🎞 Конвертувати в MP4", callback_data=f"conv_mp4:{target}")
+        ]]),
+    )
+
+
+async def _convert_document_to_mp4(bot: Bot, admin_id: int, target: str) -> None:
+    """
+    Фонова конвертація збереженого документа в MP4 (у черзі перекодувань):
+    результат вивантажується в канал зберігання і замінює документ у записі.
+    Якщо відео тим часом замінили, запис не змінюється.
+    """
+    kind, content_id, *episode = target.split(":")
+    try:
+        content = await get_movie_by_id(content_id)
+        if kind == "m":
+            entry, label = content, content["title"]
+        else:
+            season, episode_num = episode
+            entry = content["seasons"][season][episode_num]
+            label = f"{content['title']}, сезон {season}, серія {episode_num}"
+    except Exception as e:
+        logging.error(f"MP4 conversion: {target} not found: {e}")
+        await bot.send_message(admin_id, "❌ Конвертація: відео не знайдено в базі.")
+        return
+    source_file_id = entry["video_file_id"]
+    status = await bot.send_message(admin_id, f"⚙️ Конвертую в MP4: {label}")
+
+    async def on_progress(pct: int):
+        try:
+            await status.edit_text(f"⚙️ Конвертую в MP4: {label} — {pct}%")
+        except Exception:
+            pass
+
+    try:
+        output_path, temp_dir = await convert_video_to_mp4(bot, source_file_id, progress_cb=on_progress)
+        try:
+            duration, width, height = await get_video_info(output_path)
+            sent = await bot.send_video(
+                config.STORAGE_CHANNEL_ID,
+                video=upload_input(bot, output_path),
+                caption=label,
+                supports_streaming=True,
+                width=width or None,
+                height=height or None,
+                duration=duration or None,
+            )
+        finally:
+            await asyncio.to_thread(cleanup_temp_files, temp_dir)
+
+        # Адмін міг замінити відео, поки йшла конвертація
+        content = await get_movie_by_id(content_id)
+        current = content if kind == "m" else content["seasons"][season][episode_num]
+        if current.get("video_file_id") != source_file_id:
+            await status.edit_text(f"⚠️ {label}: відео замінили під час конвертації, запис не змінено.")
+            return
+        file_size = sent.video.file_size or 0
+        duration = sent.video.duration or duration
+        if kind == "m":
+            await replace_movie_video(content_id, sent.video.file_id, "video", file_size, duration)
+        else:
+            await update_episode_video(content_id, int(season), int(episode_num),
+                                       sent.video.file_id, "video", file_size, duration)
+        await status.edit_text(f"✅ {label}: сконвертовано в MP4 і замінено у базі.")
+    except Exception as e:
+        logging.error(f"MP4 conversion of {target} failed: {e}")
+        await bot.send_message(admin_id, f"❌ Не вдалося сконвертувати {label}: {str(e)[:300]}")
+
+
 def is_admin(user_id: int) -> bool:
     """Перевірка чи користувач є адміністратором"""
     return user_id in config.ADMIN_IDS
@@ -469,6 +561,7 @@ async def process_movie_video(message: Message, state: FSMContext):
             f"➕ /addMovie - додати ще фільм",
             reply_markup=post_keyboard
         )
+        await _offer_mp4_conversion(message, f"m:{movie_id}")
 
         await state.clear()
 
@@ -2774,13 +2867,11 @@ async def process_edit_video(message: Message, state: FSMContext):
 
     # Оновлюємо відео та супутні поля
     try:
-        success1 = await update_movie_field(content_id, "video_file_id", video_file_id)
-        success2 = await update_movie_field(content_id, "video_type", video_type)
-        success3 = await update_movie_field(content_id, "file_size", file_size)
-        success4 = await update_movie_field(content_id, "duration", duration)
+        success = await replace_movie_video(content_id, video_file_id, video_type, file_size, duration)
 
-        if success1:
+        if success:
             await message.answer("✅ Відео успішно замінено!")
+            await _offer_mp4_conversion(message, f"m:{content_id}")
         else:
             await message.answer("❌ Помилка при оновленні відео.")
     except Exception as e:
@@ -2929,6 +3020,7 @@ async def process_edit_episode_video(message: Message, state: FSMContext):
                 f"✅ Відео серії успішно замінено!\n\n"
                 f"Сезон {season_num}, Серія {episode_num}"
             )
+            await _offer_mp4_conversion(message, f"e:{series_id}:{season_num}:{episode_num}")
         else:
             await message.answer("❌ Помилка при оновленні відео серії.")
     except Exception as e:
@@ -2947,6 +3039,22 @@ async def process_edit_episode_video_invalid(message: Message, state: FSMContext
     )
 
 
+@router.callback_query(F.data.startswith("conv_mp4:"))
+async def process_convert_to_mp4(callback: CallbackQuery, bot: Bot):
+    """Запуск фонової конвертації відео-документа в MP4 (кнопка після збереження)"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔️", show_alert=True)
+        return
+    target = callback.data.split(":", 1)[1]
+    await callback.message.edit_text(
+        "⏳ Конвертацію в MP4 поставлено в чергу перекодувань. Повідомлю, коли буде готово."
+    )
+    task = asyncio.create_task(_convert_document_to_mp4(bot, callback.from_user.id, target))
+    _conversion_tasks.add(task)
+    task.add_done_callback(_conversion_tasks.discard)
+    await callback.answer()
+
+
 # ===============================================
 # Зміна типу контенту
 # ===============================================
@@ -1,5 +1,7 @@
+import html
 import logging
 import os
+import time
 import uuid
 
 from aiogram import Router, F, Bot
@@ -19,8 +21,12 @@ from bot.database.movies import (
 from bot.database.auto_download_jobs import (
     create_job, set_job_status, get_job
 )
-from bot.utils.scraper import get_dubbing_options, parse_season_page, parse_movie_page, download_poster
-from bot.utils.download_loop import start_job, cancel_job
+from bot.utils.scraper import (
+    get_dubbing_options, parse_season_page, parse_movie_page, download_poster,
+    get_series_seasons, parse_series_seasons,
+)
+from bot.utils.download_loop import start_job, cancel_job, job_summary
+from bot.utils.media_pool import media_pool
 from bot.handlers.admin import get_forwarded_chat_id
 
 router = Router()
@@ -389,7 +395,7 @@ async def _create_series_and_ask_season(message, state: FSMContext, poster_file_
         f"✅ <b>Серіал створено!</b>\n"
         f"📺 {data['new_title']}\n"
         f"🆔 <code>{series_id}</code>\n\n"
-        f"Введіть номер сезону:"
+        f"Введіть номер сезону (0 — весь серіал):"
     )
     await state.set_state(AutoDownloadStates.waiting_for_season)
 
@@ -453,7 +459,7 @@ async def process_existing_confirm(callback: CallbackQuery, state: FSMContext):
 
     if action == "confirm":
         await callback.message.edit_text(
-            f"✅ Серіал підтверджено!\n\nВведіть номер сезону:"
+            f"✅ Серіал підтверджено!\n\nВведіть номер сезону (0 — весь серіал):"
         )
         await state.set_state(AutoDownloadStates.waiting_for_season)
     else:
@@ -516,7 +522,7 @@ async def pick_existing_series(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(
         f"✅ <b>{series['title']}</b>\n"
         f"🆔 <code>{series_id}</code>\n\n"
-        f"Введіть номер сезону:"
+        f"Введіть номер сезону (0 — весь серіал):"
     )
     await state.set_state(AutoDownloadStates.waiting_for_season)
     await callback.answer()
@@ -528,10 +534,10 @@ async def pick_existing_series(callback: CallbackQuery, state: FSMContext):
 async def process_season(message: Message, state: FSMContext):
     try:
         season = int(message.text.strip())
-        if season < 1:
+        if season < 0:
             raise ValueError
     except ValueError:
-        await message.answer("❌ Введіть ціле число більше 0:")
+        await message.answer("❌ Введіть ціле число (0 — весь серіал):")
         return
 
     await state.update_data(season=season)
@@ -541,7 +547,7 @@ async def process_season(message: Message, state: FSMContext):
     if data.get("season_url"):
         wait_msg = await message.answer("⏳ Парсю сторінку...")
         try:
-            dubbings = await get_dubbing_options(data["season_url"], season=season)
+            dubbings = await _load_dubbings(state, data["season_url"], season)
         except Exception as e:
             await wait_msg.edit_text(f"❌ Не вдалося завантажити сторінку: {e}")
             return
@@ -549,10 +555,11 @@ async def process_season(message: Message, state: FSMContext):
     else:
         site = data.get("site", "uakino")
         site_name = "uakino.best" if site == "uakino" else "uafix.net"
-        await message.answer(
-            f"✅ Сезон: <b>{season}</b>\n\n"
-            f"Надішліть URL сезону з {site_name}:"
-        )
+        if season == 0:
+            text = f"✅ Весь серіал\n\nНадішліть URL серіалу (будь-якого сезону) з {site_name}:"
+        else:
+            text = f"✅ Сезон: <b>{season}</b>\n\nНадішліть URL сезону з {site_name}:"
+        await message.answer(text)
         await state.set_state(AutoDownloadStates.waiting_for_url)
 
 
@@ -570,7 +577,7 @@ async def process_url(message: Message, state: FSMContext):
     wait_msg = await message.answer("⏳ Парсю сторінку...")
 
     try:
-        dubbings = await get_dubbing_options(url, season=data.get("season"))
+        dubbings = await _load_dubbings(state, url, data.get("season"))
     except Exception as e:
         await wait_msg.edit_text(f"❌ Не вдалося завантажити сторінку: {e}")
         return
@@ -578,6 +585,21 @@ async def process_url(message: Message, state: FSMContext):
     await _show_dubbing_picker(wait_msg, state, dubbings, edit=True)
 
 
+async def _load_dubbings(state: FSMContext, url: str, season: int | None) -> list[str]:
+    """
+    Dubbings to choose from. For the whole series (season 0) every season is
+    enumerated here, once, and the dubbings are taken from the first one.
+    """
+    if season != 0:
+        return await get_dubbing_options(url, season=season)
+    season_urls = await get_series_seasons(url)
+    if not season_urls:
+        raise ValueError("на сторінці не знайдено сезонів")
+    await state.update_data(season_urls=sorted(season_urls.items()))
+    first = min(season_urls)
+    return await get_dubbing_options(season_urls[first], season=first)
+
+
 async def _show_dubbing_picker(message, state: FSMContext, dubbings: list, edit: bool = True):
     if not dubbings:
         text = "⚠️ Озвучок не знайдено. Введіть назву озвучки вручну:"
@@ -629,6 +651,10 @@ async def _confirm_dubbing(message, state: FSMContext, dubbing: str, edit: bool)
         msg = await message.answer(wait_text)
         message = msg
 
+    if data.get("season") == 0:
+        await _confirm_whole_series(message, state, dubbing)
+        return
+
     try:
         result = await parse_season_page(url, dubbing, season=data.get("season"))
     except Exception as e:
@@ -690,6 +716,61 @@ async def _confirm_dubbing(message, state: FSMContext, dubbing: str, edit: bool)
     await state.set_state(AutoDownloadStates.confirming)
 
 
+async def _confirm_whole_series(message, state: FSMContext, dubbing: str):
+    """Season 0: episodes of every season with the one dubbing, as a single job."""
+    data = await state.get_data()
+    parsed = await parse_series_seasons(dict(data["season_urls"]), dubbing)
+
+    episode_urls, episode_numbers, episode_seasons = [], [], []
+    season_lines, skipped_seasons = [], []
+    for season, result in parsed.items():
+        if result.get("error") or not result["episode_urls"]:
+            skipped_seasons.append(str(season))
+            continue
+        nums = result.get("episode_numbers") or list(range(1, len(result["episode_urls"]) + 1))
+        episode_urls += result["episode_urls"]
+        episode_numbers += nums
+        episode_seasons += [season] * len(nums)
+        season_lines.append(f"• Сезон {season}: {len(nums)} серій (№ {min(nums)}–{max(nums)})")
+
+    if not episode_urls:
+        await message.edit_text(
+            f"⚠️ Серій для озвучки «{dubbing}» не знайдено в жодному сезоні. "
+            f"Спробуйте іншу озвучку або перевірте URL."
+        )
+        return
+
+    await state.update_data(
+        dubbing=dubbing,
+        episode_urls=episode_urls,
+        episode_numbers=episode_numbers,
+        episode_seasons=episode_seasons,
+        total_episodes=len(episode_urls),
+    )
+
+    info_lines = [
+        f"📋 <b>Готово до завантаження:</b>\n",
+        f"📺 {data['series_title']}",
+        f"📅 Весь серіал, сезонів: {len(season_lines)}",
+        f"🎙 Озвучка: {dubbing}",
+        f"📼 Серій на сайті: {len(episode_urls)}",
+        *season_lines,
+    ]
+    if skipped_seasons:
+        info_lines.append(f"⚠️ Без цієї озвучки (пропускаю): сезон {', '.join(skipped_seasons)}")
+    info_lines.append("\nВсі сезони завантажуються одним завданням, без пауз між ними. Починаємо?")
+
+    buttons = [
+        [InlineKeyboardButton(text="▶️ Починаємо!", callback_data="ad_confirm:yes")],
+        [InlineKeyboardButton(text="❌ Скасувати", callback_data="ad_confirm:no")],
+    ]
+    await message.edit_text(
+        "\n".join(info_lines),
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons)
+    )
+    await state.set_state(AutoDownloadStates.confirming)
+
+
 # ── Підтвердження і запуск ───────────────────────────────────────────────────
 
 @router.callback_query(AutoDownloadStates.confirming, F.data.startswith("ad_confirm:"))
@@ -702,24 +783,34 @@ async def process_confirm(callback: CallbackQuery, state: FSMContext, bot: Bot):
         return
 
     data = await state.get_data()
-    job_id = await create_job(
+    job_id, merged = await create_job(
         series_id=data["series_id"],
         series_title=data["series_title"],
         season=data["season"],
         dubbing=data["dubbing"],
         episode_urls=data["episode_urls"],
         episode_numbers=data.get("episode_numbers"),
+        episode_seasons=data.get("episode_seasons"),
         admin_id=callback.from_user.id,
         content_type=data.get("content_type", "series"),
     )
 
     await state.clear()
-    await callback.message.edit_text(
-        f"🚀 Завантаження розпочато!\n\n"
-        f"Буде завантажено {data['total_episodes']} серій.\n"
-        f"Я повідомлятиму після кожної серії.\n\n"
-        f"Щоб зупинити: /cancelDownload"
-    )
+    if merged:
+        job = await get_job(job_id)
+        await callback.message.edit_text(
+            f"➕ Запит об'єднано з активним завантаженням {html.escape(job_summary(job))}: "
+            f"серії, яких у ньому ще не було, додано до нього.\n"
+            f"Прогрес — у повідомленні цього завантаження.\n\n"
+            f"Щоб зупинити: /cancelDownload"
+        )
+    else:
+        await callback.message.edit_text(
+            f"🚀 Завантаження розпочато!\n\n"
+            f"Буде завантажено {data['total_episodes']} серій.\n"
+            f"Прогрес показуватиму в одному повідомленні, яке оновлюється.\n\n"
+            f"Щоб зупинити: /cancelDownload"
+        )
     await start_job(bot, job_id)
     await callback.answer()
 
@@ -797,11 +888,43 @@ async def cmd_cancel_download(message: Message):
         await cancel_job(str(job["_id"]))
 
     await message.answer(
-        f"⏹ Зупинка після поточної серії... "
-        f"({len(my_jobs)} завантажень)"
+        f"⏹ Зупинено завантажень: {len(my_jobs)}. "
+        f"Поточні серії перервано, продовжити можна з того ж місця."
     )
 
 
+# ── /mediaQueue ──────────────────────────────────────────────────────────────
+
+@router.message(Command("mediaQueue"))
+async def cmd_media_queue(message: Message):
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔️ Тільки для адміністраторів.")
+        return
+
+    entries = media_pool.snapshot()
+    limits = media_pool.limits
+    header = (
+        f"🎛 <b>Черга обробки відео</b>\n"
+        f"Слоти: ремукс {limits['remux']}, перекодування {limits['encode']}\n\n"
+    )
+    if not entries:
+        await message.answer(header + "Черга порожня.")
+        return
+
+    kind_labels = {"remux": "📥 ремукс", "encode": "⚙️ перекодування"}
+    now = time.monotonic()
+    lines = []
+    for e in entries:
+        if e["state"] == "running":
+            status = f"▶️ {int(now - e['started_at']) // 60} хв"
+        elif e["state"] == "waiting":
+            status = f"⏸ чекає: {html.escape(e['reason'])}"
+        else:
+            status = f"🕒 у черзі {int(now - e['queued_at']) // 60} хв"
+        lines.append(f"{kind_labels.get(e['kind'], e['kind'])} · {html.escape(e['label'])}\n    {status}")
+    await message.answer(header + "\n".join(lines))
+
+
 # ── Resume callbacks (sent on startup) ───────────────────────────────────────
 
 @router.callback_query(F.data.startswith("ad_resume:"))
@@ -819,10 +942,14 @@ async def handle_resume(callback: CallbackQuery, bot: Bot):
         await callback.answer("Завдання не знайдено", show_alert=True)
         return
     await set_job_status(job_id, "running")
-    await callback.message.edit_text(
-        f"▶️ Продовжую завантаження «{job['series_title']}» "
-        f"з серії {job['current_episode'] + 1}..."
-    )
+    if job.get("kind") == "movie":
+        text = f"▶️ Продовжую завантаження фільму «{job['series_title']}» з того ж етапу..."
+    else:
+        text = (
+            f"▶️ Продовжую завантаження «{job['series_title']}» "
+            f"з серії {job['current_episode'] + 1}..."
+        )
+    await callback.message.edit_text(text)
     await start_job(bot, job_id)
     await callback.answer()
 
@@ -1,7 +1,5 @@
-import asyncio
+import html
 import logging
-import os
-import uuid
 
 from aiogram import Router, F, Bot
 from aiogram.filters import Command
@@ -10,15 +8,13 @@ from aiogram.types import (
     InlineKeyboardButton, InlineKeyboardMarkup
 )
 from aiogram.fsm.context import FSMContext
-from aiogram.types import FSInputFile
 
 from bot.config import config
 from bot.states import AutoMovieStates
-from bot.database.movies import (
-    create_movie, get_all_movie_series_names, find_movie_by_titles
-)
-from bot.utils.scraper import parse_movie_page, download_poster, get_movie_m3u8
-from bot.utils.ffmpeg_runner import run_ffmpeg, get_video_info, create_thumbnail, format_quality
+from bot.database.movies import get_all_movie_series_names, find_movie_by_titles
+from bot.database.auto_download_jobs import create_movie_job
+from bot.utils.scraper import parse_movie_page
+from bot.utils.download_loop import start_job
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -504,152 +500,24 @@ async def process_download_confirm(callback: CallbackQuery, state: FSMContext, b
     admin_id = callback.from_user.id
     await state.clear()
 
-    asyncio.create_task(
-        _download_and_create_movie(
-            bot=bot,
-            admin_id=admin_id,
-            url=data["movie_url"],
-            dubbing=data["dubbing"],
-            title=data["title"],
-            title_en=data["title_en"],
-            year=data["year"],
-            imdb=data["imdb"],
-            poster_url=data.get("poster_url"),
-            series_name=data.get("series_name"),
-            part_number=data.get("part_number"),
-        )
+    job_id, merged = await create_movie_job(
+        url=data["movie_url"],
+        dubbing=data["dubbing"],
+        admin_id=admin_id,
+        content_type="movie",
+        movie={
+            "title": data["title"],
+            "title_en": data["title_en"],
+            "year": data["year"],
+            "imdb": data["imdb"],
+            "poster_url": data.get("poster_url"),
+            "series_name": data.get("series_name"),
+            "part_number": data.get("part_number"),
+        },
     )
-
-
-# ── Завантаження і збереження ─────────────────────────────────────────────────
-
-async def _download_and_create_movie(
-    bot: Bot,
-    admin_id: int,
-    url: str,
-    dubbing: str,
-    title: str,
-    title_en: str,
-    year: int,
-    imdb: float,
-    poster_url: str | None,
-    series_name: str | None,
-    part_number: int | None,
-):
-    uid = str(uuid.uuid4())[:8]
-    poster_path = f"/tmp/{uid}_poster.jpg"
-    video_path = f"/tmp/{uid}_movie.mp4"
-    thumb_path = f"/tmp/{uid}_thumb.jpg"
-
-    try:
-        # 1. Download and upload poster
-        poster_file_id = None
-        if poster_url:
-            await bot.send_message(admin_id, "🖼 Завантажую постер...")
-            ok = await download_poster(poster_url, poster_path)
-            if ok:
-                sent_photo = await bot.send_photo(
-                    config.STORAGE_CHANNEL_ID,
-                    photo=FSInputFile(poster_path),
-                    caption=f"poster:{title}",
-                )
-                poster_file_id = sent_photo.photo[-1].file_id
-                await bot.send_message(admin_id, "✅ Постер завантажено!")
-            else:
-                await bot.send_message(
-                    admin_id,
-                    "⚠️ Не вдалося завантажити постер автоматично.\n"
-                    "Перешли постер вручну з каналу зберігання після завершення."
-                )
-        else:
-            await bot.send_message(
-                admin_id,
-                "⚠️ Постер не знайдено на сторінці.\n"
-                "Перешли постер вручну з каналу зберігання після завершення."
-            )
-
-        # 2. Get m3u8 and download video
-        await bot.send_message(admin_id, "📥 Отримую посилання на відео...")
-        m3u8_url = await get_movie_m3u8(url, dubbing)
-
-        status_msg = await bot.send_message(admin_id, "⏳ Завантажую відео (це може зайняти кілька хвилин)...")
-
-        async def on_compress_progress(pct: int):
-            try:
-                await status_msg.edit_text(f"⚙️ Перекодування відео: {pct}%...")
-            except Exception:
-                pass
-
-        was_compressed = await run_ffmpeg(m3u8_url, video_path, on_compress_progress=on_compress_progress)
-        if was_compressed:
-            await bot.send_message(admin_id, "✅ Перекодування завершено!")
-
-        # 3. Get metadata and thumbnail
-        duration, width, height = await get_video_info(video_path)
-        has_thumb = await create_thumbnail(video_path, thumb_path)
-
-        # 4. Upload video to storage channel
-        await bot.send_message(admin_id, "📤 Вивантажую відео в канал...")
-        sent_video = await bot.send_video(
-            config.STORAGE_CHANNEL_ID,
-            video=FSInputFile(video_path),
-            caption=f"movie:{title}",
-            supports_streaming=True,
-            width=width or None,
-            height=height or None,
-            duration=duration or None,
-            thumbnail=FSInputFile(thumb_path) if has_thumb else None,
-        )
-        video_file_id = sent_video.video.file_id
-        file_size = sent_video.video.file_size or 0
-
-        # 5. Create movie in database
-        movie = await create_movie(
-            title=title,
-            title_en=title_en,
-            year=year,
-            imdb_rating=imdb,
-            poster_file_id=poster_file_id or "",
-            video_file_id=video_file_id,
-            video_type="video",
-            added_by=admin_id,
-            file_size=file_size,
-            duration=duration,
-            series_name=series_name,
-            part_number=part_number,
-        )
-        movie_id = str(movie["_id"])
-
-        part_info = f" (частина {part_number})" if part_number else ""
-        series_info = f"\n📁 Серія: {series_name}{part_info}" if series_name else ""
-        quality_label = format_quality(width, height)
-
-        bot_info = await bot.get_me()
-        view_url = f"https://t.me/{bot_info.username}?start=m_{movie_id}"
-
-        done_markup = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="📢 Зробити розсилку", callback_data=f"post_quick:movie:{movie_id}")],
-            [InlineKeyboardButton(text="🎬 Переглянути фільм", url=view_url)],
-            [InlineKeyboardButton(text="➕ Додати ще фільм", callback_data="am_add_new:movie"),
-             InlineKeyboardButton(text="📺 Додати серіал", callback_data="am_add_new:series")],
-        ])
-
-        await bot.send_message(
-            admin_id,
-            f"🎉 <b>Фільм «{title}» успішно додано!</b>\n\n"
-            f"🆔 ID: <code>{movie_id}</code>\n"
-            f"📺 Якість: <b>{quality_label}</b>"
-            f"{series_info}",
-            reply_markup=done_markup,
+    if merged:
+        await callback.message.edit_text(
+            f"➕ Фільм «{html.escape(data['title'])}» вже завантажується — "
+            f"запит об'єднано з активним завантаженням, прогрес — у його повідомленні."
         )
-
-    except Exception as e:
-        logger.error(f"Auto movie download failed for '{title}': {e}")
-        try:
-            await bot.send_message(admin_id, f"❌ Помилка: {str(e)[:300]}")
-        except Exception:
-            pass
-    finally:
-        for path in (poster_path, video_path, thumb_path):
-            if os.path.exists(path):
-                os.remove(path)
+    await start_job(bot, job_id)
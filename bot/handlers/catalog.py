@@ -1112,23 +1112,9 @@ async def send_movie(callback: CallbackQuery, bot: Bot):
 
     # Відправляємо відео з кнопкою
     try:
-        video_file_id = movie.get("video_file_id")
-        video_type = movie.get("video_type", "video")
-
-        if video_type == "video":
-            await bot.send_video(
-                chat_id=callback.from_user.id,
-                video=video_file_id,
-                caption=caption,
-                reply_markup=video_buttons
-            )
-        else:
-            await bot.send_document(
-                chat_id=callback.from_user.id,
-                document=video_file_id,
-                caption=caption,
-                reply_markup=video_buttons
-            )
+        await send_movie_video(
+            bot, callback.from_user.id, movie, caption, reply_markup=video_buttons
+        )
 
         await callback.answer("✅ Приємного перегляду!")
     except Exception as e:
@@ -1745,30 +1731,16 @@ async def send_anime_movie(callback: CallbackQuery, bot: Bot):
 
     # Відправляємо відео
     try:
-        video_file_id = movie.get("video_file_id")
-        video_type = movie.get("video_type", "video")
-
-        if not video_file_id:
+        if not movie.get("video_file_id"):
             await bot.send_message(
                 chat_id=callback.from_user.id,
                 text=f"❌ Відео для '{movie.get('title')}' не знайдено"
             )
             return
 
-        if video_type == "video":
-            await bot.send_video(
-                chat_id=callback.from_user.id,
-                video=video_file_id,
-                caption=caption,
-                reply_markup=video_buttons
-            )
-        else:
-            await bot.send_document(
-                chat_id=callback.from_user.id,
-                document=video_file_id,
-                caption=caption,
-                reply_markup=video_buttons
-            )
+        await send_movie_video(
+            bot, callback.from_user.id, movie, caption, reply_markup=video_buttons
+        )
     except Exception as e:
         import logging
         logging.error(f"Не вдалося відправити аніме '{movie.get('title')}': {str(e)}")
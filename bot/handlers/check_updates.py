@@ -1,4 +1,4 @@
-import asyncio
+import html
 import logging
 import re
 from collections import defaultdict
@@ -8,8 +8,8 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKe
 
 from bot.config import config
 from bot.database.movies import get_ongoing_series
-from bot.database.auto_download_jobs import create_job
-from bot.utils.download_loop import start_job
+from bot.database.auto_download_jobs import create_job, get_job
+from bot.utils.download_loop import start_job, job_summary
 from bot.utils.scraper import parse_season_page, get_dubbing_options, get_uakino_season_urls
 
 router = Router()
@@ -44,9 +44,8 @@ async def _collect_missing_episodes(series: dict) -> list[dict]:
             if not season_urls:
                 return [{"series": series, "season": 0, "new_ep_nums": [], "new_ep_urls": [], "error": "Не знайдено сезонів на сайті"}]
 
-            for i, (site_season, check_url) in enumerate(sorted(season_urls.items())):
-                if i > 0:
-                    await asyncio.sleep(2)
+            # Requests are paced per host by the scraper's rate limiter — no manual sleeps needed
+            for site_season, check_url in sorted(season_urls.items()):
                 try:
                     dubbings = await get_dubbing_options(check_url)
                     dubbing = dubbings[0] if dubbings else source_dubbing
@@ -80,8 +79,6 @@ async def _collect_missing_episodes(series: dict) -> list[dict]:
             max_db_season = max((int(s) for s in seasons.keys()), default=0)
             # Check from season 1 up to max_db_season+1 to catch both gaps and new seasons
             for season_num in range(1, max_db_season + 2):
-                if season_num > 1:
-                    await asyncio.sleep(2)
                 try:
                     dubbings = await get_dubbing_options(source_url, season=season_num)
                     dubbing = dubbings[0] if dubbings else source_dubbing
@@ -207,7 +204,7 @@ async def download_all_updates(callback: CallbackQuery, bot: Bot) -> None:
         content_type = series.get("content_type", "series")
 
         try:
-            job_id = await create_job(
+            job_id, merged = await create_job(
                 series_id=series_id,
                 series_title=title,
                 season=r["season"],
@@ -219,10 +216,18 @@ async def download_all_updates(callback: CallbackQuery, bot: Bot) -> None:
             )
             await start_job(bot, job_id)
             ep_list = ", ".join(str(n) for n in r["new_ep_nums"])
-            await bot.send_message(
-                callback.from_user.id,
-                f"▶️ <b>{title}</b> с.{r['season']}: запущено завантаження серій {ep_list}"
-            )
+            if merged:
+                job = await get_job(job_id)
+                await bot.send_message(
+                    callback.from_user.id,
+                    f"➕ <b>{title}</b> с.{r['season']}: серії {ep_list} — в активному "
+                    f"завантаженні {html.escape(job_summary(job))}"
+                )
+            else:
+                await bot.send_message(
+                    callback.from_user.id,
+                    f"▶️ <b>{title}</b> с.{r['season']}: запущено завантаження серій {ep_list}"
+                )
         except Exception as e:
             logger.error(f"download_all_updates error for {title}: {e}")
             await bot.send_message(
@@ -38,6 +38,7 @@ from bot.database.movies import (
     get_user_liked_content
 )
 from bot.config import config
+from bot.utils import send_movie_video
 from bot.states import SearchStates, HelpStates, AdminReplyStates
 
 router = Router()
@@ -112,23 +113,9 @@ async def send_movie_from_deeplink(message: Message, bot: Bot, movie_id: str, is
 
     # Відправляємо відео
     try:
-        video_file_id = movie.get("video_file_id")
-        video_type = movie.get("video_type", "video")
-
-        if video_type == "video":
-            await bot.send_video(
-                chat_id=message.from_user.id,
-                video=video_file_id,
-                caption=caption,
-                reply_markup=video_buttons
-            )
-        else:
-            await bot.send_document(
-                chat_id=message.from_user.id,
-                document=video_file_id,
-                caption=caption,
-                reply_markup=video_buttons
-            )
+        await send_movie_video(
+            bot, message.from_user.id, movie, caption, reply_markup=video_buttons
+        )
 
         # Надсилаємо клавіатуру
         await message.answer("Приємного перегляду! 🍿", reply_markup=get_main_keyboard(is_admin))
@@ -284,23 +271,9 @@ async def send_anime_movie_from_deeplink(message: Message, bot: Bot, movie_id: s
     ])
 
     try:
-        video_file_id = movie.get("video_file_id")
-        video_type = movie.get("video_type", "video")
-
-        if video_type == "video":
-            await bot.send_video(
-                chat_id=message.from_user.id,
-                video=video_file_id,
-                caption=caption,
-                reply_markup=video_buttons
-            )
-        else:
-            await bot.send_document(
-                chat_id=message.from_user.id,
-                document=video_file_id,
-                caption=caption,
-                reply_markup=video_buttons
-            )
+        await send_movie_video(
+            bot, message.from_user.id, movie, caption, reply_markup=video_buttons
+        )
 
         await message.answer("Приємного перегляду! 🍿", reply_markup=get_main_keyboard(is_admin))
 
@@ -1809,6 +1782,7 @@ async def btn_admin(message: Message):
         "/autoAnimeMovie — Аніме-фільм\n"
         "/autoAnimeDownload — Аніме-серіал\n"
         "/cancelAnimeDownload — Зупинити\n\n"
+        "/mediaQueue — Черга обробки відео\n\n"
         "🔄 <b>Оновлення:</b>\n"
         "/checkUpdates — Перевірити нові серії\n\n"
         "<b>Мультфільми:</b>\n"
@@ -1,3 +1,3 @@
-from .helpers import send_movie_video, convert_video_to_mp4, cleanup_temp_files
+from .helpers import send_movie_video, convert_video_to_mp4, cleanup_temp_files, upload_input
 
-__all__ = ["send_movie_video", "convert_video_to_mp4", "cleanup_temp_files"]
+__all__ = ["send_movie_video", "convert_video_to_mp4", "cleanup_temp_files", "upload_input"]
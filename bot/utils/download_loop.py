@@ -1,23 +1,51 @@
 import asyncio
+import glob
+import html
 import logging
 import os
 import shutil
+import socket
 
 from aiogram import Bot
 from aiogram.types import FSInputFile, InlineKeyboardMarkup, InlineKeyboardButton
 
 from bot.config import config
 from bot.database.auto_download_jobs import (
-    get_job, update_job_progress, set_job_status
+    get_job, update_job_progress, set_job_status, finish_running_job,
+    update_segment_manifest, clear_segment_manifest,
 )
-from bot.database.movies import add_episode_to_series, get_episode
-from bot.utils.ffmpeg_runner import run_ffmpeg, get_video_info, create_thumbnail, format_quality
+from bot.database.download_tasks import (
+    enqueue_job_tasks, claim_task, heartbeat_task, complete_task, fail_task,
+    release_task, pause_job_tasks, get_job_task_counts, get_failed_tasks,
+    get_first_unfinished_idx, task_exists,
+)
+from bot.database.movies import add_episode_to_series, get_season_episode_numbers
+from bot.utils import hls
+from bot.utils.ffmpeg_runner import run_ffmpeg, probe_media, format_quality
+from bot.utils.helpers import upload_input
+from bot.utils.movie_job import run_movie_job
+from bot.utils.progress_reporter import ProgressReporter
 from bot.utils.scraper import get_m3u8_url
 
 logger = logging.getLogger(__name__)
 
 # Tracks which jobs are currently active; maps job_id -> asyncio.Task
 _active_tasks: dict[str, asyncio.Task] = {}
+# job_id -> event set by cancel_job; the loop checks it instead of re-reading the job
+_cancel_events: dict[str, asyncio.Event] = {}
+
+# Download attempts per episode; later attempts resume from the segment store
+_EPISODE_ATTEMPTS = 3
+_RETRY_DELAY = 30  # seconds between attempts
+
+# Episodes on disk at once: one uploading while the next one downloads
+_PIPELINE_DEPTH = 2
+
+# How long cancel_job waits for the cancelled loop to clean up
+_CANCEL_TIMEOUT = 15
+
+# Task queue worker: pause between claims when there is nothing to do
+_IDLE_POLL = 10
 
 
 def _format_ep_range(nums: list[int]) -> str:
@@ -39,22 +67,97 @@ def _format_ep_range(nums: list[int]) -> str:
     return ", ".join(ranges)
 
 
+def _episode(job: dict, idx: int) -> dict:
+    """
+    Episode idx of a job: {"idx", "url", "ep_num", "season", "key", "label"}.
+    A whole-series job keeps the season of every episode in episode_seasons;
+    key names its files and segment store — the season is part of it there,
+    since episode numbers repeat across seasons.
+    """
+    ep_num = job["episode_numbers"][idx]
+    seasons = job.get("episode_seasons")
+    season = seasons[idx] if seasons else job["season"]
+    return {
+        "idx": idx,
+        "url": job["episode_urls"][idx],
+        "ep_num": ep_num,
+        "season": season,
+        "key": f"{season}_{ep_num}" if seasons else str(ep_num),
+        "label": f"S{season}E{ep_num}",
+    }
+
+
+def _seasons_label(job: dict) -> str:
+    """'сезон 2', or 'сезони 1-4' for a whole-series job."""
+    seasons = job.get("episode_seasons")
+    if not seasons:
+        return f"сезон {job['season']}"
+    return f"сезони {_format_ep_range(list(set(seasons)))}"
+
+
+def job_summary(job: dict) -> str:
+    """How a job is named to the admin: '«Title» (сезон 2)' or 'фільм «Title»'."""
+    if job.get("kind") == "movie":
+        return f"фільм «{job['series_title']}»"
+    return f"«{job['series_title']}» ({_seasons_label(job)})"
+
+
 def is_job_running(job_id: str) -> bool:
     task = _active_tasks.get(job_id)
     return task is not None and not task.done()
 
 
 async def start_job(bot: Bot, job_id: str) -> None:
-    """Schedule the download loop as a background task."""
+    """
+    Schedule the download loop (or a movie job) as a background task. With
+    TASK_QUEUE the job's episodes are put in the task queue instead, for any
+    worker to take. A paused job (e.g. a new request was merged into it) is
+    set running again first.
+    """
+    job = await get_job(job_id)
+    if not job or job["status"] not in ("running", "paused"):
+        return
+    if job["status"] == "paused":
+        await set_job_status(job_id, "running")
+    if config.TASK_QUEUE:
+        await enqueue_job_tasks(job)
+        return
     if is_job_running(job_id):
         return
-    task = asyncio.create_task(_run_loop(bot, job_id))
+    _cancel_events[job_id] = asyncio.Event()
+    if job.get("kind") == "movie":
+        task = asyncio.create_task(_run_movie(bot, job_id))
+    else:
+        task = asyncio.create_task(_run_loop(bot, job_id))
     _active_tasks[job_id] = task
-    task.add_done_callback(lambda _: _active_tasks.pop(job_id, None))
+
+    def _forget(_):
+        _active_tasks.pop(job_id, None)
+        _cancel_events.pop(job_id, None)
+
+    task.add_done_callback(_forget)
 
 
 async def cancel_job(job_id: str) -> None:
-    """Request cancellation. The loop checks after each episode."""
+    """
+    Stop a job now. The running task is cancelled, which kills its ffmpeg
+    processes and removes partial files; the loop itself records the paused
+    state with the first episode that isn't uploaded yet as the resume point.
+    Waits up to _CANCEL_TIMEOUT for that cleanup to finish.
+    """
+    if config.TASK_QUEUE:
+        # Workers find out on their next heartbeat and kill their ffmpeg
+        await pause_job_tasks(job_id)
+        await _sync_task_progress(job_id)
+        await set_job_status(job_id, "paused")
+        return
+    event = _cancel_events.get(job_id)
+    if event:
+        event.set()
+    task = _active_tasks.get(job_id)
+    if task is not None and not task.done():
+        task.cancel()
+        await asyncio.wait([task], timeout=_CANCEL_TIMEOUT)
     await set_job_status(job_id, "paused")
 
 
@@ -64,155 +167,234 @@ async def _check_disk(min_gb: float = 1.0) -> bool:
     return free_gb >= min_gb
 
 
-async def _run_loop(bot: Bot, job_id: str) -> None:
-    job = await get_job(job_id)
-    if not job:
-        logger.error(f"Job {job_id} not found")
-        return
+def _segments_dir(job_id: str, key: str) -> str:
+    """Persistent segment store of one episode; survives failures and restarts."""
+    return f"/tmp/{job_id}_e{key}.segments"
 
-    series_id = job["series_id"]
-    series_title = job["series_title"]
-    season = job["season"]
-    episode_urls = job["episode_urls"]
-    episode_numbers = job.get("episode_numbers") or list(range(1, len(episode_urls) + 1))
-    total = job["total_episodes"]
-    admin_id = job["admin_id"]
-    start_from = job["current_episode"]  # resume support
 
-    if not await _check_disk():
-        await bot.send_message(
-            admin_id,
-            "❌ Менше 1GB вільного місця на диску. Завантаження скасовано."
-        )
-        await set_job_status(job_id, "error")
+async def _record_segment_store(job_id: str, key: str, segments_dir: str) -> None:
+    """Save the store's progress on the job document (best effort)."""
+    manifest = await asyncio.to_thread(hls.read_manifest, segments_dir)
+    if manifest is None:
         return
+    try:
+        await update_segment_manifest(job_id, key, {
+            "dir": segments_dir,
+            "playlist_url": manifest.get("playlist_url"),
+            "segments": manifest.get("segments", 0),
+            "done": manifest["done"],
+        })
+    except Exception as e:
+        logger.warning(f"Job {job_id}: failed to record segment manifest for e{key}: {e}")
 
-    skipped_eps: list[int] = []
-
-    async def flush_skipped() -> None:
-        """Send a single summary message for buffered skipped episodes."""
-        if not skipped_eps:
-            return
-        if len(skipped_eps) == 1:
-            text = f"⏭ S{season}E{skipped_eps[0]} вже є в базі, пропущено"
-        else:
-            text = f"⏭ Вже є в базі, пропущено {len(skipped_eps)} серій: {_format_ep_range(skipped_eps)}"
-        await bot.send_message(admin_id, text)
-        skipped_eps.clear()
 
-    for idx in range(start_from, total):
-        # Check disk space before each episode
-        if not await _check_disk():
-            await flush_skipped()
-            await bot.send_message(
-                admin_id,
-                "❌ Менше 1GB вільного місця на диску. Завантаження зупинено."
-            )
-            await set_job_status(job_id, "error")
-            return
-
-        # Check for cancellation before each episode
-        fresh_job = await get_job(job_id)
-        if fresh_job and fresh_job["status"] == "paused":
-            await flush_skipped()
-            await bot.send_message(
-                admin_id,
-                f"⏹ Завантаження зупинено після серії {idx}. "
-                f"Додано {idx}/{total} серій."
-            )
-            return
+async def _remove_segment_store(job_id: str, key: str) -> None:
+    await asyncio.to_thread(shutil.rmtree, _segments_dir(job_id, key), True)
+    await clear_segment_manifest(job_id, key)
 
-        episode_url = episode_urls[idx]
-        ep_num = episode_numbers[idx]
-        output_path = f"/tmp/{job_id}_e{ep_num}.mp4"
 
-        # Skip episodes that are already in the database — buffer, don't send yet
-        if await get_episode(series_id, season, ep_num):
-            await update_job_progress(job_id, idx + 1)
-            skipped_eps.append(ep_num)
-            continue
+async def _sweep_segment_stores(job_id: str) -> None:
+    """Drop stores left by episodes that failed for good once the job is finished."""
+    for path in await asyncio.to_thread(glob.glob, f"/tmp/{job_id}_e*.segments"):
+        await asyncio.to_thread(shutil.rmtree, path, True)
+    await clear_segment_manifest(job_id)
 
-        # Flush skipped buffer before starting a real download
-        await flush_skipped()
 
-        thumb_path = output_path + ".thumb.jpg"
-        try:
-            # 1. Get m3u8
-            m3u8_url = await get_m3u8_url(episode_url, dubbing=job.get("dubbing"))
-
-            # 2. Download + remux with faststart (auto-compresses if > 1.9 GB)
-            was_compressed = await run_ffmpeg(m3u8_url, output_path)
-            if was_compressed:
-                await bot.send_message(
-                    admin_id,
-                    f"⚠️ S{season}E{ep_num}: файл перевищував 1.9 ГБ — перекодовано для Telegram."
-                )
+async def _download_episode(job_id: str, job: dict, ep: dict, output_path: str,
+                            segments_dir: str, reporter: ProgressReporter) -> bool:
+    """
+    Resolve the episode's m3u8 and produce output_path, retrying failures.
+    The m3u8 is resolved again on every attempt (CDN links expire), while
+    segments already in segments_dir are reused. Returns run_ffmpeg's result.
+    """
+    label = ep["label"]
 
-            # 3. Get video metadata and thumbnail
-            duration, width, height = await get_video_info(output_path)
-            has_thumb = await create_thumbnail(output_path, thumb_path)
+    async def on_compress_progress(pct: int) -> None:
+        reporter.set_stage("download", f"⚙️ {label}: перекодування {pct}%")
 
-            # 4. Upload to storage channel (local Bot API server — no size limit)
-            caption = (
-                f"id:{series_id}\n"
-                f"season:{season}\n"
-                f"episode:{ep_num}\n"
-                f"name:{series_title}"
+    for attempt in range(1, _EPISODE_ATTEMPTS + 1):
+        try:
+            m3u8_url = await get_m3u8_url(
+                ep["url"], dubbing=job.get("dubbing"),
+                content_type=job.get("content_type", "series"),
             )
-            sent = await bot.send_video(
-                config.STORAGE_CHANNEL_ID,
-                video=FSInputFile(output_path),
-                caption=caption,
-                supports_streaming=True,
-                width=width or None,
-                height=height or None,
-                duration=duration or None,
-                thumbnail=FSInputFile(thumb_path) if has_thumb else None,
+            return await run_ffmpeg(
+                m3u8_url, output_path, on_compress_progress=on_compress_progress,
+                segments_dir=segments_dir,
+                label=f"{job['series_title']} {label}",
+                max_height=hls.max_height_for(job["content_type"]),
             )
-            file_id = sent.video.file_id
-            file_size = sent.video.file_size or 0
-            duration = sent.video.duration or 0
-
-            # 4. Add to database
-            await add_episode_to_series(
-                series_id=series_id,
-                season=season,
-                episode=ep_num,
-                video_file_id=file_id,
-                video_type="video",
-                file_size=file_size,
-                duration=duration,
+        except Exception as e:
+            await _record_segment_store(job_id, ep["key"], segments_dir)
+            if attempt == _EPISODE_ATTEMPTS:
+                raise
+            logger.warning(
+                f"Job {job_id} episode {label} attempt {attempt}/{_EPISODE_ATTEMPTS} failed: {e}; "
+                f"retrying in {_RETRY_DELAY}s"
+            )
+            reporter.set_stage(
+                "download", f"🔁 {label}: спроба {attempt + 1}/{_EPISODE_ATTEMPTS} через {_RETRY_DELAY} с"
             )
+            await asyncio.sleep(_RETRY_DELAY)
 
-            # 5. Update progress
-            await update_job_progress(job_id, idx + 1)
 
-            # 6. Notify admin
-            quality_label = format_quality(width, height)
-            await bot.send_message(
-                admin_id,
-                f"✅ S{season}E{ep_num} додано ({ep_num}/{total}) · {quality_label}"
-            )
+async def _store_episode(bot: Bot, job_id: str, job: dict, item: dict) -> int:
+    """
+    Upload a prepared episode to the storage channel and add it to the
+    series. Raises on failure. Returns the uploaded file size.
+    """
+    series_id, season, ep_num = job["series_id"], item["season"], item["ep_num"]
+    media = item["media"]
+
+    # 4. Upload to storage channel (local Bot API server — no size limit,
+    #    the server reads the file from disk itself)
+    caption = (
+        f"id:{series_id}\n"
+        f"season:{season}\n"
+        f"episode:{ep_num}\n"
+        f"name:{job['series_title']}"
+    )
+    sent = await bot.send_video(
+        config.STORAGE_CHANNEL_ID,
+        video=upload_input(bot, item["output_path"]),
+        caption=caption,
+        supports_streaming=True,
+        width=media["width"] or None,
+        height=media["height"] or None,
+        duration=media["duration"] or None,
+        thumbnail=FSInputFile(item["thumb_path"]) if media["has_thumb"] else None,
+    )
 
-        except Exception as e:
-            logger.error(f"Job {job_id} episode {ep_num} failed: {e}")
-            try:
-                await bot.send_message(
-                    admin_id,
-                    f"⚠️ Помилка на S{season}E{ep_num}: {str(e)[:200]}\n"
-                    f"Продовжую з наступною серією..."
-                )
-            except Exception:
-                pass
-        finally:
-            if await asyncio.to_thread(os.path.exists, output_path):
-                await asyncio.to_thread(os.remove, output_path)
-            if await asyncio.to_thread(os.path.exists, thumb_path):
-                await asyncio.to_thread(os.remove, thumb_path)
+    # 5. Add to database
+    await add_episode_to_series(
+        series_id=series_id,
+        season=season,
+        episode=ep_num,
+        video_file_id=sent.video.file_id,
+        video_type="video",
+        file_size=sent.video.file_size or 0,
+        duration=sent.video.duration or 0,
+    )
+    await _remove_segment_store(job_id, item["key"])
+    return media["size"]
+
+
+async def _upload_episode(bot: Bot, job_id: str, job: dict, item: dict,
+                          reporter: ProgressReporter) -> bool:
+    """
+    Upload stage for one prepared episode: storage channel → DB → progress → reporter.
+    Returns True once the episode is in the database.
+    """
+    label = item["label"]
+    try:
+        if item["was_compressed"]:
+            reporter.note(f"{label}: файл перевищував 1.9 ГБ — перекодовано для Telegram")
+        media = item["media"]
+        reporter.set_stage(
+            "upload", f"📤 {label}: вивантаження в канал ({format_quality(media['width'], media['height'])})"
+        )
+        size = await _store_episode(bot, job_id, job, item)
+        await update_job_progress(job_id, item["idx"] + 1)
+        reporter.item_added(size)
+        return True
+
+    except Exception as e:
+        logger.error(f"Job {job_id} episode {label} failed: {e}")
+        reporter.item_failed(label, e)
+        return False
+    finally:
+        reporter.clear_stage("upload")
 
-    await flush_skipped()
-    await set_job_status(job_id, "done")
 
+async def _prepare_episode(job_id: str, job: dict, idx: int, reporter: ProgressReporter) -> dict:
+    """
+    Producer stage for one episode: resolve, download (+ compress) and probe.
+    Returns a "ready" item with everything the upload stage needs, or a
+    "failed" item (files already cleaned up) that the uploader reports in order.
+    """
+    ep = _episode(job, idx)
+    output_path = f"/tmp/{job_id}_e{ep['key']}.mp4"
+    thumb_path = output_path + ".thumb.jpg"
+    segments_dir = _segments_dir(job_id, ep["key"])
+    item = {**ep, "type": "ready", "output_path": output_path, "thumb_path": thumb_path}
+    reporter.set_stage("download", f"📥 {ep['label']}: завантаження")
+    try:
+        # 1-2. Get m3u8, download segments + remux to mp4 (auto-compresses if > 1.9 GB)
+        item["was_compressed"] = await _download_episode(
+            job_id, job, ep, output_path, segments_dir, reporter
+        )
+        # 3. Get video metadata and thumbnail
+        item["media"] = await probe_media(output_path, thumb_path)
+        return item
+    except asyncio.CancelledError:
+        # Partial mp4/thumbnail go; the segment store stays for the resume
+        await _remove_episode_files(item)
+        await _record_segment_store(job_id, ep["key"], segments_dir)
+        raise
+    except Exception as e:
+        logger.error(f"Job {job_id} episode {ep['label']} failed: {e}")
+        await _remove_episode_files(item)
+        return {**item, "type": "failed", "error": e}
+    finally:
+        reporter.clear_stage("download")
+
+
+async def _remove_episode_files(item: dict) -> None:
+    for path in (item.get("output_path"), item.get("thumb_path")):
+        if path and await asyncio.to_thread(os.path.exists, path):
+            await asyncio.to_thread(os.remove, path)
+
+
+async def _produce_episodes(job_id: str, job: dict, start_from: int,
+                            out: asyncio.Queue, disk_slots: asyncio.Semaphore,
+                            existing: dict[int, set[int]], cancelled: asyncio.Event,
+                            reporter: ProgressReporter) -> None:
+    """
+    Walk the episodes in order and feed the upload stage through `out`.
+    An episode is only downloaded once one of the disk_slots is free, so at
+    most _PIPELINE_DEPTH episodes are on disk at any moment.
+    existing: season -> episode numbers already in it (loaded once, kept current);
+    cancelled: set by cancel_job — no per-episode database reads are needed.
+    """
+
+    async def stop_reason(idx: int) -> dict | None:
+        if not await _check_disk():
+            return {"type": "stop", "reason": "disk", "idx": idx}
+        if cancelled.is_set():
+            return {"type": "stop", "reason": "paused", "idx": idx}
+        return None
+
+    try:
+        for idx in range(start_from, job["total_episodes"]):
+            # Check disk space and cancellation before each episode
+            stop = await stop_reason(idx)
+            if stop:
+                await out.put(stop)
+                return
+
+            ep = _episode(job, idx)
+            # Skip episodes that are already in the database
+            if ep["ep_num"] in existing[ep["season"]]:
+                await out.put({**ep, "type": "skip"})
+                continue
+
+            await disk_slots.acquire()
+            # The wait for a slot can be long (previous upload) — check again
+            stop = await stop_reason(idx)
+            if stop:
+                disk_slots.release()
+                await out.put(stop)
+                return
+            await out.put(await _prepare_episode(job_id, job, idx, reporter))
+        await out.put({"type": "end"})
+    except Exception as e:
+        await out.put({"type": "crash", "error": e})
+
+
+async def _done_markup(bot: Bot, job: dict) -> InlineKeyboardMarkup:
+    """Buttons of the final report of a finished season (or whole series)."""
+    series_id = job["series_id"]
+    season = max(job.get("episode_seasons") or [job["season"]])
     bot_info = await bot.get_me()
     is_anime = job.get("content_type") == "anime_series"
     view_prefix = "as_" if is_anime else "s_"
@@ -224,7 +406,7 @@ async def _run_loop(bot: Bot, job_id: str) -> None:
 
     view_url = f"https://t.me/{bot_info.username}?start={view_prefix}{series_id}"
 
-    done_markup = InlineKeyboardMarkup(inline_keyboard=[
+    return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="📢 Зробити розсилку", callback_data=f"post_quick:{post_type}:{series_id}")],
         [InlineKeyboardButton(text="📺 Переглянути серіал", url=view_url)],
         [InlineKeyboardButton(
@@ -235,9 +417,355 @@ async def _run_loop(bot: Bot, job_id: str) -> None:
          InlineKeyboardButton(text=add_movie_label, callback_data=add_movie_cb)],
     ])
 
-    await bot.send_message(
-        admin_id,
-        f"🎉 <b>Готово!</b> Всі {total} серій сезону {season} "
+
+
+async def _run_loop(bot: Bot, job_id: str) -> None:
+    """
+    Run the job until it is finished. Another pass is only needed when
+    create_job merged new episodes into it while the last pass was ending.
+    One live message covers all passes; the final report is sent once, here.
+    """
+    job = await get_job(job_id)
+    if not job:
+        logger.error(f"Job {job_id} not found")
+        return
+    admin_id = job["admin_id"]
+
+    if not await _check_disk():
+        await bot.send_message(
+            admin_id,
+            "❌ Менше 1GB вільного місця на диску. Завантаження скасовано."
+        )
+        await set_job_status(job_id, "error")
+        return
+
+    reporter = ProgressReporter(
+        bot, admin_id, f"{job['series_title']} · {_seasons_label(job)}",
+        job["total_episodes"], already=job["current_episode"],
+    )
+    await reporter.start()
+    skipped_eps: dict[int, list[int]] = {}
+
+    async def finish(headline: str, reply_markup: InlineKeyboardMarkup | None = None) -> None:
+        """Final report; skipped episodes go into it as compact ranges per season."""
+        for season, nums in sorted(skipped_eps.items()):
+            prefix = f"S{season}: " if job.get("episode_seasons") else ""
+            reporter.note(f"Вже були в базі, пропущено: {prefix}{_format_ep_range(nums)}")
+        await reporter.finish(headline, reply_markup)
+
+    try:
+        while True:
+            outcome = await _run_pass(bot, job_id, job, reporter, skipped_eps)
+            if outcome is not None:
+                break
+            logger.info(f"Job {job_id}: episodes were merged in, continuing")
+            job = await get_job(job_id)
+            if not job:
+                logger.error(f"Job {job_id} disappeared while running")
+                reporter.close()
+                return
+    except asyncio.CancelledError:
+        # _run_pass has already saved where the job resumes
+        fresh = await get_job(job_id) or job
+        resume_idx, total = fresh["current_episode"], fresh["total_episodes"]
+        await finish(
+            f"⏹ Завантаження зупинено. Додано {resume_idx}/{total} серій, "
+            f"продовження — з {resume_idx + 1}-ї."
+        )
+        raise
+    except Exception as e:
+        # Nobody awaits the job task: record the end here instead of re-raising,
+        # so the job doesn't stay "running" with nothing executing it
+        logger.exception(f"Job {job_id} crashed")
+        try:
+            await set_job_status(job_id, "error")
+        except Exception as db_error:
+            logger.error(f"Job {job_id}: could not mark it as failed: {db_error}")
+        await finish(f"❌ Завантаження перервано: {str(e)[:300]}")
+        return
+    await finish(*outcome)
+
+
+async def _run_movie(bot: Bot, job_id: str) -> None:
+    try:
+        await run_movie_job(bot, job_id)
+    except Exception:
+        pass  # already logged and reported to the admin by run_movie_job
+
+
+async def _run_pass(bot: Bot, job_id: str, job: dict, reporter: ProgressReporter,
+                    skipped_eps: dict[int, list[int]]) -> tuple | None:
+    """
+    Two-stage pipeline: _produce_episodes resolves, downloads and probes
+    episode N+1 while this loop uploads episode N. Items arrive strictly in
+    episode order, so progress messages and DB writes keep their order.
+    Returns the (headline, reply_markup) of the final report, or None if the
+    job got new episodes and needs another pass. A cancel or an error
+    propagates to _run_loop (with the resume point saved), which records the
+    job's status and sends the report.
+    """
+    series_id = job["series_id"]
+    series_title = job["series_title"]
+    episode_urls = job["episode_urls"]
+    job["episode_numbers"] = job.get("episode_numbers") or list(range(1, len(episode_urls) + 1))
+    total = job["total_episodes"]
+    start_from = job["current_episode"]  # resume support
+
+    # One projected read per season instead of a full series document per episode
+    seasons = job.get("episode_seasons") or [job["season"]]
+    existing = {season: await get_season_episode_numbers(series_id, season)
+                for season in sorted(set(seasons))}
+    cancelled = _cancel_events.setdefault(job_id, asyncio.Event())
+
+    ready: asyncio.Queue = asyncio.Queue(maxsize=1)
+    disk_slots = asyncio.Semaphore(_PIPELINE_DEPTH)
+    producer = asyncio.create_task(
+        _produce_episodes(job_id, job, start_from, ready, disk_slots, existing, cancelled, reporter)
+    )
+    # First episode not handled yet — where a cancelled job resumes
+    resume_idx = start_from
+    try:
+        while True:
+            item = await ready.get()
+            kind = item["type"]
+            if kind == "end":
+                break
+            if kind == "crash":
+                raise item["error"]
+
+            if kind == "stop":
+                idx = item["idx"]
+                if item["reason"] == "disk":
+                    await set_job_status(job_id, "error")
+                    return "❌ Менше 1GB вільного місця на диску. Завантаження зупинено.", None
+                return (
+                    f"⏹ Завантаження зупинено після серії {idx}. "
+                    f"Додано {idx}/{total} серій.",
+                    None,
+                )
+
+            idx, ep_num = item["idx"], item["ep_num"]
+            resume_idx = idx
+            if kind == "skip":
+                # Already in the database — only counted, listed in the final report
+                await update_job_progress(job_id, idx + 1)
+                skipped_eps.setdefault(item["season"], []).append(ep_num)
+                reporter.item_skipped()
+                resume_idx = idx + 1
+                continue
+
+            try:
+                if kind == "failed":
+                    reporter.item_failed(item["label"], item["error"])
+                    resume_idx = idx + 1
+                    continue
+                if await _upload_episode(bot, job_id, job, item, reporter):
+                    existing[item["season"]].add(ep_num)
+                resume_idx = idx + 1
+            finally:
+                await _remove_episode_files(item)
+                disk_slots.release()
+    except asyncio.CancelledError:
+        # cancel_job: stop the download stage first so its ffmpeg is killed
+        # and its partial files are gone before the job is marked paused
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        await update_job_progress(job_id, resume_idx)
+        await set_job_status(job_id, "paused")
+        logger.info(f"Job {job_id} cancelled, resumes at episode index {resume_idx}")
+        raise
+    except Exception:
+        # Best effort: the error may well be the database itself
+        try:
+            await update_job_progress(job_id, resume_idx)
+        except Exception as e:
+            logger.warning(f"Job {job_id}: could not save progress after a crash: {e}")
+        raise
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        # Episodes prepared but never uploaded: their files go, the segment
+        # stores stay for the resume
+        while not ready.empty():
+            await _remove_episode_files(ready.get_nowait())
+
+    # Conditional on total: episodes merged in by create_job keep the job running
+    if not await finish_running_job(job_id, total):
+        fresh = await get_job(job_id)
+        if fresh and fresh["status"] == "running" and fresh["total_episodes"] > total:
+            # Same live message: the merged episodes only raise its total
+            reporter.total = fresh["total_episodes"]
+            reporter.title = f"{series_title} · {_seasons_label(fresh)}"
+            reporter.note(f"Додано ще {fresh['total_episodes'] - total} серій")
+            return None
+        await set_job_status(job_id, "done")
+    await _sweep_segment_stores(job_id)
+
+    done_markup = await _done_markup(bot, job)
+    return (
+        f"🎉 <b>Готово!</b> Всі {total} серій ({_seasons_label(job)}) "
         f"серіалу «{series_title}» успішно завантажено!",
-        reply_markup=done_markup,
+        done_markup,
     )
+
+
+# ── Task queue worker (TASK_QUEUE=1) ─────────────────────────────────────────
+
+async def run_worker(bot: Bot, slots: int | None = None) -> None:
+    """
+    Execute episode tasks from the download_tasks collection until cancelled.
+    Runs `slots` episodes at once (WORKER_SLOTS); any number of processes on
+    any number of machines can run workers against the same database.
+    """
+    slots = config.WORKER_SLOTS if slots is None else slots
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Download worker {worker_id} started with {slots} slots")
+    await asyncio.gather(*(_worker_slot(bot, worker_id) for _ in range(slots)))
+
+
+async def _worker_slot(bot: Bot, worker_id: str) -> None:
+    while True:
+        try:
+            task = await claim_task(worker_id, config.TASK_LEASE_SECONDS)
+        except Exception as e:
+            logger.warning(f"Worker {worker_id}: claiming a task failed: {e}")
+            task = None
+        if task is None:
+            await asyncio.sleep(_IDLE_POLL)
+            continue
+        try:
+            await _run_task(bot, worker_id, task)
+        except Exception as e:
+            # Bookkeeping failed (e.g. MongoDB unavailable): the lease expires
+            # and the task is taken again — the slot itself keeps running
+            logger.error(f"Worker {worker_id}: task {task['_id']} of job {task['job_id']} failed: {e}")
+            await asyncio.sleep(_IDLE_POLL)
+
+
+async def _run_task(bot: Bot, worker_id: str, task: dict) -> None:
+    """
+    Execute one claimed task while extending its lease. If the lease is lost
+    (job paused, or the worker was too slow and someone else took it), the
+    work is cancelled — which kills its ffmpeg — and the task left alone.
+    """
+    job_id, ep_num = task["job_id"], task["episode"]
+    work = asyncio.create_task(_execute_task(bot, task))
+    try:
+        while True:
+            done, _ = await asyncio.wait([work], timeout=config.TASK_LEASE_SECONDS / 3)
+            if done:
+                break
+            try:
+                still_ours = await heartbeat_task(task["_id"], worker_id, config.TASK_LEASE_SECONDS)
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {job_id} e{ep_num} failed: {e}")
+                continue
+            if not still_ours:
+                logger.info(f"Lease lost for job {job_id} e{ep_num}, stopping it")
+                work.cancel()
+                await asyncio.gather(work, return_exceptions=True)
+                return
+        skipped = work.result()
+    except asyncio.CancelledError:
+        # Worker shutting down: give the task back for another worker
+        work.cancel()
+        await asyncio.gather(work, return_exceptions=True)
+        await release_task(task["_id"], worker_id)
+        raise
+    except Exception as e:
+        status = await fail_task(task, worker_id, str(e),
+                                 config.TASK_MAX_ATTEMPTS, config.TASK_RETRY_BASE)
+        logger.error(
+            f"Job {job_id} e{ep_num} attempt {task['attempts']}/{config.TASK_MAX_ATTEMPTS} "
+            f"failed ({status}): {e}"
+        )
+        if status == "failed":
+            await _finish_job_if_complete(bot, job_id)
+        return
+
+    if await complete_task(task["_id"], worker_id, skipped):
+        await _finish_job_if_complete(bot, job_id)
+
+
+async def _execute_task(bot: Bot, task: dict) -> bool:
+    """
+    Download and upload one episode (or run a whole movie job, its only
+    task). Returns True if the episode was already in the season.
+    """
+    job_id = task["job_id"]
+    job = await get_job(job_id)
+    if not job or job["status"] != "running":
+        raise RuntimeError("job is not running")
+    if job.get("kind") == "movie":
+        await run_movie_job(bot, job_id, final_attempt=task["attempts"] >= config.TASK_MAX_ATTEMPTS)
+        return False
+    job["episode_numbers"] = job.get("episode_numbers") or list(range(1, job["total_episodes"] + 1))
+
+    ep = _episode(job, task["idx"])
+    if ep["ep_num"] in await get_season_episode_numbers(job["series_id"], ep["season"]):
+        return True
+
+    # Not started: collects stage info only, job messages come from the final report
+    reporter = ProgressReporter(bot, job["admin_id"], job["series_title"])
+    item = await _prepare_episode(job_id, job, task["idx"], reporter)
+    try:
+        if item["type"] == "failed":
+            raise item["error"]
+        await _store_episode(bot, job_id, job, item)
+    finally:
+        await _remove_episode_files(item)
+    return False
+
+
+async def _sync_task_progress(job_id: str) -> None:
+    """current_episode follows the first unfinished task (the resume point)."""
+    idx = await get_first_unfinished_idx(job_id)
+    if idx is not None:
+        await update_job_progress(job_id, idx)
+
+
+async def _finish_job_if_complete(bot: Bot, job_id: str) -> None:
+    """
+    Keep the job's resume point current and, once no task of
+    the job is left to run, mark it done and send the final report. Only the
+    worker that flips the status sends it.
+    """
+    job = await get_job(job_id)
+    if not job:
+        return
+    job["episode_numbers"] = job.get("episode_numbers") or list(range(1, job["total_episodes"] + 1))
+    await _sync_task_progress(job_id)
+    counts = await get_job_task_counts(job_id)
+    if counts.get("queued") or counts.get("leased") or counts.get("paused"):
+        return
+    # Episodes merged in by create_job may not have their tasks yet
+    if not await task_exists(job_id, job["total_episodes"] - 1):
+        return
+    if not await finish_running_job(job_id, job["total_episodes"]):
+        return
+
+    await _sweep_segment_stores(job_id)
+    title = job["series_title"]
+    failed = await get_failed_tasks(job_id)
+    lines = [f"✅ Додано: {counts.get('done', 0)}"]
+    if counts.get("skipped"):
+        lines.append(f"⏭ Вже були в базі: {counts['skipped']}")
+    if failed:
+        headline = f"⚠️ <b>Серіал «{title}» ({_seasons_label(job)}) завантажено з помилками</b>"
+        lines.append(f"❌ Не вдалося ({len(failed)}):")
+        lines += [
+            f"• {_episode(job, t['idx'])['label']}: {html.escape(t.get('last_error', '')[:80])}"
+            for t in failed[:5]
+        ]
+    else:
+        headline = (
+            f"🎉 <b>Готово!</b> Всі {job['total_episodes']} серій ({_seasons_label(job)}) "
+            f"серіалу «{title}» успішно завантажено!"
+        )
+    try:
+        await bot.send_message(
+            job["admin_id"], headline + "\n\n" + "\n".join(lines),
+            reply_markup=await _done_markup(bot, job),
+        )
+    except Exception as e:
+        logger.warning(f"Job {job_id}: failed to send the final report: {e}")
@@ -1,13 +1,26 @@
 import asyncio
 import json
+import logging
 import math
 import os
 import re
 import shutil
 
-_TELEGRAM_SIZE_LIMIT = 1_980_000_000
+from bot.config import config
+from bot.utils import hls
+from bot.utils.media_pool import media_pool, niced
+
+logger = logging.getLogger(__name__)
+
+# Telegram upload limit with a margin; the scraper picks HLS variants against it too
+TELEGRAM_SIZE_LIMIT = 1_980_000_000
 _AUDIO_BITRATE_BPS = 192_000
 _TIME_RE = re.compile(r"out_time=(\d+):(\d+):(\d+\.\d+)")
+# ffmpeg's input banner (stderr), parsed by probe_media
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_BITRATE_RE = re.compile(r"bitrate: (\d+) kb/s")
+_VIDEO_STREAM_RE = re.compile(r"Stream #0:\d+.*?: Video: (\w+).*?, (\d{2,5})x(\d{2,5})")
+_AUDIO_STREAM_RE = re.compile(r"Stream #0:\d+.*?: Audio: (\w+)")
 
 
 def format_quality(width: int, height: int) -> str:
@@ -25,105 +38,669 @@ def format_quality(width: int, height: int) -> str:
     return f"{width}×{height}"
 
 
-_MIN_FREE_BYTES = 8 * 1024 ** 3  # require at least 8 GB free (faststart needs ~2× file size)
+_FREE_SPACE_MARGIN = 512 * 1024 ** 2  # headroom for the OS, thumbnails, logs
+# A single write of the mp4 needs the moov atom reserved at the start of the
+# file. Sample tables of a 25-60 fps H.264 + AAC stream take < 1 KB/s.
+_MOOV_BYTES_PER_SECOND = 1536
+_MOOV_MIN_BYTES = 256 * 1024
+
+
+def _moov_size(duration: float) -> int:
+    return int(_MOOV_MIN_BYTES + duration * _MOOV_BYTES_PER_SECOND)
+
+
+async def _ensure_free_space(path: str, required: int, what: str) -> None:
+    free = (await asyncio.to_thread(shutil.disk_usage, os.path.dirname(path) or "/tmp")).free
+    if free < required + _FREE_SPACE_MARGIN:
+        raise RuntimeError(
+            f"Недостатньо місця на диску: {free / 1024**3:.1f} ГБ вільно, "
+            f"потрібно {(required + _FREE_SPACE_MARGIN) / 1024**3:.1f} ГБ ({what})"
+        )
 
 
-async def run_ffmpeg(m3u8_url: str, output_path: str, on_compress_progress=None) -> bool:
+async def run_ffmpeg(m3u8_url: str, output_path: str, on_compress_progress=None,
+                     segments_dir: str | None = None, oversize_mode: str = "compress",
+                     label: str | None = None, max_height: int = 0) -> bool:
     """
-    Downloads m3u8 stream and produces a faststart-enabled mp4.
-    Steps: download + faststart in one pass → compress if > limit.
+    Downloads m3u8 stream and produces a streamable mp4.
+    Steps: parallel segment download → local remux (moov reserved up front,
+    every byte written once) → compress if > limit. When the downloaded
+    segments already show the result would be over the limit, they are
+    encoded straight into output_path instead, with no intermediate remux.
+    If the stream can't be fetched segment by segment, ffmpeg reads the URL directly.
     on_compress_progress: optional async callable(pct: int) called every ~5% during re-encode.
+    segments_dir: persistent segment store owned by the caller — kept after a
+    failure so the next attempt only fetches missing segments. Without it a
+    temporary store next to output_path is used and always removed.
+    oversize_mode: "compress" re-encodes a file over the limit; "split" leaves
+    it as is for split_to_limit().
+    label: how the job is shown in the media queue (/mediaQueue).
+    max_height: resolution cap (hls.max_height_for) used if m3u8_url turns out
+    to be a master playlist.
+    Download + remux runs in a "remux" slot of the global media pool and
+    re-encoding in an "encode" slot; the remux slot is released before any
+    encode starts, so a long re-encode never holds up other downloads.
     Returns True if the file was re-encoded due to size, False otherwise.
-    Raises RuntimeError if ffmpeg exits with non-zero code or times out.
+    Raises RuntimeError if ffmpeg exits with non-zero code, times out or the disk is too full.
     """
-    free = shutil.disk_usage(os.path.dirname(output_path) or "/tmp").free
-    if free < _MIN_FREE_BYTES:
-        raise RuntimeError(
-            f"Недостатньо місця на диску: {free // 1024**3} ГБ вільно, "
-            f"потрібно мінімум {_MIN_FREE_BYTES // 1024**3} ГБ "
-            f"(faststart потребує ~2× розмір файлу)"
-        )
+    label = label or os.path.basename(output_path)
+    work_dir = segments_dir or output_path + ".segments"
+    try:
+        async with media_pool.slot("remux", label):
+            # Variants are picked to fit the Telegram limit, so a stream is normally
+            # ≤ limit: its segments plus one remuxed copy have to fit on disk.
+            # Segments already in a resumed store are on disk and don't count again.
+            already = 0
+            if segments_dir and await asyncio.to_thread(os.path.isdir, segments_dir):
+                already = await asyncio.to_thread(hls.store_size, segments_dir)
+            await _ensure_free_space(output_path, max(0, 2 * TELEGRAM_SIZE_LIMIT - already), "сегменти + mp4")
+
+            encode = await _download_and_remux(m3u8_url, output_path, work_dir,
+                                               keep_store=bool(segments_dir),
+                                               oversize_mode=oversize_mode,
+                                               max_height=max_height)
+        if encode:
+            async with media_pool.slot("encode", label):
+                await _encode_to_limit(encode["playlist"], output_path, encode["duration"],
+                                       on_compress_progress, encode["starts"])
+            return True
+    finally:
+        if not segments_dir:
+            await asyncio.to_thread(shutil.rmtree, work_dir, True)
+
+    if oversize_mode != "split" and os.path.getsize(output_path) > TELEGRAM_SIZE_LIMIT:
+        async with media_pool.slot("encode", label):
+            await _compress_to_limit(output_path, on_compress_progress)
+        return True
+    return False
+
+
+async def _mux_mp4(input_args: list[str], output_path: str, duration: float) -> None:
+    """
+    Remux with -c copy into a streamable mp4. With a known duration the moov
+    atom is reserved at the start of the file (-moov_size), so the file is
+    written exactly once; +faststart (write, then rewrite the whole file) is
+    only used when the duration is unknown or the reservation turned out too small.
+    """
+    if duration:
+        try:
+            await _run_cmd(
+                ["ffmpeg", "-y", *input_args, "-c", "copy",
+                 "-moov_size", str(_moov_size(duration)), output_path],
+                timeout=7200,
+            )
+            return
+        except RuntimeError as e:
+            if "moov_size" not in str(e):
+                raise
+            logger.warning(f"Reserved moov space too small for {output_path}, falling back to +faststart")
 
     await _run_cmd(
-        ["ffmpeg", "-y", "-i", m3u8_url, "-c", "copy", "-movflags", "+faststart", output_path],
+        ["ffmpeg", "-y", *input_args, "-c", "copy", "-movflags", "+faststart", output_path],
         timeout=7200,
     )
 
-    if os.path.getsize(output_path) > _TELEGRAM_SIZE_LIMIT:
-        await _compress_to_limit(output_path, on_compress_progress)
-        return True
-    return False
+
+# Demuxer options that let ffmpeg read a downloaded playlist with its keys
+_LOCAL_HLS_OPTS = ["-allowed_extensions", "ALL", "-protocol_whitelist", "file,crypto,data"]
+
+
+def _input_opts(source: str) -> list[str]:
+    """Options that must precede -i (or the ffprobe input) for this source."""
+    return _LOCAL_HLS_OPTS if source.endswith(".m3u8") else []
+
+
+async def _download_and_remux(m3u8_url: str, output_path: str, work_dir: str,
+                              keep_store: bool = False,
+                              oversize_mode: str = "compress",
+                              max_height: int = 0) -> dict | None:
+    """
+    Fetch the HLS segments concurrently into work_dir, then remux the local
+    playlist with -c copy. AES-128 keys are downloaded too and decrypted by
+    ffmpeg while remuxing. Falls back to the sequential ffmpeg HLS reader
+    when the playlist is unsupported, or when the download fails and the
+    store is not kept (keep_store) for a later resume.
+    If the segments add up to more than the limit (and oversize_mode is
+    "compress"), nothing is remuxed — the oversized mp4 would only be written
+    to be read back by the encoder. Instead the local playlist is returned as
+    {"playlist", "duration", "starts"} for the caller to encode directly into
+    output_path in an "encode" slot. Returns None once output_path is remuxed.
+    work_dir is left for the caller to remove.
+    """
+    try:
+        local_playlist, duration = await hls.download_hls(
+            m3u8_url, work_dir, TELEGRAM_SIZE_LIMIT, max_height
+        )
+    except hls.UnsupportedPlaylist as e:
+        logger.info(f"Segment download skipped ({e}), ffmpeg reads the stream directly")
+        local_playlist = None
+    except Exception as e:
+        if keep_store:
+            # Keep what was fetched; the caller's retry resumes from the store
+            raise
+        logger.warning(f"Parallel segment download failed ({e}), falling back to ffmpeg HLS reader")
+        local_playlist = None
+
+    if local_playlist:
+        # The remuxed mp4 is as large as the segments it is built from
+        stream_bytes = await asyncio.to_thread(hls.store_size, work_dir)
+        if oversize_mode != "split" and stream_bytes > TELEGRAM_SIZE_LIMIT:
+            logger.info(
+                f"Stream is {stream_bytes // 1_000_000} MB, encoding segments "
+                f"directly into {output_path}"
+            )
+            # Segments start on keyframes in practice; -ss is frame-accurate
+            # for a re-encode either way, so they serve as chunk boundaries
+            starts = await asyncio.to_thread(hls.segment_start_times, local_playlist)
+            return {"playlist": local_playlist, "duration": duration, "starts": starts}
+        await _ensure_free_space(output_path, stream_bytes, "mp4 з сегментів")
+        await _mux_mp4([*_LOCAL_HLS_OPTS, "-i", local_playlist], output_path, duration)
+    else:
+        await _mux_mp4(["-i", m3u8_url], output_path, 0)
+    return None
+
+
+# Chunked encoding: below this duration one process is fast enough
+_MIN_CHUNKED_DURATION = 600
+_MIN_CHUNK_SECONDS = 60
+_CHUNKS_PER_WORKER = 2  # more chunks than workers evens out uneven chunk costs
+_ENCODE_TIMEOUT = 7200
+
+
+def _encode_workers() -> int:
+    return config.ENCODE_WORKERS or os.cpu_count() or 1
+
+
+class _EncodeProgress:
+    """Aggregates out_time of several ffmpeg processes into one percentage."""
+
+    def __init__(self, duration: float, callback=None):
+        self.duration = duration
+        self.callback = callback
+        self._elapsed: dict[int, float] = {}
+        self._last_reported = -1
+
+    async def update(self, key: int, elapsed: float) -> None:
+        if not self.callback:
+            return
+        self._elapsed[key] = elapsed
+        pct = min(99, int(sum(self._elapsed.values()) / self.duration * 100))
+        if pct >= self._last_reported + 5:
+            self._last_reported = pct
+            await self._report(pct)
+
+    async def finish(self) -> None:
+        if self.callback:
+            await self._report(100)
+
+    async def _report(self, pct: int) -> None:
+        try:
+            await self.callback(pct)
+        except Exception:
+            pass
+
+
+async def _run_with_progress(cmd: list[str], on_time=None) -> None:
+    """
+    Run an ffmpeg command that has -progress pipe:1, passing every out_time
+    (seconds) to on_time. The process is killed if the caller is cancelled.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *niced(cmd),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    try:
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                break
+            if on_time:
+                m = _TIME_RE.match(line.decode(errors="replace").strip())
+                if m:
+                    await on_time(int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3)))
+        await proc.wait()
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        stderr_task.cancel()
+        raise
+
+    stderr = await stderr_task
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"ffmpeg failed (code {proc.returncode}): {stderr.decode(errors='replace')[-500:]}"
+        )
+
+
+async def _keyframes(path: str) -> list[tuple[float, int]]:
+    """(time, byte offset) of the video keyframes, read from packet flags (no decoding)."""
+    proc = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,pos,flags",
+        "-of", "csv=p=0", *_input_opts(path), path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, _ = await _communicate(proc)
+    keyframes = []
+    for line in stdout.decode(errors="replace").splitlines():
+        fields = line.split(",")
+        if len(fields) < 3 or "K" not in fields[2]:
+            continue
+        try:
+            keyframes.append((float(fields[0]), int(fields[1])))
+        except ValueError:
+            continue
+    return sorted(keyframes)
+
+
+async def _keyframe_times(path: str) -> list[float]:
+    return [t for t, _ in await _keyframes(path)]
+
+
+def _chunk_bounds(keyframes: list[float], duration: float, chunks: int) -> list[tuple[float, float]]:
+    """
+    Split [0, duration) into up to `chunks` pieces that start on keyframes,
+    so every chunk can be encoded independently without touching its neighbours.
+    """
+    chunks = min(chunks, int(duration // _MIN_CHUNK_SECONDS))
+    if chunks < 2 or not keyframes:
+        return [(0.0, duration)]
+    starts = [0.0]
+    for i in range(1, chunks):
+        target = duration * i / chunks
+        cut = next((k for k in keyframes if k >= target), None)
+        if cut is not None and cut - starts[-1] >= _MIN_CHUNK_SECONDS and duration - cut >= _MIN_CHUNK_SECONDS:
+            starts.append(cut)
+    ends = starts[1:] + [duration]
+    return list(zip(starts, ends))
+
+
+# Size targeting: aim a little under the limit, cap the bitrate with VBV so
+# the average can't drift over it, and only re-encode what overshot
+_SIZE_MARGIN = 0.02
+_VBV_BUFFER_SECONDS = 2
+_MAX_ENCODE_ROUNDS = 3
+_COPY_AUDIO_CODECS = {"aac", "mp3"}  # already fine for Telegram players in mp4
+_UNKNOWN_AUDIO_BPS = 320_000         # assumed for a copied track without bit_rate
+
+
+def _x264_args(bitrate: int) -> list[str]:
+    return [
+        "-c:v", "libx264", "-b:v", str(bitrate),
+        "-maxrate", str(bitrate), "-bufsize", str(bitrate * _VBV_BUFFER_SECONDS),
+    ]
+
+
+def _corrected_bitrate(bitrate: int, budget: float, actual: float) -> int:
+    """Scale bitrate so an encode that produced `actual` bytes lands under `budget`."""
+    return int(bitrate * budget / actual * (1 - _SIZE_MARGIN))
+
+
+async def _audio_info(path: str) -> tuple[str | None, int]:
+    """(codec_name, bit_rate) of the first audio stream; (None, 0) when there is none."""
+    proc = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name,bit_rate",
+        "-of", "json", *_input_opts(path), path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, _ = await _communicate(proc)
+    try:
+        streams = json.loads(stdout).get("streams", [])
+    except ValueError:
+        streams = []
+    if not streams:
+        return None, 0
+    try:
+        bps = int(streams[0].get("bit_rate") or 0)
+    except ValueError:
+        bps = 0
+    return streams[0].get("codec_name"), bps
+
+
+def _audio_plan(codec: str | None, bps: int) -> tuple[list[str], int]:
+    """ffmpeg audio args and the audio bitrate they produce."""
+    if codec is None:
+        return ["-an"], 0
+    if codec in _COPY_AUDIO_CODECS:
+        return ["-c:a", "copy"], bps or _UNKNOWN_AUDIO_BPS
+    return ["-c:a", "aac", "-b:a", str(_AUDIO_BITRATE_BPS)], _AUDIO_BITRATE_BPS
 
 
 async def _compress_to_limit(path: str, progress_cb=None) -> None:
-    """Re-encode file to fit under _TELEGRAM_SIZE_LIMIT using calculated video bitrate."""
+    """Re-encode an mp4 in place to fit under TELEGRAM_SIZE_LIMIT."""
     duration, _, _ = await get_video_info(path)
     if not duration:
         raise RuntimeError("Cannot determine video duration for compression")
+    compressed_path = path + ".compressed.mp4"
+    try:
+        await _encode_to_limit(path, compressed_path, duration, progress_cb)
+        os.replace(compressed_path, path)
+    finally:
+        if os.path.exists(compressed_path):
+            os.remove(compressed_path)
+
 
-    target_video_bps = int(_TELEGRAM_SIZE_LIMIT * 8 / duration) - _AUDIO_BITRATE_BPS
-    if target_video_bps <= 0:
+async def _encode_to_limit(source: str, output_path: str, duration: float,
+                           progress_cb=None, keyframes: list[float] | None = None) -> None:
+    """
+    Encode source (an mp4 or a downloaded local playlist) into output_path
+    so that it fits under TELEGRAM_SIZE_LIMIT.
+    The video gets whatever the byte budget leaves after the audio track —
+    copied when it is already AAC/MP3, otherwise encoded to AAC — and is
+    encoded with -maxrate/-bufsize equal to that bitrate, so it can't drift
+    over. Outputs are verified and only an encode (or chunk) that still
+    overshot is re-run, at a bitrate corrected by the measured overshoot.
+    Long files are cut at keyframes into chunks that are encoded in parallel
+    (ENCODE_WORKERS processes), then joined with the concat demuxer without
+    another encode. keyframes: chunk boundary candidates if already known.
+    """
+    if not duration:
+        raise RuntimeError("Cannot determine video duration for compression")
+
+    audio_args, audio_bps = _audio_plan(*await _audio_info(source))
+    # twice the remux moov estimate: a re-encode is too expensive to repeat
+    moov_size = 2 * _moov_size(duration)
+    budget = int(TELEGRAM_SIZE_LIMIT * (1 - _SIZE_MARGIN)) - moov_size
+    video_budget = budget - audio_bps * duration / 8
+    if video_budget <= 0:
         raise RuntimeError(
             f"File is too long ({duration}s) to fit under "
-            f"{_TELEGRAM_SIZE_LIMIT // 1_000_000} MB even at minimum bitrate"
+            f"{TELEGRAM_SIZE_LIMIT // 1_000_000} MB even at minimum bitrate"
         )
 
-    compressed_path = path + ".compressed.mp4"
+    workers = _encode_workers()
+    bounds = [(0.0, float(duration))]
+    if workers > 1 and duration >= _MIN_CHUNKED_DURATION:
+        if keyframes is None:
+            keyframes = await _keyframe_times(source)
+        bounds = _chunk_bounds(keyframes, duration, workers * _CHUNKS_PER_WORKER)
+
+    # The source stays on disk while the output is written; chunked
+    # encoding also keeps the chunks until they are joined
+    await _ensure_free_space(
+        output_path, TELEGRAM_SIZE_LIMIT * (2 if len(bounds) > 1 else 1), "перекодування"
+    )
+
+    progress = _EncodeProgress(duration, progress_cb)
     try:
-        proc = await asyncio.create_subprocess_exec(
-            "ffmpeg", "-y", "-i", path,
-            "-c:v", "libx264", "-b:v", str(target_video_bps),
-            "-c:a", "aac", "-b:a", str(_AUDIO_BITRATE_BPS),
-            "-movflags", "+faststart",
+        async with asyncio.timeout(_ENCODE_TIMEOUT):
+            if len(bounds) == 1:
+                await _encode_single(source, output_path, duration, video_budget,
+                                     audio_args, moov_size, progress)
+            else:
+                await _encode_chunked(source, output_path, duration, bounds, video_budget,
+                                      audio_args, moov_size, workers, progress)
+    except TimeoutError:
+        raise RuntimeError(f"ffmpeg compression timed out after {_ENCODE_TIMEOUT}s")
+
+    size = os.path.getsize(output_path)
+    if size > TELEGRAM_SIZE_LIMIT:
+        raise RuntimeError(
+            f"Re-encoded file is still {size // 1_000_000} MB "
+            f"(limit {TELEGRAM_SIZE_LIMIT // 1_000_000} MB)"
+        )
+    await progress.finish()
+
+
+async def _encode_single(path: str, output_path: str, duration: float, video_budget: float,
+                         audio_args: list[str], moov_size: int, progress: _EncodeProgress) -> None:
+    """One libx264 process over the whole file; re-run only if the output overshot."""
+    bitrate = int(video_budget * 8 / duration)
+    for round_no in range(1, _MAX_ENCODE_ROUNDS + 1):
+        await _run_with_progress([
+            "ffmpeg", "-y", *_input_opts(path), "-i", path,
+            "-map", "0:v:0", "-map", "0:a:0?",
+            *_x264_args(bitrate), *audio_args,
+            "-moov_size", str(moov_size),
             "-progress", "pipe:1",
             "-nostats",
-            compressed_path,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
+            output_path,
+        ], lambda t: progress.update(0, t))
+
+        video_size = await _video_stream_bytes(output_path)
+        if video_size <= video_budget or round_no == _MAX_ENCODE_ROUNDS:
+            return
+        new_bitrate = _corrected_bitrate(bitrate, video_budget, video_size)
+        logger.warning(
+            f"Encode of {path} overshot ({video_size // 1_000_000} MB video vs "
+            f"{int(video_budget) // 1_000_000} MB budget), retrying at {new_bitrate} bps"
         )
+        bitrate = new_bitrate
 
-        stderr_task = asyncio.create_task(proc.stderr.read())
-        last_reported = -1
 
-        try:
-            async with asyncio.timeout(7200):
-                while True:
-                    line = await proc.stdout.readline()
-                    if not line:
-                        break
-                    if progress_cb:
-                        m = _TIME_RE.match(line.decode(errors="replace").strip())
-                        if m:
-                            elapsed = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
-                            pct = min(99, int(elapsed / duration * 100))
-                            if pct >= last_reported + 5:
-                                last_reported = pct
-                                try:
-                                    await progress_cb(pct)
-                                except Exception:
-                                    pass
-                await proc.wait()
-        except asyncio.TimeoutError:
-            proc.kill()
-            await proc.communicate()
-            raise RuntimeError("ffmpeg compression timed out after 7200s")
+async def _encode_chunked(path: str, output_path: str, duration: float,
+                          bounds: list[tuple[float, float]], video_budget: float,
+                          audio_args: list[str], moov_size: int,
+                          workers: int, progress: _EncodeProgress) -> None:
+    work_dir = output_path + ".chunks"
+    await asyncio.to_thread(os.makedirs, work_dir, exist_ok=True)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    slots = asyncio.Semaphore(workers)
+    chunk_paths = [os.path.join(work_dir, f"chunk_{i:03d}.mp4") for i in range(len(bounds))]
+    # Each chunk gets the share of the video budget matching its length
+    chunk_budgets = [video_budget * (end - start) / duration for start, end in bounds]
+    bitrates = [int(b * 8 / (end - start)) for b, (start, end) in zip(chunk_budgets, bounds)]
+    audio_path = os.path.join(work_dir, "audio.m4a")
+    copy_audio = audio_args[:2] == ["-c:a", "copy"]
+    has_audio = audio_args != ["-an"]
 
-        stderr = await stderr_task
-        if proc.returncode != 0:
-            raise RuntimeError(
-                f"ffmpeg failed (code {proc.returncode}): {stderr.decode(errors='replace')[-500:]}"
-            )
+    async def encode_chunk(i: int) -> None:
+        start, end = bounds[i]
+        async with slots:
+            await _run_with_progress([
+                "ffmpeg", "-y", "-ss", f"{start:.6f}", *_input_opts(path), "-i", path,
+                "-t", f"{end - start:.6f}",
+                "-map", "0:v:0", "-an",
+                *_x264_args(bitrates[i]), "-threads", str(threads),
+                "-progress", "pipe:1", "-nostats",
+                chunk_paths[i],
+            ], lambda t: progress.update(i, t))
 
-        if progress_cb:
-            try:
-                await progress_cb(100)
-            except Exception:
-                pass
+    async def encode_audio() -> None:
+        await _run_cmd([
+            "ffmpeg", "-y", *_input_opts(path), "-i", path,
+            "-map", "0:a:0", "-vn", *audio_args, audio_path,
+        ], timeout=_ENCODE_TIMEOUT)
 
-        os.replace(compressed_path, path)
+    tasks = [asyncio.create_task(encode_chunk(i)) for i in range(len(bounds))]
+    if has_audio and not copy_audio:
+        tasks.append(asyncio.create_task(encode_audio()))
+    try:
+        await asyncio.gather(*tasks)
+
+        # Verify: the chunks together must fit the video budget. Only chunks
+        # over their own share are re-encoded, at a bitrate corrected by
+        # how much they overshot.
+        for round_no in range(1, _MAX_ENCODE_ROUNDS):
+            sizes = [await asyncio.to_thread(os.path.getsize, p) for p in chunk_paths]
+            if sum(sizes) <= video_budget:
+                break
+            over = [i for i, size in enumerate(sizes) if size > chunk_budgets[i]]
+            logger.warning(
+                f"Chunked encode of {path} overshot ({sum(sizes) // 1_000_000} MB video vs "
+                f"{int(video_budget) // 1_000_000} MB budget), re-encoding chunks {over}"
+            )
+            for i in over:
+                bitrates[i] = _corrected_bitrate(bitrates[i], chunk_budgets[i], sizes[i])
+            retry = [asyncio.create_task(encode_chunk(i)) for i in over]
+            tasks.extend(retry)
+            await asyncio.gather(*retry)
+
+        list_path = os.path.join(work_dir, "chunks.txt")
+        content = "".join(f"file '{os.path.basename(p)}'\n" for p in chunk_paths)
+        await asyncio.to_thread(_write_text, list_path, content)
+        if not has_audio:
+            audio_input = []
+        elif copy_audio:
+            audio_input = [*_input_opts(path), "-i", path, "-map", "1:a:0"]
+        else:
+            audio_input = ["-i", audio_path, "-map", "1:a:0"]
+        await _run_cmd([
+            "ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+            *audio_input, "-map", "0:v:0",
+            "-c", "copy",
+            "-moov_size", str(moov_size),
+            output_path,
+        ], timeout=_ENCODE_TIMEOUT)
     finally:
-        if os.path.exists(compressed_path):
-            os.remove(compressed_path)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.to_thread(shutil.rmtree, work_dir, True)
+
+
+async def _video_stream_bytes(path: str) -> int:
+    """
+    Bytes of the video stream in an encoded file: the file size minus the
+    audio packets, which are summed rather than estimated from bit_rate.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "packet=size",
+        "-of", "csv=p=0", path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, _ = await _communicate(proc)
+    audio_bytes = sum(int(x) for x in stdout.decode(errors="replace").split() if x.isdigit())
+    return await asyncio.to_thread(os.path.getsize, path) - audio_bytes
+
+
+def _write_text(path: str, content: str) -> None:
+    with open(path, "w") as f:
+        f.write(content)
+
+
+# Parts are cut a little under the limit: the new moov and container overhead
+_SPLIT_BUDGET = int(TELEGRAM_SIZE_LIMIT * 0.97)
+
+
+def _split_points(keyframes: list[tuple[float, int]], file_size: int, budget: int) -> list[float]:
+    """
+    Start times of the parts: each part starts on a keyframe and ends at the
+    last keyframe whose byte offset keeps the part within budget.
+    """
+    starts = [0.0]
+    start_pos = 0
+    while file_size - start_pos > budget:
+        candidates = [(t, pos) for t, pos in keyframes if start_pos < pos <= start_pos + budget and t > starts[-1]]
+        if not candidates:
+            raise RuntimeError("Cannot split: a single GOP is larger than the Telegram limit")
+        t, start_pos = candidates[-1]
+        starts.append(t)
+    return starts
+
+
+async def compress_to_limit(path: str, progress_cb=None, label: str | None = None) -> bool:
+    """
+    Re-encode an mp4 in place if it is over TELEGRAM_SIZE_LIMIT, in an
+    "encode" slot of the media pool. The original is only replaced once the
+    encode succeeded. Returns True if the file was re-encoded.
+    """
+    size = await asyncio.to_thread(os.path.getsize, path)
+    if size <= TELEGRAM_SIZE_LIMIT:
+        return False
+    async with media_pool.slot("encode", label or os.path.basename(path)):
+        await _compress_to_limit(path, progress_cb)
+    return True
+
+
+async def split_to_limit(path: str) -> list[str]:
+    """
+    Cut an mp4 losslessly (-c copy) at keyframes into parts that each fit
+    under TELEGRAM_SIZE_LIMIT. Returns the part paths in playback order —
+    [path] itself when the file already fits. If a part still comes out too
+    large (very uneven bitrate), the file is re-encoded instead.
+    """
+    size = await asyncio.to_thread(os.path.getsize, path)
+    if size <= TELEGRAM_SIZE_LIMIT:
+        return [path]
+
+    label = os.path.basename(path)
+    async with media_pool.slot("remux", label):
+        parts = await _split(path, size)
+    if parts is None:
+        logger.warning(f"Split of {path} produced a part over the limit, re-encoding instead")
+        async with media_pool.slot("encode", label):
+            await _compress_to_limit(path)
+        return [path]
+    return parts
+
+
+async def _split(path: str, size: int) -> list[str] | None:
+    """Cut path into parts; None if one of them still came out over the limit."""
+    duration, _, _ = await get_video_info(path)
+    starts = _split_points(await _keyframes(path), size, _SPLIT_BUDGET)
+    await _ensure_free_space(path, size, "розрізання на частини")
+
+    base, ext = os.path.splitext(path)
+    parts = [f"{base}.part{i + 1}{ext}" for i in range(len(starts))]
+    ends = starts[1:] + [None]
+    try:
+        for part_path, start, end in zip(parts, starts, ends):
+            length_args = ["-t", f"{end - start:.6f}"] if end is not None else []
+            part_duration = (end or duration) - start
+            await _run_cmd(
+                ["ffmpeg", "-y", "-ss", f"{start:.6f}", "-i", path, *length_args,
+                 "-map", "0", "-c", "copy", "-avoid_negative_ts", "make_zero",
+                 "-moov_size", str(_moov_size(part_duration)), part_path],
+                timeout=_ENCODE_TIMEOUT,
+            )
+        sizes = [await asyncio.to_thread(os.path.getsize, p) for p in parts]
+    except BaseException:
+        await asyncio.to_thread(_remove_files, parts)
+        raise
+
+    if max(sizes) > TELEGRAM_SIZE_LIMIT:
+        await asyncio.to_thread(_remove_files, parts)
+        return None
+
+    logger.info(f"Split {path} into {len(parts)} parts: {[s // 1_000_000 for s in sizes]} MB")
+    return parts
+
+
+def _remove_files(paths: list[str]) -> None:
+    for p in paths:
+        if os.path.exists(p):
+            os.remove(p)
+
+
+async def convert_to_mp4(source: str, output_path: str, progress_cb=None,
+                         label: str | None = None) -> None:
+    """
+    Convert any video ffmpeg can read into an H.264/AAC streamable mp4.
+    Waits for an "encode" slot of the global media pool, so conversions are
+    queued with the other encodes instead of competing with them.
+    progress_cb: optional async callable(pct: int) called every ~5%.
+    The ffmpeg process is killed if the caller is cancelled.
+    Raises RuntimeError if ffmpeg fails or runs longer than _ENCODE_TIMEOUT.
+    """
+    async with media_pool.slot("encode", label or os.path.basename(source)):
+        duration, _, _ = await get_video_info(source)
+        progress = _EncodeProgress(duration, progress_cb if duration else None)
+        try:
+            async with asyncio.timeout(_ENCODE_TIMEOUT):
+                await _run_with_progress([
+                    "ffmpeg", "-y", "-i", source,
+                    "-c:v", "libx264", "-preset", "medium",
+                    "-c:a", "aac",
+                    "-movflags", "+faststart",
+                    "-progress", "pipe:1",
+                    "-nostats",
+                    output_path,
+                ], lambda t: progress.update(0, t))
+        except TimeoutError:
+            raise RuntimeError(f"ffmpeg conversion timed out after {_ENCODE_TIMEOUT}s")
+        await progress.finish()
 
 
 async def get_video_info(path: str) -> tuple[int, int, int]:
@@ -135,11 +712,11 @@ async def get_video_info(path: str) -> tuple[int, int, int]:
         "-of", "json", path,
     ]
     proc = await asyncio.create_subprocess_exec(
-        *cmd,
+        *niced(cmd),
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
     )
-    stdout, _ = await proc.communicate()
+    stdout, _ = await _communicate(proc)
     data = json.loads(stdout)
     streams = data.get("streams", [])
     if not streams:
@@ -151,25 +728,67 @@ async def get_video_info(path: str) -> tuple[int, int, int]:
     return duration, w, h
 
 
-async def create_thumbnail(video_path: str, thumb_path: str) -> bool:
-    """Extracts a frame at 5s as JPEG thumbnail. Returns True on success."""
-    cmd = [
-        "ffmpeg", "-y", "-ss", "5", "-i", video_path,
-        "-vframes", "1", "-vf", "scale=320:-1",
-        thumb_path,
-    ]
+def _parse_input_banner(stderr: str) -> dict:
+    """Metadata of input #0 from ffmpeg's stderr banner."""
+    banner = stderr.split("Output #0", 1)[0]
+    info = {"duration": 0, "width": 0, "height": 0,
+            "video_codec": None, "audio_codec": None, "bitrate": 0}
+    m = _DURATION_RE.search(banner)
+    if m:
+        info["duration"] = math.ceil(int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3)))
+    m = _BITRATE_RE.search(banner)
+    if m:
+        info["bitrate"] = int(m.group(1)) * 1000
+    m = _VIDEO_STREAM_RE.search(banner)
+    if m:
+        info["video_codec"] = m.group(1)
+        info["width"], info["height"] = int(m.group(2)), int(m.group(3))
+    m = _AUDIO_STREAM_RE.search(banner)
+    if m:
+        info["audio_codec"] = m.group(1)
+    return info
+
+
+async def probe_media(video_path: str, thumb_path: str) -> dict:
+    """
+    One ffmpeg run per upload: writes a 320px JPEG thumbnail from the frame
+    at 5s and reads the input banner it prints anyway. Returns
+    {"duration", "width", "height", "video_codec", "audio_codec", "bitrate",
+     "size", "has_thumb"}; unknown values are 0 / None.
+    """
     proc = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
+        *niced([
+            "ffmpeg", "-hide_banner", "-y",
+            "-ss", "5", "-i", video_path,
+            "-map", "0:v:0", "-frames:v", "1", "-vf", "scale=320:-1",
+            thumb_path,
+        ]),
+        stdout=asyncio.subprocess.DEVNULL,
         stderr=asyncio.subprocess.PIPE,
     )
-    await proc.communicate()
-    return proc.returncode == 0 and os.path.exists(thumb_path)
+    _, stderr = await _communicate(proc)
+    info = _parse_input_banner(stderr.decode(errors="replace"))
+    info["size"] = await asyncio.to_thread(os.path.getsize, video_path)
+    info["has_thumb"] = proc.returncode == 0 and await asyncio.to_thread(
+        lambda: os.path.exists(thumb_path) and os.path.getsize(thumb_path) > 0
+    )
+    return info
+
+
+async def _communicate(proc: asyncio.subprocess.Process) -> tuple[bytes, bytes]:
+    """proc.communicate() that kills the process when the caller is cancelled."""
+    try:
+        return await proc.communicate()
+    except asyncio.CancelledError:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
 
 
 async def _run_cmd(cmd: list[str], timeout: int) -> None:
     proc = await asyncio.create_subprocess_exec(
-        *cmd,
+        *niced(cmd),
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
     )
@@ -179,6 +798,11 @@ async def _run_cmd(cmd: list[str], timeout: int) -> None:
         proc.kill()
         await proc.communicate()
         raise RuntimeError(f"ffmpeg timed out after {timeout}s: {' '.join(cmd[:3])}")
+    except asyncio.CancelledError:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
 
     if proc.returncode != 0:
         raise RuntimeError(
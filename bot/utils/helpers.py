@@ -1,23 +1,43 @@
+import asyncio
 import os
+import shutil
 import tempfile
-import subprocess
+from pathlib import Path
 from aiogram import Bot
-from aiogram.types import Message, FSInputFile
+from aiogram.types import Message, FSInputFile, InputFile
 
+from bot.utils.ffmpeg_runner import convert_to_mp4
 
-async def send_movie_video(bot: Bot, chat_id: int, movie: dict, caption: str = None) -> Message:
+
+def upload_input(bot: Bot, path: str) -> InputFile | str:
+    """
+    Файл з диска для відправки в Telegram.
+    Локальний Bot API сервер (--local) читає файл сам за file:// шляхом, тож
+    відео не проходить через multipart-тіло запиту aiohttp. Для звичайного
+    API повертає FSInputFile.
+    Мініатюри (thumbnail) так передавати не можна — для них лишається FSInputFile.
+    """
+    if bot.session.api.is_local:
+        return Path(path).resolve().as_uri()
+    return FSInputFile(path)
+
+
+async def send_movie_video(bot: Bot, chat_id: int, movie: dict, caption: str = None,
+                           reply_markup=None) -> Message:
     """
     Відправляє відео мультфільма користувачу
-    Автоматично визначає чи це video чи document і використовує правильний метод
+    Автоматично визначає чи це video чи document і використовує правильний метод.
+    Якщо фільм розрізано на частини (video_parts), відправляє їх по черзі.
 
     Args:
         bot: Екземпляр бота
         chat_id: ID чату куди відправити
         movie: Словник з даними мультфільма (має містити video_file_id та video_type)
         caption: Опціональний підпис до відео
+        reply_markup: Опціональні кнопки (додаються до останньої частини)
 
     Returns:
-        Message: Відправлене повідомлення
+        Message: Відправлене повідомлення (остання частина)
 
     Raises:
         ValueError: Якщо video_file_id відсутній
@@ -28,85 +48,82 @@ async def send_movie_video(bot: Bot, chat_id: int, movie: dict, caption: str = N
     if not video_file_id:
         raise ValueError(f"video_file_id відсутній для контенту: {movie.get('title', 'Unknown')}")
 
-    if video_type == "video":
-        # Відправляємо як звичайне відео
-        return await bot.send_video(
-            chat_id=chat_id,
-            video=video_file_id,
-            caption=caption
-        )
-    else:
-        # Відправляємо як document, але користувач зможе його переглянути
-        return await bot.send_document(
-            chat_id=chat_id,
-            document=video_file_id,
-            caption=caption
-        )
-
-
-async def convert_video_to_mp4(bot: Bot, file_id: str, original_filename: str = None) -> tuple[str, str]:
+    parts = [p["video_file_id"] for p in movie.get("video_parts") or []] or [video_file_id]
+
+    sent = None
+    for i, part_file_id in enumerate(parts, start=1):
+        part_caption = caption
+        if len(parts) > 1:
+            label = f"🎞 Частина відео {i}/{len(parts)}"
+            part_caption = f"{caption}\n\n{label}" if caption else label
+        is_last = i == len(parts)
+
+        if video_type == "video":
+            # Відправляємо як звичайне відео
+            sent = await bot.send_video(
+                chat_id=chat_id,
+                video=part_file_id,
+                caption=part_caption,
+                reply_markup=reply_markup if is_last else None,
+            )
+        else:
+            # Відправляємо як document, але користувач зможе його переглянути
+            sent = await bot.send_document(
+                chat_id=chat_id,
+                document=part_file_id,
+                caption=part_caption,
+                reply_markup=reply_markup if is_last else None,
+            )
+    return sent
+
+
+async def convert_video_to_mp4(bot: Bot, file_id: str, original_filename: str = None,
+                               progress_cb=None) -> tuple[str, str]:
     """
     Конвертує відео в MP4 формат (h264 codec) для кращої сумісності
 
+    З локальним Bot API сервером file.file_path — це вже абсолютний шлях на
+    диску, тож ffmpeg читає файл напряму без копії в тимчасову папку.
+    ffmpeg працює як асинхронний процес у черзі перекодувань (media_pool),
+    тому конвертація не блокує обробку інших користувачів. Якщо викликаюча
+    задача скасована — процес ffmpeg зупиняється, тимчасові файли видаляються.
+
     Args:
         bot: Екземпляр бота
         file_id: File ID відео в Telegram
         original_filename: Оригінальна назва файлу
+        progress_cb: Опціональна async-функція (pct: int), викликається кожні ~5%
 
     Returns:
-        tuple: (шлях до конвертованого файлу, новий file_id)
+        tuple: (шлях до конвертованого файлу, тимчасова папка для cleanup_temp_files)
     """
     # Створюємо тимчасові директорії
-    temp_dir = tempfile.mkdtemp()
+    temp_dir = await asyncio.to_thread(tempfile.mkdtemp)
 
     try:
-        # Завантажуємо файл
         file = await bot.get_file(file_id)
-        original_path = os.path.join(temp_dir, original_filename or "original.mkv")
-        await bot.download_file(file.file_path, original_path)
-
-        # Конвертуємо в MP4
+        if bot.session.api.is_local and os.path.isabs(file.file_path):
+            # Файл уже лежить на диску локального сервера
+            original_path = file.file_path
+        else:
+            original_path = os.path.join(temp_dir, original_filename or "original.mkv")
+            await bot.download_file(file.file_path, original_path)
+
+        # Конвертуємо в MP4 (libx264 + aac, +faststart для стрімінгу)
         output_path = os.path.join(temp_dir, "converted.mp4")
-
-        # Використовуємо ffmpeg для конвертації
-        # -c:v libx264 - відео кодек h264
-        # -c:a aac - аудіо кодек aac
-        # -movflags +faststart - оптимізація для стрімінгу
-        # -preset medium - баланс між швидкістю і якістю
-        command = [
-            "ffmpeg",
-            "-i", original_path,
-            "-c:v", "libx264",
-            "-c:a", "aac",
-            "-preset", "medium",
-            "-movflags", "+faststart",
-            "-y",  # Перезаписати якщо існує
-            output_path
-        ]
-
-        # Запускаємо конвертацію
-        process = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=600  # 10 хвилин максимум
-        )
-
-        if process.returncode != 0:
-            raise Exception(f"FFmpeg error: {process.stderr.decode()}")
+        await convert_to_mp4(original_path, output_path, progress_cb,
+                             label=original_filename or "convert")
 
         return output_path, temp_dir
 
-    except Exception as e:
-        # Видаляємо тимчасові файли при помилці
-        import shutil
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        raise e
+    except BaseException:
+        # Видаляємо тимчасові файли при помилці або скасуванні
+        await asyncio.to_thread(shutil.rmtree, temp_dir, True)
+        raise
 
 
 def cleanup_temp_files(temp_dir: str):
     """Видаляє тимчасові файли"""
-    import shutil
     try:
         shutil.rmtree(temp_dir, ignore_errors=True)
     except:
@@ -0,0 +1,471 @@
+"""
+HLS playlist parsing, variant selection and parallel segment download.
+
+The variant policy predicts the size of the finished MP4 before anything is
+downloaded: the total EXTINF duration of the media playlist times the
+variant's AVERAGE-BANDWIDTH (or BANDWIDTH when the average is missing).
+It then picks the best variant that fits under the Telegram upload limit,
+within a per-content-type resolution cap (config.MAX_VIDEO_HEIGHT), so
+oversized titles rarely reach the re-encode path.
+
+download_hls() fetches a VOD media playlist's segments (including byte
+ranges, init sections and AES-128 keys) concurrently into a work directory
+and writes a local playlist that ffmpeg can remux with -c copy. The work
+directory doubles as a resumable segment store: a manifest.json records which
+playlist it belongs to, and segments already on disk are not fetched again.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import re
+from typing import Optional
+from urllib.parse import urljoin, urlparse
+
+from bot.config import config
+from bot.utils.http_client import fetch
+
+logger = logging.getLogger(__name__)
+
+_ATTR_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+_EXTINF_RE = re.compile(r"#EXTINF:\s*([\d.]+)")
+
+# MP4 remux of a TS stream is slightly smaller than the stream itself;
+# keep a small safety margin on top of the bitrate estimate anyway.
+_SIZE_SAFETY_FACTOR = 1.03
+
+
+def parse_attributes(line: str) -> dict[str, str]:
+    """Parse the attribute list of an #EXT-X-... tag into a dict (quotes stripped)."""
+    _, _, attr_text = line.partition(":")
+    return {k: v.strip('"') for k, v in _ATTR_RE.findall(attr_text)}
+
+
+def is_master_playlist(text: str) -> bool:
+    return "#EXT-X-STREAM-INF" in text
+
+
+def parse_master_playlist(text: str, base_url: str) -> list[dict]:
+    """
+    Return the variants of a master playlist:
+      [{"url", "bandwidth", "average_bandwidth", "width", "height"}, ...]
+    average_bandwidth/width/height are 0 when not advertised.
+    """
+    variants: list[dict] = []
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if not line.startswith("#EXT-X-STREAM-INF"):
+            continue
+        attrs = parse_attributes(line)
+        uri = next(
+            (l.strip() for l in lines[i + 1:] if l.strip() and not l.startswith("#")),
+            None,
+        )
+        if not uri or "BANDWIDTH" not in attrs:
+            continue
+        width = height = 0
+        res = re.fullmatch(r"(\d+)x(\d+)", attrs.get("RESOLUTION", ""))
+        if res:
+            width, height = int(res.group(1)), int(res.group(2))
+        variants.append({
+            "url": urljoin(base_url, uri),
+            "bandwidth": int(attrs["BANDWIDTH"]),
+            "average_bandwidth": int(attrs.get("AVERAGE-BANDWIDTH", 0) or 0),
+            "width": width,
+            "height": height,
+        })
+    return variants
+
+
+def playlist_duration(text: str) -> float:
+    """Total duration (seconds) of a media playlist — sum of its EXTINF values."""
+    return sum(float(m) for m in _EXTINF_RE.findall(text))
+
+
+def predict_size(variant: dict, duration: float) -> int:
+    """Predicted output size in bytes for a variant of the given duration."""
+    bps = variant["average_bandwidth"] or variant["bandwidth"]
+    return int(bps * duration / 8 * _SIZE_SAFETY_FACTOR)
+
+
+def max_height_for(content_type: Optional[str]) -> int:
+    """Resolution cap for a content type; 0 means no cap."""
+    return config.MAX_VIDEO_HEIGHT.get(content_type or "", 0)
+
+
+def select_variant(variants: list[dict], duration: float, size_limit: int,
+                   max_height: int = 0) -> Optional[dict]:
+    """
+    Pick the highest-bandwidth variant that is within max_height and is
+    predicted to fit under size_limit.
+    When nothing fits, fall back to the best variant within the cap (the
+    oversize path handles it). When the duration is unknown, size is not
+    considered.
+    """
+    if not variants:
+        return None
+    by_quality = sorted(variants, key=lambda v: v["bandwidth"], reverse=True)
+
+    allowed = by_quality
+    if max_height:
+        # Variants without RESOLUTION cannot be checked — keep them
+        allowed = [v for v in by_quality if not v["height"] or v["height"] <= max_height]
+        if not allowed:
+            allowed = [min(by_quality, key=lambda v: v["height"])]
+
+    if duration > 0:
+        fitting = [v for v in allowed if predict_size(v, duration) <= size_limit]
+        if fitting:
+            return fitting[0]
+    return allowed[0]
+
+
+async def choose_variant(master_text: str, master_url: str, size_limit: int,
+                         max_height: int = 0) -> Optional[dict]:
+    """
+    Parse a master playlist and pick a variant with select_variant. All
+    variants share the timeline, so the first one's media playlist gives the
+    duration. Returns None when the playlist advertises no variants.
+    """
+    variants = parse_master_playlist(master_text, master_url)
+    if not variants:
+        return None
+    duration = 0.0
+    try:
+        duration = playlist_duration((await fetch(variants[0]["url"])).text)
+    except Exception as e:
+        logger.warning(f"Could not read media playlist duration for {master_url}: {e}")
+
+    best = select_variant(variants, duration, size_limit, max_height)
+    logger.info(
+        f"Selected variant {best['width']}x{best['height']} "
+        f"(bandwidth={best['bandwidth']}, predicted "
+        f"{predict_size(best, duration) // 1_000_000} MB): {best['url']}"
+    )
+    return best
+
+
+# ---------------------------------------------------------------------------
+# Media playlists and segment download
+# ---------------------------------------------------------------------------
+
+_SEGMENT_ATTEMPTS = 5
+_SEGMENT_TIMEOUT = 120
+LOCAL_PLAYLIST_NAME = "index.m3u8"
+MANIFEST_NAME = "manifest.json"
+
+
+class UnsupportedPlaylist(Exception):
+    """The stream cannot be fetched segment by segment (live, SAMPLE-AES, ...)."""
+
+
+def _parse_byterange(value: str, next_offset: int) -> tuple[int, int]:
+    """'<length>[@<offset>]' → (length, offset); offset defaults to next_offset."""
+    length, _, offset = value.partition("@")
+    return int(length), int(offset) if offset else next_offset
+
+
+def parse_media_playlist(text: str, base_url: str) -> dict:
+    """
+    Parse a media playlist:
+      {
+        "media_sequence": int,
+        "target_duration": str,
+        "ended": bool,                      # has #EXT-X-ENDLIST (VOD)
+        "segments": [{
+            "url": str, "duration": float,
+            "byterange": (length, offset) | None,
+            "key": {"url": str, "iv": str | None} | None,   # AES-128
+            "map": {"url": str, "byterange": (length, offset) | None} | None,
+            "discontinuity": bool,
+        }, ...]
+      }
+    Raises UnsupportedPlaylist for encryption methods other than AES-128.
+    """
+    segments: list[dict] = []
+    media_sequence = 0
+    target_duration = "10"
+    key = None
+    init_map = None
+    duration = 0.0
+    byterange = None
+    discontinuity = False
+    next_offsets: dict[str, int] = {}  # resource url -> end of the previous byte range
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("#EXTINF:"):
+            duration = float(_EXTINF_RE.match(line).group(1))
+        elif line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            media_sequence = int(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-TARGETDURATION:"):
+            target_duration = line.split(":", 1)[1]
+        elif line.startswith("#EXT-X-BYTERANGE:"):
+            byterange = line.split(":", 1)[1]
+        elif line.startswith("#EXT-X-DISCONTINUITY") and not line.startswith("#EXT-X-DISCONTINUITY-"):
+            discontinuity = True
+        elif line.startswith("#EXT-X-KEY:"):
+            attrs = parse_attributes(line)
+            method = attrs.get("METHOD", "NONE")
+            if method == "NONE":
+                key = None
+            elif method == "AES-128" and attrs.get("URI"):
+                key = {"url": urljoin(base_url, attrs["URI"]), "iv": attrs.get("IV")}
+            else:
+                raise UnsupportedPlaylist(f"Unsupported HLS encryption: {method}")
+        elif line.startswith("#EXT-X-MAP:"):
+            attrs = parse_attributes(line)
+            map_url = urljoin(base_url, attrs["URI"])
+            map_range = _parse_byterange(attrs["BYTERANGE"], 0) if attrs.get("BYTERANGE") else None
+            init_map = {"url": map_url, "byterange": map_range}
+        elif not line.startswith("#"):
+            url = urljoin(base_url, line)
+            seg_range = None
+            if byterange:
+                seg_range = _parse_byterange(byterange, next_offsets.get(url, 0))
+                next_offsets[url] = seg_range[1] + seg_range[0]
+            segments.append({
+                "url": url,
+                "duration": duration,
+                "byterange": seg_range,
+                "key": key,
+                "map": init_map,
+                "discontinuity": discontinuity,
+            })
+            duration = 0.0
+            byterange = None
+            discontinuity = False
+
+    return {
+        "media_sequence": media_sequence,
+        "target_duration": target_duration,
+        "ended": "#EXT-X-ENDLIST" in text,
+        "segments": segments,
+    }
+
+
+def _segment_filename(index: int, url: str) -> str:
+    ext = os.path.splitext(urlparse(url).path)[1] or ".ts"
+    return f"seg_{index:05d}{ext}"
+
+
+def _playlist_fingerprint(segments: list[dict]) -> str:
+    """
+    Identify the stream independently of signed query strings: the same
+    episode re-resolved later gets a new token but the same segment layout.
+    """
+    h = hashlib.sha1()
+    for seg in segments:
+        h.update(f"{urlparse(seg['url']).path}|{seg['duration']}|{seg['byterange']}\n".encode())
+    return h.hexdigest()
+
+
+def read_manifest(work_dir: str) -> Optional[dict]:
+    """
+    Return the segment store's manifest with a fresh "done" count
+    (segments fully on disk), or None if work_dir holds no store.
+    """
+    try:
+        with open(os.path.join(work_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    manifest["done"] = sum(
+        1 for name in manifest.get("files", [])
+        if os.path.exists(os.path.join(work_dir, name))
+    )
+    return manifest
+
+
+def _prepare_store(work_dir: str, fingerprint: str, playlist_url: str, files: list[str]) -> int:
+    """
+    Make work_dir a segment store for this playlist. A store left by a
+    different stream is wiped. Returns how many segments are already on disk.
+    """
+    manifest = read_manifest(work_dir)
+    if manifest is not None and manifest.get("fingerprint") != fingerprint:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        manifest = None
+    os.makedirs(work_dir, exist_ok=True)
+    if manifest is None:
+        content = {
+            "fingerprint": fingerprint,
+            "playlist_url": playlist_url,
+            "segments": len(files),
+            "files": files,
+        }
+        _write_atomic(os.path.join(work_dir, MANIFEST_NAME), json.dumps(content).encode())
+        return 0
+    return manifest["done"]
+
+
+def store_size(work_dir: str) -> int:
+    """Total bytes of media (segments, init sections) in a segment store."""
+    total = 0
+    for entry in os.scandir(work_dir):
+        if entry.is_file() and not entry.name.endswith(".part") and entry.name != MANIFEST_NAME:
+            total += entry.stat().st_size
+    return total
+
+
+def segment_start_times(playlist_path: str) -> list[float]:
+    """Start time of every segment of a (local) media playlist, from EXTINF durations."""
+    with open(playlist_path) as f:
+        playlist = parse_media_playlist(f.read(), playlist_path)
+    starts, t = [], 0.0
+    for seg in playlist["segments"]:
+        starts.append(t)
+        t += seg["duration"]
+    return starts
+
+
+def _write_atomic(path: str, content: bytes) -> None:
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+async def _download_to(url: str, byterange: Optional[tuple[int, int]], path: str) -> None:
+    """Fetch url (or a byte range of it) into path, retrying transient failures."""
+    if await asyncio.to_thread(os.path.exists, path):
+        return  # fetched by an earlier attempt
+    headers = None
+    if byterange:
+        length, offset = byterange
+        headers = {"Range": f"bytes={offset}-{offset + length - 1}"}
+    for attempt in range(_SEGMENT_ATTEMPTS):
+        try:
+            # Segments bypass the scraper's per-host rate limit: concurrency is
+            # HLS_SEGMENT_CONCURRENCY, and page requests keep their budget
+            resp = await fetch(url, headers=headers, timeout=_SEGMENT_TIMEOUT, rate_limited=False)
+            await asyncio.to_thread(_write_atomic, path, resp.content)
+            return
+        except Exception as e:
+            if attempt == _SEGMENT_ATTEMPTS - 1:
+                raise RuntimeError(f"Segment download failed after {_SEGMENT_ATTEMPTS} attempts: {url}: {e}") from e
+            wait = 2 ** attempt
+            logger.warning(f"Segment {url} failed ({e}), retrying in {wait}s")
+            await asyncio.sleep(wait)
+
+
+def _build_local_playlist(playlist: dict, segment_files: list[str],
+                          key_files: dict[str, str], map_files: dict[tuple, str]) -> str:
+    """Rewrite the parsed playlist so every URI points at a downloaded file."""
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        f"#EXT-X-TARGETDURATION:{playlist['target_duration']}",
+        f"#EXT-X-MEDIA-SEQUENCE:{playlist['media_sequence']}",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    current_key = None
+    current_map = None
+    for seg, filename in zip(playlist["segments"], segment_files):
+        if seg["discontinuity"]:
+            lines.append("#EXT-X-DISCONTINUITY")
+        if seg["key"] != current_key:
+            current_key = seg["key"]
+            if current_key is None:
+                lines.append("#EXT-X-KEY:METHOD=NONE")
+            else:
+                iv = f",IV={current_key['iv']}" if current_key["iv"] else ""
+                lines.append(f'#EXT-X-KEY:METHOD=AES-128,URI="{key_files[current_key["url"]]}"{iv}')
+        if seg["map"] != current_map:
+            current_map = seg["map"]
+            if current_map is not None:
+                map_key = (current_map["url"], current_map["byterange"])
+                lines.append(f'#EXT-X-MAP:URI="{map_files[map_key]}"')
+        lines.append(f"#EXTINF:{seg['duration']:.6f},")
+        lines.append(filename)
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+async def download_hls(m3u8_url: str, work_dir: str, size_limit: int, max_height: int = 0,
+                       concurrency: int = config.HLS_SEGMENT_CONCURRENCY) -> tuple[str, float]:
+    """
+    Download every segment of a VOD HLS stream into work_dir using a bounded
+    pool of concurrent workers, with per-segment retry.
+    A master playlist (the scraper could not resolve it up front) is resolved
+    with the same variant policy: choose_variant(size_limit, max_height).
+    Returns (local_playlist_path, duration_seconds). The local playlist keeps
+    the original key/IV/discontinuity structure, so ffmpeg decrypts AES-128
+    segments itself while remuxing.
+    work_dir is resumable: segments already fetched into it for the same
+    stream are kept and only the missing ones are downloaded. The caller
+    removes it once the result is no longer needed.
+    Raises UnsupportedPlaylist when the stream has to be read by ffmpeg directly.
+    """
+    resp = await fetch(m3u8_url)
+    text = resp.text
+    if is_master_playlist(text):
+        variant = await choose_variant(text, m3u8_url, size_limit, max_height)
+        if variant is None:
+            raise UnsupportedPlaylist(f"Master playlist without variants: {m3u8_url}")
+        m3u8_url = variant["url"]
+        text = (await fetch(m3u8_url)).text
+
+    playlist = parse_media_playlist(text, m3u8_url)
+    if not playlist["ended"]:
+        raise UnsupportedPlaylist(f"Not a VOD playlist (no #EXT-X-ENDLIST): {m3u8_url}")
+    segments = playlist["segments"]
+    if not segments:
+        raise UnsupportedPlaylist(f"Playlist has no segments: {m3u8_url}")
+
+    segment_files = [_segment_filename(i, seg["url"]) for i, seg in enumerate(segments)]
+    already = await asyncio.to_thread(
+        _prepare_store, work_dir, _playlist_fingerprint(segments), m3u8_url, segment_files
+    )
+    if already:
+        logger.info(f"Resuming segment download in {work_dir}: {already}/{len(segments)} already on disk")
+
+    # Keys and init sections are tiny and shared by many segments — fetch them first
+    key_files: dict[str, str] = {}
+    map_files: dict[tuple, str] = {}
+    for seg in segments:
+        if seg["key"] and seg["key"]["url"] not in key_files:
+            name = f"key_{len(key_files)}.key"
+            await _download_to(seg["key"]["url"], None, os.path.join(work_dir, name))
+            key_files[seg["key"]["url"]] = name
+        if seg["map"]:
+            map_key = (seg["map"]["url"], seg["map"]["byterange"])
+            if map_key not in map_files:
+                name = f"init_{len(map_files)}{os.path.splitext(urlparse(seg['map']['url']).path)[1] or '.mp4'}"
+                await _download_to(seg["map"]["url"], seg["map"]["byterange"], os.path.join(work_dir, name))
+                map_files[map_key] = name
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for i, seg in enumerate(segments):
+        queue.put_nowait(i)
+
+    async def worker() -> None:
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            seg = segments[i]
+            await _download_to(seg["url"], seg["byterange"], os.path.join(work_dir, segment_files[i]))
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+
+    local_playlist = os.path.join(work_dir, LOCAL_PLAYLIST_NAME)
+    content = _build_local_playlist(playlist, segment_files, key_files, map_files)
+    await asyncio.to_thread(_write_atomic, local_playlist, content.encode())
+
+    duration = sum(seg["duration"] for seg in segments)
+    logger.info(f"Downloaded {len(segments)} HLS segments ({duration:.0f}s) into {work_dir}")
+    return local_playlist, duration
@@ -0,0 +1,112 @@
+"""
+Shared async HTTP layer for the scrapers.
+
+One long-lived curl_cffi AsyncSession is kept per host, so keep-alive
+connections, TLS sessions and cookies are reused between requests instead of
+being rebuilt for every page. Sessions are created lazily on first use and
+closed by close_sessions() on shutdown. Page requests first wait for the
+host's token bucket in rate_limiter, which also absorbs HTTP 429 backoff;
+media fetches (HLS segments) bypass it, see fetch(rate_limited=False).
+"""
+
+import logging
+from typing import Optional
+from urllib.parse import urlparse
+
+from curl_cffi.requests import AsyncSession, Response
+
+from bot.utils.rate_limiter import get_limiter, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+}
+
+_IMPERSONATE = "chrome120"
+_TIMEOUT = 30
+_MAX_CLIENTS_PER_HOST = 16  # enough for parallel HLS segment downloads
+_MAX_ATTEMPTS = 4
+
+# host -> session; one connection pool (and cookie jar) per site
+_sessions: dict[str, AsyncSession] = {}
+
+
+def _get_session(host: str) -> AsyncSession:
+    session = _sessions.get(host)
+    if session is None:
+        session = AsyncSession(
+            impersonate=_IMPERSONATE,
+            headers=_HEADERS,
+            timeout=_TIMEOUT,
+            max_clients=_MAX_CLIENTS_PER_HOST,
+        )
+        _sessions[host] = session
+    return session
+
+
+async def fetch(url: str, *, method: str = "GET", data: Optional[dict] = None,
+                referer: Optional[str] = None, headers: Optional[dict] = None,
+                timeout: Optional[float] = None, rate_limited: bool = True) -> Response:
+    """
+    Perform a request through the pooled session for the URL's host.
+    POST requests are sent as XHR (the DLE AJAX endpoints expect that).
+    headers are merged over the session defaults; timeout overrides _TIMEOUT.
+    Requests are paced by the host's rate limiter; HTTP 429 responses block
+    that host for Retry-After and are retried. Raises on any other HTTP error.
+    rate_limited=False is for media (HLS segments from the CDN): one request,
+    not paced and not counted against the host's page-scraping budget, so
+    segment concurrency is bounded only by the caller; any error, 429
+    included, is raised for the caller's own retry.
+    """
+    host = urlparse(url).netloc
+    session = _get_session(host)
+    headers = dict(headers or {})
+    if referer:
+        headers["Referer"] = referer
+    if method == "POST":
+        headers["X-Requested-With"] = "XMLHttpRequest"
+        headers["Accept"] = "application/json, text/javascript, */*; q=0.01"
+
+    extra = {"timeout": timeout} if timeout else {}
+
+    if not rate_limited:
+        resp = await session.request(method, url, headers=headers, data=data, **extra)
+        resp.raise_for_status()
+        return resp
+
+    limiter = get_limiter(host)
+    for attempt in range(_MAX_ATTEMPTS):
+        await limiter.acquire()
+        resp = await session.request(method, url, headers=headers, data=data, **extra)
+
+        if resp.status_code == 429:
+            wait = limiter.on_rate_limited(parse_retry_after(resp.headers.get("Retry-After")))
+            if attempt == _MAX_ATTEMPTS - 1:
+                resp.raise_for_status()
+            logger.warning(
+                f"Rate limited (429) on {url}, retrying in {wait:.1f}s "
+                f"(attempt {attempt + 1}/{_MAX_ATTEMPTS - 1})"
+            )
+            continue
+
+        limiter.on_success()
+        resp.raise_for_status()
+        return resp
+
+    return resp  # unreachable but satisfies type checker
+
+
+async def close_sessions() -> None:
+    """Close every pooled session. Called once on bot shutdown."""
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        try:
+            await session.close()
+        except Exception as e:
+            logger.warning(f"Failed to close HTTP session: {e}")
@@ -0,0 +1,114 @@
+"""
+Global executor for heavy media work.
+
+All ffmpeg work of the bot — series episodes, movies, anime — goes through
+one MediaPool, whoever started it. Work is of two kinds with separate slot
+counts: "remux" (segment download + -c copy remux, split) and "encode"
+(libx264). A job that got its slot is additionally admitted only while the
+disk has MEDIA_MIN_FREE_GB free and, for encodes, while the load average per
+core is below MEDIA_MAX_LOAD; until then it waits in the queue. The queue is
+visible to admins via /mediaQueue. ffmpeg itself runs under nice/ionice so
+the bot's interactive handlers stay responsive.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Optional
+
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+_ADMISSION_POLL = 15  # seconds between admission re-checks
+_WORK_DIR = "/tmp"
+
+
+class MediaPool:
+    def __init__(self, slots: dict[str, int], min_free_bytes: int, max_load: float):
+        self._slots = {kind: asyncio.Semaphore(max(1, n)) for kind, n in slots.items()}
+        self.limits = dict(slots)
+        self.min_free_bytes = min_free_bytes
+        self.max_load = max_load
+        self._ids = itertools.count(1)
+        self._entries: dict[int, dict] = {}
+
+    def _blocked_by(self, kind: str) -> Optional[str]:
+        """Why a job of this kind can't start right now, or None."""
+        free = shutil.disk_usage(_WORK_DIR).free
+        if free < self.min_free_bytes:
+            return f"мало місця ({free / 1024**3:.1f} ГБ)"
+        if kind == "encode" and hasattr(os, "getloadavg"):
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+            if load > self.max_load:
+                return f"навантаження CPU ({load:.1f}/ядро)"
+        return None
+
+    @asynccontextmanager
+    async def slot(self, kind: str, label: str):
+        """Hold a slot of `kind` for the duration of the block (waits in the queue)."""
+        entry = {
+            "id": next(self._ids),
+            "kind": kind,
+            "label": label,
+            "state": "queued",
+            "reason": None,
+            "queued_at": time.monotonic(),
+            "started_at": None,
+        }
+        self._entries[entry["id"]] = entry
+        semaphore = self._slots[kind]
+        acquired = False
+        try:
+            await semaphore.acquire()
+            acquired = True
+            while True:
+                reason = await asyncio.to_thread(self._blocked_by, kind)
+                if reason is None:
+                    break
+                if entry["reason"] != reason:
+                    logger.info(f"Media job '{label}' ({kind}) waits: {reason}")
+                entry["state"], entry["reason"] = "waiting", reason
+                await asyncio.sleep(_ADMISSION_POLL)
+            entry["state"], entry["reason"] = "running", None
+            entry["started_at"] = time.monotonic()
+            yield
+        finally:
+            if acquired:
+                semaphore.release()
+            self._entries.pop(entry["id"], None)
+
+    def snapshot(self) -> list[dict]:
+        """Current jobs, running first, then in queue order."""
+        order = {"running": 0, "waiting": 1, "queued": 2}
+        return sorted(
+            (dict(e) for e in self._entries.values()),
+            key=lambda e: (order[e["state"]], e["id"]),
+        )
+
+
+@lru_cache(maxsize=None)
+def _priority_prefix() -> tuple[str, ...]:
+    prefix: list[str] = []
+    if shutil.which("ionice"):
+        prefix += ["ionice", "-c", "2", "-n", "7"]
+    if config.MEDIA_NICE and shutil.which("nice"):
+        prefix += ["nice", "-n", str(config.MEDIA_NICE)]
+    return tuple(prefix)
+
+
+def niced(cmd: list[str]) -> list[str]:
+    """Run cmd at lowered CPU and I/O priority where nice/ionice are available."""
+    return [*_priority_prefix(), *cmd]
+
+
+media_pool = MediaPool(
+    slots={"remux": config.MEDIA_REMUX_SLOTS, "encode": config.MEDIA_ENCODE_SLOTS},
+    min_free_bytes=int(config.MEDIA_MIN_FREE_GB * 1024 ** 3),
+    max_load=config.MEDIA_MAX_LOAD,
+)
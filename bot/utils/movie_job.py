@@ -0,0 +1,289 @@
+"""
+Single-movie download jobs (kind "movie" in auto_download_jobs).
+
+A movie job goes through the same scheduler as series jobs (start_job /
+cancel_job, or the task queue) and so shares the media pool and worker
+slots. Its work is split into stages, each checkpointed in job["stages"]
+when it finishes, so a resumed job continues after the last finished one:
+
+    poster → downloaded → compressed → prepared (parts) → uploaded (per part) → created
+
+Files of an unfinished job stay in /tmp under the job id until it is done
+or fails for good.
+"""
+
+import asyncio
+import glob
+import logging
+import os
+import shutil
+
+from aiogram import Bot
+from aiogram.types import FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot.config import config
+from bot.database.auto_download_jobs import (
+    get_job, set_job_stage, set_job_status, finish_running_job,
+)
+from bot.database.movies import create_movie, create_anime_movie
+from bot.utils.ffmpeg_runner import (
+    run_ffmpeg, compress_to_limit, split_to_limit, probe_media, format_quality,
+)
+from bot.utils import hls
+from bot.utils.helpers import upload_input
+from bot.utils.progress_reporter import ProgressReporter
+from bot.utils.scraper import download_poster, get_movie_m3u8
+
+logger = logging.getLogger(__name__)
+
+# content_type -> what differs between movies and anime movies
+_CONTENT = {
+    "movie": {
+        "create": create_movie,
+        "caption": "movie",
+        "view_prefix": "m_",
+        "add_more": ("➕ Додати ще фільм", "am_add_new:movie"),
+        "add_series": ("📺 Додати серіал", "am_add_new:series"),
+    },
+    "anime_movie": {
+        "create": create_anime_movie,
+        "caption": "anime_movie",
+        "view_prefix": "am_",
+        "add_more": ("➕ Ще аніме-фільм", "aam_add_new:movie"),
+        "add_series": ("📺 Додати аніме-серіал", "aad_add_new:series"),
+    },
+}
+
+
+def _video_path(job_id: str) -> str:
+    return f"/tmp/{job_id}_movie.mp4"
+
+
+async def remove_movie_files(job_id: str) -> None:
+    """Everything the job left in /tmp: video, parts, poster, thumbnail, segments."""
+    for path in await asyncio.to_thread(glob.glob, f"/tmp/{job_id}_movie*"):
+        if await asyncio.to_thread(os.path.isdir, path):
+            await asyncio.to_thread(shutil.rmtree, path, True)
+        else:
+            await asyncio.to_thread(os.remove, path)
+
+
+async def run_movie_job(bot: Bot, job_id: str, final_attempt: bool = True) -> None:
+    """
+    Run (or resume) a movie job with a live progress message.
+    A failure is reported and re-raised; on the final attempt the job is
+    marked 'error' and its files are removed, otherwise they are kept for
+    the retry. Cancellation leaves the job and its files for a resume.
+    """
+    job = await get_job(job_id)
+    if not job:
+        logger.error(f"Movie job {job_id} not found")
+        return
+    title = job["movie"]["title"]
+    reporter = ProgressReporter(bot, job["admin_id"], title)
+    try:
+        await reporter.start()
+        movie_id, quality = await _run_stages(bot, job, reporter)
+    except asyncio.CancelledError:
+        await reporter.finish("⏹ Завантаження фільму зупинено. Продовжити можна з того ж етапу.")
+        raise
+    except Exception as e:
+        logger.error(f"Movie job {job_id} ('{title}') failed: {e}")
+        if final_attempt:
+            await set_job_status(job_id, "error")
+            await remove_movie_files(job_id)
+            await reporter.finish(f"❌ Помилка: {str(e)[:300]}")
+        else:
+            await reporter.finish(f"⚠️ Помилка: {str(e)[:300]}\nБуде ще одна спроба.")
+        raise
+    finally:
+        reporter.close()
+
+    if not await finish_running_job(job_id, 1):
+        await set_job_status(job_id, "done")
+    await remove_movie_files(job_id)
+
+    movie = job["movie"]
+    content = _CONTENT[job["content_type"]]
+    part_info = f" (частина {movie['part_number']})" if movie.get("part_number") else ""
+    series_info = f"\n📁 Серія: {movie['series_name']}{part_info}" if movie.get("series_name") else ""
+    bot_info = await bot.get_me()
+    view_url = f"https://t.me/{bot_info.username}?start={content['view_prefix']}{movie_id}"
+    done_markup = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📢 Зробити розсилку",
+                              callback_data=f"post_quick:{job['content_type']}:{movie_id}")],
+        [InlineKeyboardButton(text="🎬 Переглянути фільм", url=view_url)],
+        [InlineKeyboardButton(text=content["add_more"][0], callback_data=content["add_more"][1]),
+         InlineKeyboardButton(text=content["add_series"][0], callback_data=content["add_series"][1])],
+    ])
+    await reporter.finish(
+        f"🎉 <b>Фільм «{title}» успішно додано!</b>\n\n"
+        f"🆔 ID: <code>{movie_id}</code>\n"
+        f"📺 Якість: <b>{quality}</b>"
+        f"{series_info}",
+        done_markup,
+    )
+
+
+async def _run_stages(bot: Bot, job: dict, reporter: ProgressReporter) -> tuple[str, str]:
+    """Run the stages not checkpointed yet. Returns (movie_id, quality label)."""
+    job_id = str(job["_id"])
+    movie = job["movie"]
+    title = movie["title"]
+    stages = job.get("stages") or {}
+    video_path = _video_path(job_id)
+    content = _CONTENT[job["content_type"]]
+
+    # 1. Poster
+    if "poster" not in stages:
+        stages["poster"] = {"file_id": await _upload_poster(bot, job_id, movie, reporter)}
+        await set_job_stage(job_id, "poster", stages["poster"])
+
+    # 2-3. Video: download, compress, then split into parts if needed.
+    # Not needed at all once every part is uploaded; parts of a finished
+    # "prepared" stage are enough, otherwise the downloaded mp4 is.
+    parts = (stages.get("prepared") or {}).get("parts") or []
+    uploaded = list(stages.get("uploaded") or [])
+    all_uploaded = parts and len(uploaded) >= len(parts)
+    if "created" not in stages and not all_uploaded:
+        have_parts = parts and all([await asyncio.to_thread(os.path.exists, p) for p in parts])
+        if not have_parts:
+            downloaded = False
+            if "downloaded" not in stages or not await asyncio.to_thread(os.path.exists, video_path):
+                stages["downloaded"] = await _download_video(job, video_path, reporter)
+                await set_job_stage(job_id, "downloaded", stages["downloaded"])
+                downloaded = True
+            # A fresh download is a new file: an earlier "compressed" was about the old one
+            if downloaded or "compressed" not in stages:
+                stages["compressed"] = await _compress_video(job, video_path, reporter)
+                await set_job_stage(job_id, "compressed", stages["compressed"])
+            if stages["compressed"]["compressed"]:
+                reporter.note("Файл перевищував 1.9 ГБ — перекодовано для Telegram")
+            reporter.set_stage("main", "✂️ Перевіряю розмір файлу...")
+            parts = await split_to_limit(video_path)
+            if len(parts) > 1:
+                reporter.note(f"Файл перевищував 1.9 ГБ — розрізано на {len(parts)} частини без перекодування")
+            stages["prepared"] = {"parts": parts}
+            await set_job_stage(job_id, "prepared", stages["prepared"])
+            # Parts are new files: anything uploaded before belongs to the old ones
+            uploaded = []
+            await set_job_stage(job_id, "uploaded", uploaded)
+
+        # 4. Upload every part to the storage channel; finished parts are skipped
+        thumb_path = f"/tmp/{job_id}_movie_thumb.jpg"
+        for i, part_path in enumerate(parts, start=1):
+            if i <= len(uploaded):
+                continue
+            reporter.set_stage("main", f"📤 Вивантажую відео в канал ({i}/{len(parts)})...")
+            media = await probe_media(part_path, thumb_path)
+            part_caption = f"{content['caption']}:{title}"
+            if len(parts) > 1:
+                part_caption += f"\npart:{i}/{len(parts)}"
+            sent_video = await bot.send_video(
+                config.STORAGE_CHANNEL_ID,
+                video=upload_input(bot, part_path),
+                caption=part_caption,
+                supports_streaming=True,
+                width=media["width"] or None,
+                height=media["height"] or None,
+                duration=media["duration"] or None,
+                thumbnail=FSInputFile(thumb_path) if media["has_thumb"] else None,
+            )
+            uploaded.append({
+                "video_file_id": sent_video.video.file_id,
+                "file_size": sent_video.video.file_size or 0,
+                "duration": media["duration"],
+                "width": media["width"],
+                "height": media["height"],
+            })
+            await set_job_stage(job_id, "uploaded", uploaded)
+            reporter.item_added(media["size"])
+    width = next((p["width"] for p in uploaded if p.get("width")), 0)
+    height = next((p["height"] for p in uploaded if p.get("height")), 0)
+
+    # 5. Create movie in database
+    if "created" not in stages:
+        reporter.set_stage("main", "💾 Зберігаю фільм у базі...")
+        video_parts = [
+            {"video_file_id": p["video_file_id"], "file_size": p["file_size"], "duration": p["duration"]}
+            for p in uploaded
+        ]
+        created = await content["create"](
+            title=title,
+            title_en=movie["title_en"],
+            year=movie["year"],
+            imdb_rating=movie["imdb"],
+            poster_file_id=stages["poster"]["file_id"] or "",
+            video_file_id=video_parts[0]["video_file_id"],
+            video_type="video",
+            added_by=job["admin_id"],
+            file_size=sum(p["file_size"] for p in video_parts),
+            duration=sum(p["duration"] for p in video_parts),
+            series_name=movie.get("series_name"),
+            part_number=movie.get("part_number"),
+            video_parts=video_parts if len(video_parts) > 1 else None,
+        )
+        stages["created"] = {"movie_id": str(created["_id"])}
+        await set_job_stage(job_id, "created", stages["created"])
+
+    return stages["created"]["movie_id"], format_quality(width, height)
+
+
+async def _upload_poster(bot: Bot, job_id: str, movie: dict,
+                         reporter: ProgressReporter) -> str | None:
+    """Poster to the storage channel. Returns its file_id, or None if there is none."""
+    if not movie.get("poster_url"):
+        reporter.note(
+            "Постер не знайдено на сторінці. "
+            "Перешли постер вручну з каналу зберігання після завершення."
+        )
+        return None
+    reporter.set_stage("main", "🖼 Завантажую постер...")
+    poster_path = f"/tmp/{job_id}_movie_poster.jpg"
+    if not await download_poster(movie["poster_url"], poster_path):
+        reporter.note(
+            "Не вдалося завантажити постер автоматично. "
+            "Перешли постер вручну з каналу зберігання після завершення."
+        )
+        return None
+    try:
+        sent_photo = await bot.send_photo(
+            config.STORAGE_CHANNEL_ID,
+            photo=FSInputFile(poster_path),
+            caption=f"poster:{movie['title']}",
+        )
+    finally:
+        await asyncio.to_thread(os.remove, poster_path)
+    return sent_photo.photo[-1].file_id
+
+
+async def _download_video(job: dict, video_path: str, reporter: ProgressReporter) -> dict:
+    """
+    Resolve the m3u8 and remux it into video_path, as is — compression is
+    the next stage. Segments are kept until it succeeds.
+    """
+    reporter.set_stage("main", "📥 Отримую посилання на відео...")
+    m3u8_url = await get_movie_m3u8(job["episode_urls"][0], job["dubbing"],
+                                    content_type=job["content_type"])
+    reporter.set_stage("main", "⏳ Завантажую відео (це може зайняти кілька хвилин)...")
+
+    segments_dir = f"/tmp/{job['_id']}_movie.segments"
+    await run_ffmpeg(
+        m3u8_url, video_path, segments_dir=segments_dir, oversize_mode="split",
+        label=job["movie"]["title"], max_height=hls.max_height_for(job["content_type"]),
+    )
+    await asyncio.to_thread(shutil.rmtree, segments_dir, True)
+    return {"size": await asyncio.to_thread(os.path.getsize, video_path)}
+
+
+async def _compress_video(job: dict, video_path: str, reporter: ProgressReporter) -> dict:
+    """Re-encode video_path to fit the Telegram limit (OVERSIZE_MODE "compress" only)."""
+    if config.OVERSIZE_MODE != "compress":
+        return {"compressed": False}
+
+    async def on_compress_progress(pct: int):
+        reporter.set_stage("main", f"⚙️ Перекодування відео: {pct}%...")
+
+    was_compressed = await compress_to_limit(video_path, on_compress_progress,
+                                             label=job["movie"]["title"])
+    return {"compressed": was_compressed}
@@ -0,0 +1,62 @@
+"""
+Cache for uakino.best AJAX playlist fragments.
+
+The playlist endpoint is called with ti=dle_edittime, so (news_id, edittime)
+identifies one exact version of a playlist: as long as the page reports the
+same edittime the fragment cannot have changed. Entries live in an in-memory
+LRU and, when PLAYLIST_CACHE_MONGO is enabled, in the playlist_cache
+collection so they survive restarts.
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from bot.config import config
+from bot.database.playlist_cache import get_cached_playlist, save_cached_playlist
+
+logger = logging.getLogger(__name__)
+
+_MAX_ENTRIES = 128
+
+
+class PlaylistCache:
+    def __init__(self, max_entries: int = _MAX_ENTRIES, persistent: bool = False):
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._entries: OrderedDict[tuple[str, str], str] = OrderedDict()
+
+    def _remember(self, key: tuple[str, str], html: str) -> None:
+        self._entries[key] = html
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, news_id: str, edittime: str) -> Optional[str]:
+        key = (news_id, edittime)
+        html = self._entries.get(key)
+        if html is not None:
+            self._entries.move_to_end(key)
+            return html
+        if not self.persistent:
+            return None
+        try:
+            html = await get_cached_playlist(news_id, edittime)
+        except Exception as e:
+            logger.warning(f"Playlist cache lookup failed for news_id={news_id}: {e}")
+            return None
+        if html is not None:
+            self._remember(key, html)
+        return html
+
+    async def put(self, news_id: str, edittime: str, html: str) -> None:
+        self._remember((news_id, edittime), html)
+        if not self.persistent:
+            return
+        try:
+            await save_cached_playlist(news_id, edittime, html)
+        except Exception as e:
+            logger.warning(f"Playlist cache save failed for news_id={news_id}: {e}")
+
+
+playlist_cache = PlaylistCache(persistent=config.PLAYLIST_CACHE_MONGO)
@@ -0,0 +1,199 @@
+"""
+Live progress of a long download job in one Telegram message.
+
+Instead of a new message for every episode, warning and error, a job keeps a
+single status message and edits it: at most once per PROGRESS_EDIT_INTERVAL
+seconds, and only when something changed. The message shows the current
+stages, episodes done, throughput, ETA and a compact error summary. When the
+job ends, finish() makes one last edit and sends the final report as a new
+message (the only one the admin gets notified about).
+"""
+
+import asyncio
+import html
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+_MAX_SHOWN_ERRORS = 5
+_ERROR_TEXT_LEN = 80
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes = rest // 60
+    if hours:
+        return f"{hours} год {minutes} хв"
+    if minutes:
+        return f"{minutes} хв"
+    return f"{seconds} с"
+
+
+class ProgressReporter:
+    def __init__(self, bot: Bot, chat_id: int, title: str, total: int = 0,
+                 already: int = 0, interval: Optional[float] = None):
+        """
+        total: number of items (episodes) in the job, 0 for a single movie;
+        already: items finished before this run (a resumed job).
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.title = title
+        self.total = total
+        self.already = already
+        self.interval = config.PROGRESS_EDIT_INTERVAL if interval is None else interval
+        self.added = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_done = 0
+        self._stages: dict[str, str] = {}
+        self._notes: list[str] = []
+        self._errors: list[str] = []
+        self._started = time.monotonic()
+        self._message: Optional[Message] = None
+        self._dirty = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    # ── Updates (no Telegram calls; the flusher picks them up) ────────────
+
+    def set_stage(self, key: str, text: str) -> None:
+        """Current activity of one part of the job (e.g. "download", "upload")."""
+        self._stages[key] = text
+        self._dirty.set()
+
+    def clear_stage(self, key: str) -> None:
+        if self._stages.pop(key, None) is not None:
+            self._dirty.set()
+
+    def item_added(self, size: int = 0) -> None:
+        self.added += 1
+        self.bytes_done += size
+        self._dirty.set()
+
+    def item_skipped(self) -> None:
+        self.skipped += 1
+        self._dirty.set()
+
+    def item_failed(self, label: str, error) -> None:
+        self.failed += 1
+        self.error(label, error)
+
+    def error(self, label: str, error) -> None:
+        self._errors.append(f"{label}: {str(error)[:_ERROR_TEXT_LEN]}")
+        self._dirty.set()
+
+    def note(self, text: str) -> None:
+        """Non-error remark shown in the status and the final report."""
+        self._notes.append(text)
+        self._dirty.set()
+
+    # ── Telegram side ─────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        """Send the live message and start editing it in the background."""
+        self._message = await self.bot.send_message(self.chat_id, self.render())
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def finish(self, headline: str,
+                     reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        """Last edit of the live message, then one final report message."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        self._stages.clear()
+        self._dirty.clear()
+        await self._edit()
+        try:
+            await self.bot.send_message(
+                self.chat_id, f"{headline}\n\n{self.render(final=True)}",
+                reply_markup=reply_markup,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to send final report for '{self.title}': {e}")
+
+    def close(self) -> None:
+        """Stop background edits without a final report (job task is going away)."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            await self._edit()
+            await asyncio.sleep(self.interval)
+
+    async def _edit(self) -> None:
+        if self._message is None:
+            return
+        try:
+            await self._message.edit_text(self.render())
+        except TelegramRetryAfter as e:
+            # Chat is rate limited: skip this edit, the next one carries the state
+            await asyncio.sleep(e.retry_after)
+            self._dirty.set()
+        except TelegramBadRequest as e:
+            if "not modified" not in str(e):
+                logger.warning(f"Progress edit failed for '{self.title}': {e}")
+        except Exception as e:
+            logger.warning(f"Progress edit failed for '{self.title}': {e}")
+
+    # ── Rendering ─────────────────────────────────────────────────────────
+
+    def _rate(self) -> float:
+        """Bytes per second of finished items since the job started."""
+        elapsed = time.monotonic() - self._started
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def _eta(self) -> Optional[float]:
+        worked = self.added + self.failed
+        remaining = self.total - self.already - worked - self.skipped
+        if not worked or remaining <= 0:
+            return None
+        return (time.monotonic() - self._started) / worked * remaining
+
+    def render(self, final: bool = False) -> str:
+        lines = [f"📥 <b>{html.escape(self.title)}</b>"]
+        if not final:
+            for text in self._stages.values():
+                lines.append(html.escape(text))
+        if self.total:
+            handled = self.already + self.added + self.skipped + self.failed
+            counts = f"✅ {self.added}"
+            if self.skipped:
+                counts += f" · ⏭ {self.skipped}"
+            if self.failed:
+                counts += f" · ❌ {self.failed}"
+            lines.append(f"Серії: {handled}/{self.total} ({counts})")
+        stats = []
+        if self.bytes_done:
+            stats.append(f"⚡ {self._rate() / 1_000_000:.1f} MB/s")
+        if final:
+            stats.append(f"⏱ {_format_duration(time.monotonic() - self._started)}")
+        else:
+            eta = self._eta()
+            if eta is not None:
+                stats.append(f"⏳ ще ~{_format_duration(eta)}")
+        if stats:
+            lines.append(" · ".join(stats))
+        for text in self._notes[-_MAX_SHOWN_ERRORS:]:
+            lines.append(f"ℹ️ {html.escape(text)}")
+        if self._errors:
+            lines.append(f"⚠️ Помилки ({len(self._errors)}):")
+            for text in self._errors[-_MAX_SHOWN_ERRORS:]:
+                lines.append(f"• {html.escape(text)}")
+            hidden = len(self._errors) - _MAX_SHOWN_ERRORS
+            if hidden > 0:
+                lines.append(f"• … ще {hidden}")
+        return "\n".join(lines)
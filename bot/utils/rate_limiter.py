@@ -0,0 +1,119 @@
+"""
+Per-host async rate limiting for outgoing scraper requests.
+
+Each host gets a token bucket. Callers await acquire() before a request; the
+wait happens on the event loop, so a throttled site never ties up a thread or
+delays requests to other hosts. On HTTP 429 the bucket is blocked for the
+server's Retry-After (or an exponential backoff), at most _MAX_BACKOFF, and its
+rate is halved; every successful request then nudges the rate back towards the
+configured one.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# host suffix -> (requests per second, burst)
+_HOST_LIMITS: dict[str, tuple[float, int]] = {
+    "uakino.best": (2.0, 4),
+    "uafix.net": (2.0, 4),
+    "ashdi.vip": (4.0, 6),
+    "zetvideo.net": (2.0, 4),
+}
+_DEFAULT_LIMIT = (20.0, 20)  # CDNs, poster hosts, etc.
+
+_MIN_RATE_FACTOR = 0.1       # never slow down below 10% of the configured rate
+_RECOVERY_FACTOR = 0.05      # each success restores 5% of the configured rate
+_BASE_BACKOFF = 10.0         # seconds, when the server sends no Retry-After
+_MAX_BACKOFF = 120.0
+
+
+class HostRateLimiter:
+    """Token bucket with AIMD adaptation for a single host."""
+
+    def __init__(self, rate: float, burst: int):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_429 = 0
+        # asyncio.Lock wakes waiters in FIFO order, so requests are served in arrival order
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a request to this host is allowed."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self) -> None:
+        self._consecutive_429 = 0
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * _RECOVERY_FACTOR)
+
+    def on_rate_limited(self, retry_after: Optional[float]) -> float:
+        """
+        Register a 429. Returns the delay (seconds) before the next request.
+        A Retry-After longer than _MAX_BACKOFF is cut to it: the bucket is
+        shared by every job that scrapes the host, including /checkUpdates.
+        """
+        self._consecutive_429 += 1
+        self.rate = max(self.base_rate * _MIN_RATE_FACTOR, self.rate / 2)
+        if retry_after is None:
+            retry_after = _BASE_BACKOFF * 2 ** (self._consecutive_429 - 1)
+        retry_after = min(_MAX_BACKOFF, retry_after)
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + retry_after)
+        self._tokens = 0.0
+        self._updated = now
+        return retry_after
+
+
+_limiters: dict[str, HostRateLimiter] = {}
+
+
+def get_limiter(host: str) -> HostRateLimiter:
+    """Return the shared limiter for host (www.uakino.best shares uakino.best's bucket)."""
+    host = host.lower().split(":")[0]
+    key, limit = host, _DEFAULT_LIMIT
+    for suffix, host_limit in _HOST_LIMITS.items():
+        if host == suffix or host.endswith("." + suffix):
+            key, limit = suffix, host_limit
+            break
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = HostRateLimiter(*limit)
+        _limiters[key] = limiter
+    return limiter
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
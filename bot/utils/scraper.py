@@ -9,31 +9,35 @@ Flow:
   3. For each episode the data-file attribute is a protocol-relative URL to
      ashdi.vip (//ashdi.vip/vod/<id>). Fetch that page and extract the
      m3u8 URL from the Playerjs initialisation script.
+
+All network I/O goes through the pooled async sessions in http_client;
+HTML parsing is pushed to a worker thread so it never blocks the event loop.
 """
 
 import asyncio
 import json
 import logging
 import re
-from functools import partial
+import time
 from typing import Optional
 from urllib.parse import urlparse, parse_qs
 
 logger = logging.getLogger(__name__)
 
-from curl_cffi import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
-_HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    ),
-}
+from bot.utils import hls
+from bot.utils.ffmpeg_runner import TELEGRAM_SIZE_LIMIT
+from bot.utils.http_client import fetch as _fetch
+from bot.utils.playlist_cache import playlist_cache
 
 _PLAYLIST_ENDPOINT = "https://uakino.best/engine/ajax/playlists.php"
 
+# ashdi.vip serial pages: serial_id -> (fetched_at, parsed Playerjs tree)
+_ASHDI_SERIAL_TTL = 600
+_ashdi_serial_cache: dict[str, tuple[float, list]] = {}
+_ashdi_serial_locks: dict[str, asyncio.Lock] = {}
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -46,42 +50,78 @@ def _make_absolute(url: str) -> str:
     return url
 
 
-def _fetch(url: str, *, method: str = "GET", data: Optional[dict] = None,
-           referer: Optional[str] = None) -> requests.Response:
-    import time, random
-    headers = dict(_HEADERS)
-    if referer:
-        headers["Referer"] = referer
+# ---------------------------------------------------------------------------
+# HTML extraction backend
+#
+# Pages are only ever read for a handful of nodes, so every parse is
+# restricted with a SoupStrainer to the top-level elements the caller needs,
+# and uses lxml when it is installed. html.parser remains the fallback.
+# ---------------------------------------------------------------------------
+
+try:
+    import lxml  # noqa: F401
+    _HTML_PARSER = "lxml"
+except ImportError:
+    _HTML_PARSER = "html.parser"
+
+
+def _classes(attrs: dict) -> list[str]:
+    value = attrs.get("class") or ""
+    return value.split() if isinstance(value, str) else list(value)
+
 
-    for attempt in range(4):
-        if method == "POST":
-            headers["X-Requested-With"] = "XMLHttpRequest"
-            headers["Accept"] = "application/json, text/javascript, */*; q=0.01"
-            resp = requests.post(url, headers=headers, data=data, timeout=30, impersonate="chrome120")
-        else:
-            resp = requests.get(url, headers=headers, timeout=30, impersonate="chrome120")
+def _only(tags: tuple[str, ...] = (), classes: tuple[str, ...] = (),
+          itemprops: tuple[str, ...] = ()) -> SoupStrainer:
+    """Strainer keeping elements that match any of the given tag names, classes or itemprops."""
+    def match(name, attrs) -> bool:
+        if name in tags:
+            return True
+        if classes and any(c in classes for c in _classes(attrs)):
+            return True
+        return bool(itemprops) and attrs.get("itemprop") in itemprops
+    return SoupStrainer(match)
 
-        if resp.status_code == 429:
-            if attempt == 3:
-                resp.raise_for_status()
-            wait = 10 * (attempt + 1) + random.uniform(0, 5)
-            logger.warning(f"Rate limited (429) on {url}, retrying in {wait:.1f}s (attempt {attempt + 1}/3)")
-            time.sleep(wait)
-            continue
 
-        resp.raise_for_status()
-        return resp
+# .playlists-lists (dubbing tabs) and .playlists-videos (episode rows)
+_PLAYLIST_NODES = _only(classes=("playlists-lists", "playlists-videos"))
+# DLE movie/series page: metadata blocks plus the player containers
+_DLE_PAGE_NODES = _only(
+    tags=("h1",),
+    classes=("solototle", "origintitle", "film-info", "film-poster",
+             "playlists-ajax", "players-section"),
+)
+_UAFIX_META_NODES = _only(
+    tags=("h1",),
+    classes=("eng-rus", "year", "rat-imdb", "gogo-online"),
+    itemprops=("alternativeHeadline", "dateCreated"),
+)
+_PLAYER_NODES = _only(tags=("iframe",), classes=("playlists-ajax",))
+_ANCHOR_NODES = _only(tags=("a",))
+_SEASON_LIST_NODES = _only(classes=("seasons",))
 
-    return resp  # unreachable but satisfies type checker
 
+def _parse_html(html: str, only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    return BeautifulSoup(html, _HTML_PARSER, parse_only=only)
 
-def _get_playlist_html(page_url: str) -> str:
+
+async def _make_soup(html: str, only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """Build a (restricted) BeautifulSoup tree in a worker thread (parsing is CPU-bound)."""
+    return await asyncio.to_thread(_parse_html, html, only)
+
+
+async def _get_playlist_html(page_url: str, page_html: Optional[str] = None) -> str:
     """
     Fetch the season page, then call the AJAX playlist endpoint.
     Returns the raw HTML fragment with dubbing tabs and episode list.
+
+    page_html can be passed when the caller already has the page.
+    The fragment is cached by (news_id, dle_edittime), so the AJAX endpoint
+    is only hit again once the site bumps the edittime.
     """
-    resp = _fetch(page_url)
-    text = resp.text
+    if page_html is None:
+        resp = await _fetch(page_url)
+        page_html = resp.text
+    text = page_html
 
     # Extract news_id from the playlists-ajax div
     news_id_match = re.search(r'data-news_id=["\'](\d+)["\']', text)
@@ -95,8 +135,12 @@ def _get_playlist_html(page_url: str) -> str:
         raise ValueError(f"Cannot find dle_edittime on page: {page_url}")
     edittime = edittime_match.group(1)
 
+    cached = await playlist_cache.get(news_id, edittime)
+    if cached is not None:
+        return cached
+
     payload = {"news_id": news_id, "xfield": "playlist", "ti": edittime}
-    ajax_resp = _fetch(_PLAYLIST_ENDPOINT, method="POST", data=payload, referer=page_url)
+    ajax_resp = await _fetch(_PLAYLIST_ENDPOINT, method="POST", data=payload, referer=page_url)
 
     try:
         json_data = ajax_resp.json()
@@ -106,7 +150,9 @@ def _get_playlist_html(page_url: str) -> str:
     if not json_data.get("success"):
         raise ValueError(f"Playlist AJAX returned failure: {json_data.get('message')}")
 
-    return json_data["response"]
+    html = json_data["response"]
+    await playlist_cache.put(news_id, edittime, html)
+    return html
 
 
 def _parse_playlist_html(html: str) -> dict:
@@ -121,7 +167,7 @@ def _parse_playlist_html(html: str) -> dict:
         ]
       }
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = _parse_html(html, _PLAYLIST_NODES)
 
     # Dubbing tabs live in .playlists-lists .playlists-items li[data-id]
     dubbing_names: list[str] = []
@@ -188,9 +234,9 @@ def _extract_episode_number(title: str) -> Optional[int]:
     return None
 
 
-def _sync_parse_season_page(url: str, dubbing: str) -> dict:
-    html = _get_playlist_html(url)
-    parsed = _parse_playlist_html(html)
+async def _parse_season_page(url: str, dubbing: str) -> dict:
+    html = await _get_playlist_html(url)
+    parsed = await asyncio.to_thread(_parse_playlist_html, html)
 
     dubbings = parsed["dubbings"]
     episodes = parsed["episodes"]
@@ -234,70 +280,80 @@ def _sync_parse_season_page(url: str, dubbing: str) -> dict:
     return {"dubbings": dubbings, "episode_urls": episode_urls, "episode_numbers": episode_numbers}
 
 
-def _resolve_best_quality_m3u8(master_url: str) -> str:
+async def _resolve_best_quality_m3u8(master_url: str, content_type: Optional[str] = None) -> str:
     """
-    If master_url is an HLS master playlist, return the variant URL with the
-    highest BANDWIDTH value. Otherwise return master_url unchanged.
+    If master_url is an HLS master playlist, return the best variant that is
+    predicted to fit under the Telegram limit and within the resolution cap
+    for content_type (see hls.select_variant). Otherwise return master_url
+    unchanged.
     """
     try:
-        resp = _fetch(master_url)
+        resp = await _fetch(master_url)
         content = resp.text
     except Exception:
         return master_url
 
-    if "#EXT-X-STREAM-INF" not in content:
+    if not hls.is_master_playlist(content):
         return master_url  # already a media playlist, not a master
 
-    best_bw = -1
-    best_url = None
-    lines = content.splitlines()
-    base = master_url.rsplit("/", 1)[0]
-
-    for i, line in enumerate(lines):
-        if not line.startswith("#EXT-X-STREAM-INF"):
-            continue
-        bw_match = re.search(r"BANDWIDTH=(\d+)", line)
-        if not bw_match:
-            continue
-        bw = int(bw_match.group(1))
-        if bw > best_bw and i + 1 < len(lines):
-            variant = lines[i + 1].strip()
-            if variant and not variant.startswith("#"):
-                if not variant.startswith("http"):
-                    variant = base + "/" + variant
-                best_bw = bw
-                best_url = variant
-
-    if best_url:
-        logger.info(f"Selected best quality variant (bandwidth={best_bw}): {best_url}")
-        return best_url
-    return master_url
-
-
-def _sync_get_ashdi_serial_m3u8(serial_url: str, dubbing: Optional[str]) -> str:
-    """
-    Fetch ashdi.vip/serial/<id>?season=N&episode=M, parse the Playerjs JSON,
-    find the correct dubbing/season/episode, return m3u8 URL.
+    best = await hls.choose_variant(
+        content, master_url, TELEGRAM_SIZE_LIMIT, hls.max_height_for(content_type),
+    )
+    return best["url"] if best else master_url
+
+
+async def _get_ashdi_serial_tree(serial_url: str, referer: str = "https://uafix.net/") -> list:
+    """
+    Return the parsed Playerjs JSON of an ashdi.vip/serial/<id> page.
+
+    The page embeds every dubbing, season and episode of the serial, so the
+    parsed tree is cached per serial id for _ASHDI_SERIAL_TTL seconds — a
+    whole season resolves from a single page fetch. Concurrent callers for
+    the same serial wait for one fetch instead of each downloading the page.
 
     JSON structure:
       [{"title":"DubName","folder":[{"title":"Сезон N","folder":[
           {"title":"Серія M","file":"m3u8_url",...}
       ]}]},...]
     """
+    sid_match = re.search(r"ashdi\.vip/serial/(\d+)", serial_url)
+    serial_id = sid_match.group(1) if sid_match else serial_url
+
+    lock = _ashdi_serial_locks.setdefault(serial_id, asyncio.Lock())
+    async with lock:
+        cached = _ashdi_serial_cache.get(serial_id)
+        if cached and time.monotonic() - cached[0] < _ASHDI_SERIAL_TTL:
+            return cached[1]
+
+        resp = await _fetch(serial_url, referer=referer)
+        json_match = re.search(r"file\s*:\s*'(\[.*?\])'", resp.text, re.DOTALL)
+        if not json_match:
+            raise ValueError(f"No Playerjs JSON found on ashdi serial page: {serial_url}")
+        data = await asyncio.to_thread(json.loads, json_match.group(1))
+
+        now = time.monotonic()
+        _prune_ashdi_serial_cache(now)
+        _ashdi_serial_cache[serial_id] = (now, data)
+        return data
+
+
+def _prune_ashdi_serial_cache(now: float) -> None:
+    """Drop expired serial trees and the locks nobody holds or waits on."""
+    for serial_id, (fetched_at, _) in list(_ashdi_serial_cache.items()):
+        if now - fetched_at >= _ASHDI_SERIAL_TTL:
+            del _ashdi_serial_cache[serial_id]
+    for serial_id, lock in list(_ashdi_serial_locks.items()):
+        if serial_id not in _ashdi_serial_cache and not lock.locked():
+            del _ashdi_serial_locks[serial_id]
+
+
+def _find_ashdi_episode_file(data: list, serial_url: str, dubbing: Optional[str]) -> str:
+    """Pick the dubbing/season/episode named by serial_url's query from a serial tree."""
     parsed_url = urlparse(serial_url)
     params = parse_qs(parsed_url.query)
     season_num = int(params.get("season", [1])[0])
     episode_num = int(params.get("episode", [1])[0])
 
-    resp = _fetch(serial_url, referer="https://uafix.net/")
-    text = resp.text
-
-    json_match = re.search(r"file\s*:\s*'(\[.*?\])'", text, re.DOTALL)
-    if not json_match:
-        raise ValueError(f"No Playerjs JSON found on ashdi serial page: {serial_url}")
-
-    data = json.loads(json_match.group(1))
-
     if dubbing:
         dub_entry = next(
             (d for d in data if d.get("title", "").strip() == dubbing), None
@@ -330,23 +386,34 @@ def _sync_get_ashdi_serial_m3u8(serial_url: str, dubbing: Optional[str]) -> str:
     m3u8_url = ep_entry.get("file", "")
     if not m3u8_url:
         raise ValueError(f"No file URL in episode entry for {serial_url}")
+    return m3u8_url
 
-    return _resolve_best_quality_m3u8(m3u8_url)
 
+async def _get_ashdi_serial_m3u8(serial_url: str, dubbing: Optional[str],
+                                 content_type: Optional[str] = None) -> str:
+    """
+    Resolve ashdi.vip/serial/<id>?season=N&episode=M to an m3u8 URL for the
+    given dubbing, using the cached serial tree.
+    """
+    data = await _get_ashdi_serial_tree(serial_url)
+    m3u8_url = _find_ashdi_episode_file(data, serial_url, dubbing)
+    return await _resolve_best_quality_m3u8(m3u8_url, content_type)
 
-def _sync_get_m3u8_url(episode_url: str, dubbing: Optional[str] = None) -> str:
+
+async def _get_m3u8_url(episode_url: str, dubbing: Optional[str] = None,
+                        content_type: Optional[str] = None) -> str:
     """
     Fetch an episode player page and extract the HLS m3u8 URL.
 
     Handles two URL types:
       • ashdi.vip/serial/<id>?season=N&episode=M  — uafix.net series; dubbing required
       • ashdi.vip/vod/<id>                        — uakino.best; dubbing ignored
-    Resolves master playlists to the highest-bandwidth variant.
+    Resolves master playlists through the variant policy for content_type.
     """
     if "ashdi.vip/serial/" in episode_url:
-        return _sync_get_ashdi_serial_m3u8(episode_url, dubbing)
+        return await _get_ashdi_serial_m3u8(episode_url, dubbing, content_type)
 
-    resp = _fetch(episode_url, referer="https://uakino.best/")
+    resp = await _fetch(episode_url, referer="https://uakino.best/")
     text = resp.text
 
     m3u8_match = re.search(
@@ -357,10 +424,10 @@ def _sync_get_m3u8_url(episode_url: str, dubbing: Optional[str] = None) -> str:
         raise ValueError(f"No m3u8 URL found on episode page: {episode_url}")
 
     url = _make_absolute(m3u8_match.group(1))
-    return _resolve_best_quality_m3u8(url)
+    return await _resolve_best_quality_m3u8(url, content_type)
 
 
-def _sync_parse_movie_page(url: str) -> dict:
+async def _parse_uakino_movie_page(url: str) -> dict:
     """
     Parse a uakino.best movie page and return metadata.
 
@@ -374,8 +441,8 @@ def _sync_parse_movie_page(url: str) -> dict:
       • Direct iframe variant  — has a plain <iframe src="https://ashdi.vip/vod/...">
         block; the tab label ("UA #1", etc.) is treated as the single dubbing.
     """
-    resp = _fetch(url)
-    soup = BeautifulSoup(resp.text, "html.parser")
+    resp = await _fetch(url)
+    soup = await _make_soup(resp.text, _DLE_PAGE_NODES)
 
     meta = _extract_dle_metadata(soup, "https://uakino.best")
     title = meta["title"]
@@ -388,8 +455,8 @@ def _sync_parse_movie_page(url: str) -> dict:
     ajax_div = soup.find("div", class_="playlists-ajax")
     if ajax_div and ajax_div.get("data-news_id"):
         try:
-            playlist_html = _get_playlist_html(url)
-            parsed = _parse_playlist_html(playlist_html)
+            playlist_html = await _get_playlist_html(url, resp.text)
+            parsed = await asyncio.to_thread(_parse_playlist_html, playlist_html)
             voices = [ep["voice"] for ep in parsed["episodes"] if ep.get("voice")]
             dubbings = voices if voices else parsed["dubbings"]
         except Exception as e:
@@ -416,12 +483,16 @@ def _sync_parse_movie_page(url: str) -> dict:
     }
 
 
-def _sync_download_poster(poster_url: str, output_path: str) -> bool:
+def _write_file(path: str, content: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+async def _download_poster(poster_url: str, output_path: str) -> bool:
     """Download a poster image to output_path. Returns True on success."""
     try:
-        resp = _fetch(poster_url)
-        with open(output_path, "wb") as f:
-            f.write(resp.content)
+        resp = await _fetch(poster_url)
+        await asyncio.to_thread(_write_file, output_path, resp.content)
         return True
     except Exception as e:
         logger.warning(f"Failed to download poster from {poster_url}: {e}")
@@ -499,7 +570,7 @@ def _extract_dle_metadata(soup: "BeautifulSoup", base_url: str) -> dict:
     }
 
 
-def _sync_parse_uafix_movie_page(url: str) -> dict:
+async def _parse_uafix_movie_page(url: str) -> dict:
     """
     Parse a uafix.net page (movie or series) and return metadata.
     uafix.net uses a different HTML template than uakino.best:
@@ -510,8 +581,8 @@ def _sync_parse_uafix_movie_page(url: str) -> dict:
       - poster:   <img class="gogo-online" src="...">
     uafix movies have a single stream, so dubbings=["UA"].
     """
-    resp = _fetch(url)
-    soup = BeautifulSoup(resp.text, "html.parser")
+    resp = await _fetch(url)
+    soup = await _make_soup(resp.text, _UAFIX_META_NODES)
 
     # Ukrainian title — take the part before the first " / "
     title = None
@@ -565,20 +636,20 @@ def _sync_parse_uafix_movie_page(url: str) -> dict:
     }
 
 
-def _sync_get_uafix_movie_m3u8(url: str) -> str:
+async def _get_uafix_movie_m3u8(url: str, content_type: Optional[str] = None) -> str:
     """
     Get m3u8 URL for a uafix.net movie.
     Flow: movie page → zetvideo.net iframe → Playerjs file → m3u8.
     """
-    resp = _fetch(url)
-    soup = BeautifulSoup(resp.text, "html.parser")
+    resp = await _fetch(url)
+    soup = await _make_soup(resp.text, _PLAYER_NODES)
 
     iframe = soup.find("iframe", src=re.compile(r"zetvideo\.net", re.I))
     if not iframe:
         raise ValueError(f"No zetvideo.net iframe found on uafix movie page: {url}")
 
     zetvideo_url = _make_absolute(iframe["src"])
-    resp2 = _fetch(zetvideo_url, referer=url)
+    resp2 = await _fetch(zetvideo_url, referer=url)
 
     m3u8_match = re.search(
         r"""file\s*:\s*['"]((https?:)?//[^'"]+\.m3u8)['"]""",
@@ -587,10 +658,10 @@ def _sync_get_uafix_movie_m3u8(url: str) -> str:
     if not m3u8_match:
         raise ValueError(f"No m3u8 URL found on zetvideo page: {zetvideo_url}")
 
-    return _resolve_best_quality_m3u8(_make_absolute(m3u8_match.group(1)))
+    return await _resolve_best_quality_m3u8(_make_absolute(m3u8_match.group(1)), content_type)
 
 
-def _sync_parse_uafix_series_page(url: str, season: int, dubbing: str) -> dict:
+async def _parse_uafix_series_page(url: str, season: int, dubbing: str) -> dict:
     """
     Parse a uafix.net series page (e.g. https://uafix.net/serials/rik-ta-morti/).
 
@@ -602,8 +673,8 @@ def _sync_parse_uafix_series_page(url: str, season: int, dubbing: str) -> dict:
       Returns {"dubbings": [], "episode_urls": [...ashdi serial URLs...], "episode_numbers": [...]}.
       episode_urls are ashdi.vip/serial/<id>?season=N&episode=M for each episode.
     """
-    resp = _fetch(url)
-    soup = BeautifulSoup(resp.text, "html.parser")
+    resp = await _fetch(url)
+    soup = await _make_soup(resp.text, _ANCHOR_NODES)
 
     season_pat = re.compile(r"season-(\d+)-episode-(\d+)", re.I)
     seen_eps: dict[int, str] = {}
@@ -624,8 +695,8 @@ def _sync_parse_uafix_series_page(url: str, season: int, dubbing: str) -> dict:
 
     # Fetch the first episode page to get the ashdi serial ID
     first_ep_page = sorted_eps[0][1]
-    resp2 = _fetch(first_ep_page)
-    soup2 = BeautifulSoup(resp2.text, "html.parser")
+    resp2 = await _fetch(first_ep_page)
+    soup2 = await _make_soup(resp2.text, _PLAYER_NODES)
     iframe = soup2.find("iframe", src=re.compile(r"ashdi\.vip/serial/", re.I))
     if not iframe:
         raise ValueError(f"No ashdi serial iframe on episode page: {first_ep_page}")
@@ -640,11 +711,7 @@ def _sync_parse_uafix_series_page(url: str, season: int, dubbing: str) -> dict:
 
     if not dubbing:
         first_ashdi = f"https://ashdi.vip/serial/{serial_id}?season={season}&episode={episode_numbers[0]}"
-        resp3 = _fetch(first_ashdi, referer=url)
-        json_match = re.search(r"file\s*:\s*'(\[.*?\])'", resp3.text, re.DOTALL)
-        if not json_match:
-            raise ValueError(f"No Playerjs JSON on ashdi serial page: {first_ashdi}")
-        data = json.loads(json_match.group(1))
+        data = await _get_ashdi_serial_tree(first_ashdi, referer=url)
         dubbings = [d.get("title", "").strip() for d in data if d.get("title", "").strip()]
         return {"dubbings": dubbings, "episode_urls": [], "episode_numbers": []}
 
@@ -655,7 +722,20 @@ def _sync_parse_uafix_series_page(url: str, season: int, dubbing: str) -> dict:
     return {"dubbings": [], "episode_urls": episode_urls, "episode_numbers": episode_numbers}
 
 
-def _sync_get_movie_m3u8(url: str, dubbing: str) -> str:
+async def _get_uafix_season_numbers(url: str) -> list[int]:
+    """Season numbers linked from a uafix.net series page (season-N-episode-M anchors)."""
+    resp = await _fetch(url)
+    soup = await _make_soup(resp.text, _ANCHOR_NODES)
+    season_pat = re.compile(r"season-(\d+)-episode-\d+", re.I)
+    seasons = set()
+    for a in soup.find_all("a", href=True):
+        m = season_pat.search(a["href"])
+        if m:
+            seasons.add(int(m.group(1)))
+    return sorted(seasons)
+
+
+async def _get_uakino_movie_m3u8(url: str, dubbing: str, content_type: Optional[str] = None) -> str:
     """
     For a movie page, get the m3u8 URL for the selected dubbing.
 
@@ -664,15 +744,15 @@ def _sync_get_movie_m3u8(url: str, dubbing: str) -> str:
       • Direct iframe variant — ignores dubbing (only one stream) and reads the
         ashdi iframe src directly from the page HTML.
     """
-    resp = _fetch(url)
-    soup = BeautifulSoup(resp.text, "html.parser")
+    resp = await _fetch(url)
+    soup = await _make_soup(resp.text, _PLAYER_NODES)
 
     # Determine which variant we're dealing with
     ajax_div = soup.find("div", class_="playlists-ajax")
     if ajax_div and ajax_div.get("data-news_id"):
         # AJAX variant — same logic as series pages but per-dubbing
-        playlist_html = _get_playlist_html(url)
-        parsed = _parse_playlist_html(playlist_html)
+        playlist_html = await _get_playlist_html(url, resp.text)
+        parsed = await asyncio.to_thread(_parse_playlist_html, playlist_html)
         episodes = parsed["episodes"]
 
         # Match by voice name (exact)
@@ -697,17 +777,17 @@ def _sync_get_movie_m3u8(url: str, dubbing: str) -> str:
             raise ValueError(f"No ashdi.vip iframe found on movie page: {url}")
         episode_url = iframe["src"]
 
-    return _sync_get_m3u8_url(episode_url)
+    return await _get_m3u8_url(episode_url, content_type=content_type)
 
 
 # ---------------------------------------------------------------------------
 # Public async API
 # ---------------------------------------------------------------------------
 
-def _sync_get_uakino_season_urls(base_url: str) -> dict[int, str]:
+async def _get_uakino_season_urls(base_url: str) -> dict[int, str]:
     """Fetch a uakino.best series page and return {season_num: url} for all seasons."""
-    resp = _fetch(base_url)
-    soup = BeautifulSoup(resp.text, "html.parser")
+    resp = await _fetch(base_url)
+    soup = await _make_soup(resp.text, _SEASON_LIST_NODES)
     seasons_ul = soup.find("ul", class_="seasons")
     result: dict[int, str] = {}
     if seasons_ul:
@@ -728,8 +808,36 @@ def _sync_get_uakino_season_urls(base_url: str) -> dict[int, str]:
 
 async def get_uakino_season_urls(base_url: str) -> dict[int, str]:
     """Return {season_num: url} for all seasons of a uakino.best series."""
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, _sync_get_uakino_season_urls, base_url)
+    return await _get_uakino_season_urls(base_url)
+
+
+async def get_series_seasons(url: str) -> dict[int, str]:
+    """
+    Return {season_num: url} for all seasons of a series on either site.
+    uafix.net keeps every season on the series page, so the URL repeats —
+    pass the season number to parse_season_page.
+    """
+    if _detect_site(url) == "uafix":
+        return {season: url for season in await _get_uafix_season_numbers(url)}
+    return await _get_uakino_season_urls(url)
+
+
+async def parse_series_seasons(season_urls: dict[int, str], dubbing: str) -> dict[int, dict]:
+    """
+    parse_season_page for every season at once (requests are paced per host
+    by the rate limiter). Returns {season_num: result}; a season that could
+    not be parsed — e.g. it has no such dubbing — maps to {"error": str}.
+    """
+    async def parse(season: int, url: str) -> dict:
+        try:
+            return await parse_season_page(url, dubbing, season=season)
+        except Exception as e:
+            logger.warning(f"Season {season} of {url} not parsed: {e}")
+            return {"error": str(e)}
+
+    seasons = sorted(season_urls)
+    results = await asyncio.gather(*(parse(s, season_urls[s]) for s in seasons))
+    return dict(zip(seasons, results))
 
 
 async def get_dubbing_options(url: str, season: int = None) -> list[str]:
@@ -745,23 +853,19 @@ async def parse_season_page(url: str, dubbing: str, season: int = None) -> dict:
     Pass dubbing="" to retrieve only the dubbings list.
     For uafix.net series, pass season=N to filter episodes.
     """
-    loop = asyncio.get_running_loop()
     if _detect_site(url) == "uafix":
         if season is None:
             raise ValueError("season is required for uafix.net series")
-        return await loop.run_in_executor(
-            None, partial(_sync_parse_uafix_series_page, url, season, dubbing)
-        )
-    return await loop.run_in_executor(None, partial(_sync_parse_season_page, url, dubbing))
+        return await _parse_uafix_series_page(url, season, dubbing)
+    return await _parse_season_page(url, dubbing)
 
 
-async def get_m3u8_url(episode_url: str, dubbing: Optional[str] = None) -> str:
+async def get_m3u8_url(episode_url: str, dubbing: Optional[str] = None,
+                       content_type: str = "series") -> str:
     """Fetch the episode player page and extract the HLS m3u8 URL.
-    For uafix.net ashdi serial URLs, dubbing is required to pick the right stream."""
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(
-        None, partial(_sync_get_m3u8_url, episode_url, dubbing)
-    )
+    For uafix.net ashdi serial URLs, dubbing is required to pick the right stream.
+    content_type selects the resolution cap used when picking a variant."""
+    return await _get_m3u8_url(episode_url, dubbing, content_type)
 
 
 async def parse_movie_page(url: str) -> dict:
@@ -769,28 +873,22 @@ async def parse_movie_page(url: str) -> dict:
     Parse a movie/series page. Returns {title, title_en, year, imdb, poster_url, dubbings}.
     Routes to uafix or uakino implementation based on domain.
     """
-    loop = asyncio.get_running_loop()
     if _detect_site(url) == "uafix":
-        return await loop.run_in_executor(None, partial(_sync_parse_uafix_movie_page, url))
-    return await loop.run_in_executor(None, partial(_sync_parse_movie_page, url))
+        return await _parse_uafix_movie_page(url)
+    return await _parse_uakino_movie_page(url)
 
 
 async def download_poster(poster_url: str, output_path: str) -> bool:
     """Download poster image to output_path. Returns True on success."""
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(
-        None, partial(_sync_download_poster, poster_url, output_path)
-    )
+    return await _download_poster(poster_url, output_path)
 
 
-async def get_movie_m3u8(url: str, dubbing: str) -> str:
+async def get_movie_m3u8(url: str, dubbing: str, content_type: str = "movie") -> str:
     """
     Get m3u8 URL for the given dubbing from a movie page.
     For uafix.net, dubbing is ignored (single stream).
+    content_type selects the resolution cap used when picking a variant.
     """
-    loop = asyncio.get_running_loop()
     if _detect_site(url) == "uafix":
-        return await loop.run_in_executor(None, partial(_sync_get_uafix_movie_m3u8, url))
-    return await loop.run_in_executor(
-        None, partial(_sync_get_movie_m3u8, url, dubbing)
-    )
+        return await _get_uafix_movie_m3u8(url, content_type)
+    return await _get_uakino_movie_m3u8(url, dubbing, content_type)
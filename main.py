@@ -24,6 +24,8 @@ from bot.database.broadcasts import get_scheduled_broadcasts
 from bot.handlers.broadcast import send_broadcast_to_users
 from bot.database.scheduled_posts import get_due_scheduled_posts, mark_post_as_sent
 from bot.handlers.admin import _send_post_to_channel
+from bot.utils.http_client import close_sessions
+from bot.utils.download_loop import run_worker
 
 
 async def check_and_send_scheduled_posts(bot: Bot):
@@ -62,6 +64,11 @@ async def resume_unfinished_jobs(bot: Bot):
     from bot.database.auto_download_jobs import get_running_jobs, set_job_status
 
     running = await get_running_jobs()
+    if config.TASK_QUEUE:
+        # Задачі в черзі: воркери підхоплять їх самі (прострочені оренди теж)
+        if running:
+            logging.info(f"▶️ {len(running)} незакінчених завантажень продовжать воркери")
+        return
     for job in running:
         job_id = str(job["_id"])
         admin_id = job["admin_id"]
@@ -79,12 +86,18 @@ async def resume_unfinished_jobs(bot: Bot):
                 callback_data=f"ad_resume_cancel:{job_id}"
             ),
         ]]
+        if job.get("kind") == "movie":
+            done_stages = ", ".join(job.get("stages") or {}) or "—"
+            details = f"🎬 {title}\nГотові етапи: {done_stages}"
+        elif job.get("kind") == "whole_series":
+            details = f"📺 {title}, весь серіал\nПрогрес: {ep}/{total} серій"
+        else:
+            details = f"📺 {title}, сезон {job['season']}\nПрогрес: {ep}/{total} серій"
         try:
             await bot.send_message(
                 admin_id,
                 f"⚠️ Знайдено незакінчене завантаження:\n\n"
-                f"📺 {title}, сезон {job['season']}\n"
-                f"Прогрес: {ep}/{total} серій\n\n"
+                f"{details}\n\n"
                 f"Продовжити?",
                 reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons)
             )
@@ -230,6 +243,7 @@ async def main():
         BotCommand(command="autoAnimeMovie", description="Завантажити аніме-фільм з uakino.best"),
         BotCommand(command="autoAnimeDownload", description="Автозавантаження аніме-серіалу з uakino.best"),
         BotCommand(command="cancelAnimeDownload", description="Зупинити аніме-завантаження"),
+        BotCommand(command="mediaQueue", description="Черга обробки відео (ffmpeg)"),
     ]
     for admin_id in config.ADMIN_IDS:
         try:
@@ -239,11 +253,20 @@ async def main():
 
     logging.info("✅ Меню команд налаштовано")
 
+    # Бот сам теж виконує задачі черги завантажень (якщо увімкнена)
+    worker_task = None
+    if config.TASK_QUEUE and config.WORKER_SLOTS > 0:
+        worker_task = asyncio.create_task(run_worker(bot))
+
     try:
         logging.info("🤖 Бот запущено!")
         await dp.start_polling(bot)
     finally:
+        if worker_task:
+            worker_task.cancel()
+            await asyncio.gather(worker_task, return_exceptions=True)
         scheduler.shutdown()
+        await close_sessions()
         await db.close()
         await bot.session.close()
         local_api_proc.terminate()
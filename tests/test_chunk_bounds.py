@@ -0,0 +1,32 @@
+"""Keyframe-aligned chunk boundaries for parallel encoding."""
+
+from bot.utils import ffmpeg_runner
+from bot.utils.ffmpeg_runner import _chunk_bounds
+
+
+def test_chunks_start_on_keyframes_and_cover_the_file():
+    keyframes = [float(t) for t in range(0, 1200, 7)]
+
+    bounds = _chunk_bounds(keyframes, 1200.0, 4)
+
+    assert len(bounds) == 4
+    assert bounds[0][0] == 0.0 and bounds[-1][1] == 1200.0
+    for (_, end), (start, _) in zip(bounds, bounds[1:]):
+        assert end == start and start in keyframes
+
+
+def test_no_keyframes_means_one_chunk():
+    assert _chunk_bounds([], 1200.0, 4) == [(0.0, 1200.0)]
+
+
+def test_no_keyframe_after_a_target_skips_that_cut():
+    # Only one keyframe past the start: a single cut is possible
+    bounds = _chunk_bounds([0.0, 400.0], 1200.0, 4)
+
+    assert bounds == [(0.0, 400.0), (400.0, 1200.0)]
+
+
+def test_short_file_is_not_chunked():
+    duration = ffmpeg_runner._MIN_CHUNK_SECONDS * 1.5
+
+    assert _chunk_bounds([0.0, 30.0, 60.0], duration, 8) == [(0.0, duration)]
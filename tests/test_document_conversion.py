@@ -0,0 +1,122 @@
+"""Non-MP4 video documents are converted only on request, in the background."""
+
+import asyncio
+from types import SimpleNamespace
+
+from bot.config import config
+from bot.handlers import admin
+
+
+class FakeStatus:
+    def __init__(self):
+        self.texts = []
+
+    async def edit_text(self, text, **kwargs):
+        self.texts.append(text)
+
+
+class FakeMessage:
+    def __init__(self, document):
+        self.document = document
+        self.answers = []
+
+    async def answer(self, text, reply_markup=None, **kwargs):
+        self.answers.append((text, reply_markup))
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+        self.messages = []
+        self.status = FakeStatus()
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append(text)
+        return self.status
+
+    async def send_video(self, chat_id, **kwargs):
+        self.sent.append((chat_id, kwargs))
+        return SimpleNamespace(video=SimpleNamespace(file_id="converted", file_size=700, duration=0))
+
+
+def _document(mime_type):
+    return SimpleNamespace(file_id="doc", file_name="film.mkv", file_size=900, mime_type=mime_type)
+
+
+def test_conversion_is_offered_only_for_non_mp4_videos():
+    mkv = FakeMessage(_document("video/x-matroska"))
+    mp4 = FakeMessage(_document("video/mp4"))
+
+    asyncio.run(admin._offer_mp4_conversion(mkv, "m:movie"))
+    asyncio.run(admin._offer_mp4_conversion(mp4, "m:movie"))
+
+    _, markup = mkv.answers[0]
+    assert markup.inline_keyboard[0][0].callback_data == "conv_mp4:m:movie"
+    assert mp4.answers == []
+
+
+def test_background_conversion_replaces_the_document(monkeypatch, tmp_path):
+    movie = {"_id": "movie", "title": "Фільм", "video_file_id": "doc", "video_type": "document"}
+    replaced = []
+
+    async def fake_get_movie(movie_id):
+        return dict(movie)
+
+    async def fake_convert(bot, file_id, original_filename=None, progress_cb=None):
+        await progress_cb(50)
+        return str(tmp_path / "converted.mp4"), str(tmp_path)
+
+    async def fake_info(path):
+        return 5400, 1920, 1080
+
+    async def fake_replace(*args):
+        replaced.append(args)
+        return True
+
+    monkeypatch.setattr(admin, "get_movie_by_id", fake_get_movie)
+    monkeypatch.setattr(admin, "convert_video_to_mp4", fake_convert)
+    monkeypatch.setattr(admin, "get_video_info", fake_info)
+    monkeypatch.setattr(admin, "upload_input", lambda bot, path: path)
+    monkeypatch.setattr(admin, "replace_movie_video", fake_replace)
+    bot = FakeBot()
+
+    asyncio.run(admin._convert_document_to_mp4(bot, 1, "m:movie"))
+
+    chat_id, kwargs = bot.sent[0]
+    assert chat_id == config.STORAGE_CHANNEL_ID
+    assert kwargs["height"] == 1080
+    assert replaced == [("movie", "converted", "video", 700, 5400)]
+    assert bot.status.texts[0] == "⚙️ Конвертую в MP4: Фільм — 50%"
+    assert bot.status.texts[-1] == "✅ Фільм: сконвертовано в MP4 і замінено у базі."
+
+
+def test_callback_returns_before_the_conversion_finishes(monkeypatch):
+    started = []
+    release = None
+
+    async def slow_convert(bot, admin_id, target):
+        started.append(target)
+        await release.wait()
+
+    class FakeCallback:
+        data = "conv_mp4:m:movie"
+        from_user = SimpleNamespace(id=1)
+        message = FakeStatus()
+
+        async def answer(self, *args, **kwargs):
+            pass
+
+    monkeypatch.setattr(admin, "_convert_document_to_mp4", slow_convert)
+    monkeypatch.setattr(admin, "is_admin", lambda user_id: True)
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        await admin.process_convert_to_mp4(FakeCallback(), None)
+        await asyncio.sleep(0)
+        assert started == ["m:movie"]
+        assert len(admin._conversion_tasks) == 1
+        release.set()
+        await asyncio.gather(*admin._conversion_tasks)
+
+    asyncio.run(main())
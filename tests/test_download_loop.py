@@ -0,0 +1,123 @@
+"""A job that gets episodes merged in keeps one live progress message."""
+
+import asyncio
+
+from bot.utils import download_loop
+
+
+class FakeReporter:
+    instances = []
+
+    def __init__(self, bot, chat_id, title, total=0, already=0):
+        self.title = title
+        self.total = total
+        self.notes = []
+        self.finished = []
+        FakeReporter.instances.append(self)
+
+    async def start(self):
+        pass
+
+    def note(self, text):
+        self.notes.append(text)
+
+    async def finish(self, headline, reply_markup=None):
+        self.finished.append(headline)
+
+    def close(self):
+        pass
+
+
+def test_merged_episodes_reuse_the_reporter(monkeypatch):
+    job = {
+        "_id": "job", "admin_id": 1, "series_id": "s", "series_title": "Серіал",
+        "season": 1, "total_episodes": 2, "current_episode": 0,
+    }
+    passes = []
+
+    async def fake_get_job(job_id):
+        return dict(job)
+
+    async def fake_check_disk(min_gb=1.0):
+        return True
+
+    async def fake_run_pass(bot, job_id, pass_job, reporter, skipped_eps):
+        passes.append(reporter)
+        if len(passes) == 1:
+            # create_job merged two more episodes while the pass was ending
+            reporter.total = 4
+            reporter.note("Додано ще 2 серій")
+            return None
+        return "🎉 Готово!", None
+
+    FakeReporter.instances.clear()
+    monkeypatch.setattr(download_loop, "ProgressReporter", FakeReporter)
+    monkeypatch.setattr(download_loop, "get_job", fake_get_job)
+    monkeypatch.setattr(download_loop, "_check_disk", fake_check_disk)
+    monkeypatch.setattr(download_loop, "_run_pass", fake_run_pass)
+
+    asyncio.run(download_loop._run_loop(None, "job"))
+
+    assert len(FakeReporter.instances) == 1
+    reporter = FakeReporter.instances[0]
+    assert passes == [reporter, reporter]
+    assert reporter.finished == ["🎉 Готово!"]
+    assert reporter.total == 4
+
+
+def test_worker_slot_survives_bookkeeping_errors(monkeypatch):
+    tasks = [{"_id": 1, "job_id": "job"}, {"_id": 2, "job_id": "job"}]
+    ran = []
+
+    async def fake_claim(worker_id, lease_seconds):
+        if not tasks:
+            raise asyncio.CancelledError
+        return tasks.pop(0)
+
+    async def fake_run_task(bot, worker_id, task):
+        ran.append(task["_id"])
+        if task["_id"] == 1:
+            raise RuntimeError("mongo is down")
+
+    monkeypatch.setattr(download_loop, "claim_task", fake_claim)
+    monkeypatch.setattr(download_loop, "_run_task", fake_run_task)
+    monkeypatch.setattr(download_loop, "_IDLE_POLL", 0)
+
+    try:
+        asyncio.run(download_loop._worker_slot(None, "worker"))
+    except asyncio.CancelledError:
+        pass
+
+    assert ran == [1, 2]
+
+
+def test_crashed_pass_marks_the_job_failed(monkeypatch):
+    job = {
+        "_id": "job", "admin_id": 1, "series_id": "s", "series_title": "Серіал",
+        "season": 1, "total_episodes": 2, "current_episode": 0,
+    }
+    statuses = []
+
+    async def fake_get_job(job_id):
+        return dict(job)
+
+    async def fake_check_disk(min_gb=1.0):
+        return True
+
+    async def fake_set_status(job_id, status):
+        statuses.append(status)
+
+    async def crashing_pass(bot, job_id, pass_job, reporter, skipped_eps):
+        raise RuntimeError("producer crashed")
+
+    FakeReporter.instances.clear()
+    monkeypatch.setattr(download_loop, "ProgressReporter", FakeReporter)
+    monkeypatch.setattr(download_loop, "get_job", fake_get_job)
+    monkeypatch.setattr(download_loop, "_check_disk", fake_check_disk)
+    monkeypatch.setattr(download_loop, "set_job_status", fake_set_status)
+    monkeypatch.setattr(download_loop, "_run_pass", crashing_pass)
+
+    asyncio.run(download_loop._run_loop(None, "job"))
+
+    assert statuses == ["error"]
+    assert FakeReporter.instances[0].finished == ["❌ Завантаження перервано: producer crashed"]
@@ -0,0 +1,75 @@
+"""Replacing a movie's video from the admin edit menu."""
+
+import asyncio
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+import bot.database.movies as movies
+from bot.config import config
+from bot.handlers import admin
+
+
+class FakeVideos:
+    """Just enough of a Motor collection for update_one with $set/$unset."""
+
+    def __init__(self, doc: dict):
+        self.doc = doc
+
+    async def update_one(self, query, update):
+        if query["_id"] != self.doc["_id"]:
+            return SimpleNamespace(matched_count=0, modified_count=0)
+        self.doc.update(update.get("$set", {}))
+        for field in update.get("$unset", {}):
+            self.doc.pop(field, None)
+        return SimpleNamespace(matched_count=1, modified_count=1)
+
+
+class FakeState:
+    def __init__(self, data: dict):
+        self.data = data
+        self.cleared = False
+
+    async def get_data(self):
+        return self.data
+
+    async def clear(self):
+        self.cleared = True
+
+
+class FakeMessage:
+    def __init__(self, video):
+        self.video = video
+        self.document = None
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+def test_replacing_split_movie_video_drops_old_parts(monkeypatch):
+    movie_id = ObjectId()
+    doc = {
+        "_id": movie_id,
+        "video_file_id": "old-part-1",
+        "video_type": "video",
+        "file_size": 3_800_000_000,
+        "duration": 7200,
+        "video_parts": [
+            {"video_file_id": "old-part-1", "file_size": 1_900_000_000, "duration": 3600},
+            {"video_file_id": "old-part-2", "file_size": 1_900_000_000, "duration": 3600},
+        ],
+    }
+    monkeypatch.setattr(movies, "db", SimpleNamespace(videos=FakeVideos(doc)))
+    monkeypatch.setattr(admin, "get_forwarded_chat_id", lambda message: config.STORAGE_CHANNEL_ID)
+
+    message = FakeMessage(SimpleNamespace(file_id="new-video", file_size=1_500_000_000, duration=7100))
+    state = FakeState({"edit_content_id": str(movie_id)})
+    asyncio.run(admin.process_edit_video(message, state))
+
+    assert "video_parts" not in doc
+    assert doc["video_file_id"] == "new-video"
+    assert doc["file_size"] == 1_500_000_000
+    assert doc["duration"] == 7100
+    assert message.answers == ["✅ Відео успішно замінено!"]
+    assert state.cleared
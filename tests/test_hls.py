@@ -0,0 +1,90 @@
+"""HLS variant policy and playlist parsing."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bot.utils import hls
+
+MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=8000000,AVERAGE-BANDWIDTH=7000000,RESOLUTION=1920x1080
+1080.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=3000000,RESOLUTION=1280x720
+720.m3u8
+"""
+
+# One hour: 1080p is predicted at ~3.2 GB, 720p at ~1.4 GB
+MEDIA = "#EXTM3U\n#EXT-X-TARGETDURATION:3600\n#EXTINF:3600.0,\nseg0.ts\n"
+
+
+def test_download_hls_resolves_a_master_playlist_with_the_size_policy(monkeypatch):
+    fetched = []
+
+    async def fake_fetch(url, **kwargs):
+        fetched.append(url)
+        return SimpleNamespace(text=MASTER if url.endswith("master.m3u8") else MEDIA)
+
+    monkeypatch.setattr(hls, "fetch", fake_fetch)
+
+    # The chosen media playlist has no #EXT-X-ENDLIST, so the download stops there
+    with pytest.raises(hls.UnsupportedPlaylist):
+        asyncio.run(hls.download_hls("https://cdn/master.m3u8", "/nonexistent", 1_980_000_000))
+
+    assert fetched[-1] == "https://cdn/720.m3u8"
+
+
+def _variant(bandwidth, height, average=0):
+    return {"url": f"{height}.m3u8", "bandwidth": bandwidth,
+            "average_bandwidth": average, "width": 0, "height": height}
+
+
+def test_missing_average_bandwidth_falls_back_to_bandwidth():
+    variants = hls.parse_master_playlist(MASTER, "https://cdn/master.m3u8")
+
+    assert variants[1]["average_bandwidth"] == 0
+    assert hls.predict_size(variants[1], 8) == int(3_000_000 * 1.03)
+    assert hls.predict_size(variants[0], 8) == int(7_000_000 * 1.03)
+
+
+def test_select_variant_prefers_the_best_that_fits():
+    variants = [_variant(8_000_000, 1080), _variant(3_000_000, 720), _variant(1_000_000, 480)]
+
+    assert hls.select_variant(variants, 3600, 1_980_000_000)["height"] == 720
+    # Unknown duration: size is not considered
+    assert hls.select_variant(variants, 0, 1_980_000_000)["height"] == 1080
+    # Nothing fits: the best within the cap, the oversize path handles it
+    assert hls.select_variant(variants, 3600, 1_000, max_height=720)["height"] == 720
+    # Cap below every variant: the smallest one
+    assert hls.select_variant(variants, 3600, 1_980_000_000, max_height=360)["height"] == 480
+
+
+def test_parse_media_playlist_handles_keys_byteranges_and_discontinuities():
+    text = """#EXTM3U
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:3
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin",IV=0x01
+#EXTINF:6.0,
+#EXT-X-BYTERANGE:1000@0
+media.ts
+#EXT-X-DISCONTINUITY
+#EXTINF:4.5,
+#EXT-X-BYTERANGE:500
+media.ts
+#EXT-X-ENDLIST
+"""
+    playlist = hls.parse_media_playlist(text, "https://cdn/hls/index.m3u8")
+
+    assert playlist["ended"] and playlist["media_sequence"] == 3
+    first, second = playlist["segments"]
+    assert first["key"] == {"url": "https://cdn/hls/key.bin", "iv": "0x01"}
+    assert first["byterange"] == (1000, 0) and second["byterange"] == (500, 1000)
+    assert not first["discontinuity"] and second["discontinuity"]
+    assert second["duration"] == 4.5
+
+
+def test_parse_media_playlist_rejects_sample_aes():
+    text = '#EXTM3U\n#EXT-X-KEY:METHOD=SAMPLE-AES,URI="k"\n#EXTINF:6.0,\nseg.ts\n'
+
+    with pytest.raises(hls.UnsupportedPlaylist):
+        hls.parse_media_playlist(text, "https://cdn/index.m3u8")
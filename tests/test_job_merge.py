@@ -0,0 +1,145 @@
+"""Repeat download requests are merged into the active job."""
+
+import asyncio
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+import bot.database.auto_download_jobs as jobs
+from bot.config import config
+from bot.utils import download_loop
+
+
+class FakeJobs:
+    """Just enough of a Motor collection for the merge: equality and $exists filters."""
+
+    def __init__(self, docs: list[dict]):
+        self.docs = docs
+
+    def _matches(self, doc, query):
+        for key, value in query.items():
+            if isinstance(value, dict) and "$exists" in value:
+                if (key in doc) != value["$exists"]:
+                    return False
+            elif doc.get(key) != value:
+                return False
+        return True
+
+    def find(self, query):
+        found = [dict(doc) for doc in self.docs if self._matches(doc, query)]
+
+        async def to_list(length=None):
+            return found
+
+        return SimpleNamespace(to_list=to_list)
+
+    async def insert_one(self, doc):
+        doc = dict(doc, _id=ObjectId())
+        self.docs.append(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def update_one(self, query, update):
+        doc = next((doc for doc in self.docs if self._matches(doc, query)), None)
+        if doc is None:
+            return SimpleNamespace(matched_count=0, modified_count=0)
+        doc.update(update.get("$set", {}))
+        for field, value in update.get("$push", {}).items():
+            doc[field] = doc[field] + value["$each"]
+        for field, value in update.get("$inc", {}).items():
+            doc[field] += value
+        return SimpleNamespace(matched_count=1, modified_count=1)
+
+
+def _season_job(status: str) -> dict:
+    fingerprint = jobs.job_fingerprint("s", 1, "dub")
+    return {
+        "_id": ObjectId(), "series_id": "s", "series_title": "Серіал", "season": 1,
+        "dubbing": "dub", "episode_urls": ["u1", "u2"], "episode_numbers": [1, 2],
+        "total_episodes": 2, "current_episode": 1, "status": status, "admin_id": 1,
+        "content_type": "series", "fingerprint": fingerprint, "active_fingerprint": fingerprint,
+    }
+
+
+def test_merge_keeps_a_paused_job_paused(monkeypatch):
+    job = _season_job("paused")
+    monkeypatch.setattr(jobs, "db", SimpleNamespace(auto_download_jobs=FakeJobs([job])))
+
+    job_id, merged = asyncio.run(jobs.create_job("s", "Серіал", 1, "dub", ["u2", "u3"], 1,
+                                                 episode_numbers=[2, 3]))
+
+    assert (job_id, merged) == (str(job["_id"]), True)
+    assert job["status"] == "paused"
+    assert job["episode_numbers"] == [1, 2, 3]
+    assert job["total_episodes"] == 3
+
+
+def test_season_request_merges_into_a_whole_series_job(monkeypatch):
+    fingerprint = jobs.job_fingerprint("s", 0, "dub")
+    whole = {
+        "_id": ObjectId(), "kind": "whole_series", "series_id": "s", "season": 0,
+        "dubbing": "dub", "episode_urls": ["a1", "a2", "b1"], "episode_numbers": [1, 2, 1],
+        "episode_seasons": [1, 1, 2], "total_episodes": 3, "status": "running",
+        "fingerprint": fingerprint, "active_fingerprint": fingerprint,
+    }
+    collection = FakeJobs([whole])
+    monkeypatch.setattr(jobs, "db", SimpleNamespace(auto_download_jobs=collection))
+
+    known = asyncio.run(jobs.create_job("s", "Серіал", 1, "dub", ["a2"], 1, episode_numbers=[2]))
+    merged = asyncio.run(jobs.create_job("s", "Серіал", 2, "dub", ["b1", "b2"], 1,
+                                         episode_numbers=[1, 2]))
+
+    assert known == merged == (str(whole["_id"]), True)
+    assert len(collection.docs) == 1
+    assert whole["episode_seasons"] == [1, 1, 2, 2]
+    assert whole["episode_numbers"] == [1, 2, 1, 2]
+
+
+def test_whole_series_request_leaves_out_an_active_season(monkeypatch):
+    season_job = _season_job("running")
+    collection = FakeJobs([season_job])
+    monkeypatch.setattr(jobs, "db", SimpleNamespace(auto_download_jobs=collection))
+
+    job_id, merged = asyncio.run(jobs.create_job(
+        "s", "Серіал", 0, "dub", ["u1", "u2", "v1"], 1,
+        episode_numbers=[1, 2, 1], episode_seasons=[1, 1, 2],
+    ))
+
+    new_job = collection.docs[1]
+    assert (job_id, merged) == (str(new_job["_id"]), False)
+    assert new_job["kind"] == "whole_series"
+    assert new_job["episode_urls"] == ["v1"]
+    assert new_job["episode_seasons"] == [2]
+    assert new_job["total_episodes"] == 1
+    assert season_job["total_episodes"] == 2
+
+
+def test_start_job_resumes_a_paused_job_and_queues_its_tasks(monkeypatch):
+    job = _season_job("paused")
+    calls = []
+
+    async def fake_get_job(job_id):
+        return dict(job)
+
+    async def fake_set_status(job_id, status):
+        calls.append(("status", status))
+
+    async def fake_enqueue(queued_job):
+        calls.append(("enqueue", queued_job["_id"]))
+
+    monkeypatch.setattr(config, "TASK_QUEUE", True)
+    monkeypatch.setattr(download_loop, "get_job", fake_get_job)
+    monkeypatch.setattr(download_loop, "set_job_status", fake_set_status)
+    monkeypatch.setattr(download_loop, "enqueue_job_tasks", fake_enqueue)
+
+    asyncio.run(download_loop.start_job(None, str(job["_id"])))
+
+    assert calls == [("status", "running"), ("enqueue", job["_id"])]
+
+
+def test_job_summary_names_the_job():
+    whole = {"series_title": "Серіал", "season": 0, "episode_seasons": [1, 1, 2, 3]}
+    movie = {"kind": "movie", "series_title": "Фільм", "season": 0}
+
+    assert download_loop.job_summary(_season_job("running")) == "«Серіал» (сезон 1)"
+    assert download_loop.job_summary(whole) == "«Серіал» (сезони 1-3)"
+    assert download_loop.job_summary(movie) == "фільм «Фільм»"
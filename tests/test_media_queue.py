@@ -0,0 +1,30 @@
+"""/mediaQueue shows job titles safely in an HTML message."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from bot.handlers import auto_download
+
+
+class FakeMessage:
+    def __init__(self):
+        self.from_user = SimpleNamespace(id=1)
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+def test_titles_are_html_escaped(monkeypatch):
+    entry = {"kind": "remux", "label": "Tom & Jerry <3", "state": "running",
+             "started_at": time.monotonic(), "queued_at": time.monotonic(), "reason": None}
+    pool = SimpleNamespace(snapshot=lambda: [entry], limits={"remux": 2, "encode": 1})
+    monkeypatch.setattr(auto_download, "media_pool", pool)
+    monkeypatch.setattr(auto_download, "is_admin", lambda user_id: True)
+    message = FakeMessage()
+
+    asyncio.run(auto_download.cmd_media_queue(message))
+
+    assert "Tom &amp; Jerry &lt;3" in message.answers[0]
+    assert "<3" not in message.answers[0]
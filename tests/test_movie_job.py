@@ -0,0 +1,105 @@
+"""Movie jobs checkpoint download and compression as separate stages."""
+
+import asyncio
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+import bot.utils.movie_job as movie_job
+from bot.config import config
+
+
+class FakeReporter:
+    def __init__(self):
+        self.notes = []
+
+    def set_stage(self, key, text):
+        pass
+
+    def note(self, text):
+        self.notes.append(text)
+
+    def item_added(self, size=0):
+        pass
+
+
+class FakeBot:
+    async def send_video(self, *args, **kwargs):
+        return SimpleNamespace(video=SimpleNamespace(file_id="video", file_size=3))
+
+
+def _run(monkeypatch, tmp_path, stages: dict, compress_fails: bool = False):
+    job_id = ObjectId()
+    job = {
+        "_id": job_id, "admin_id": 1, "content_type": "movie", "episode_urls": ["url"],
+        "dubbing": "dub", "stages": stages,
+        "movie": {"title": "Фільм", "title_en": "Film", "year": 2020, "imdb": 7.0},
+    }
+    video_path = str(tmp_path / "movie.mp4")
+    calls = []
+
+    async def fake_set_stage(job_id, stage, value):
+        calls.append(("stage", stage))
+
+    async def fake_m3u8(*args, **kwargs):
+        return "m3u8"
+
+    async def fake_run_ffmpeg(url, output_path, **kwargs):
+        calls.append(("download", kwargs["oversize_mode"]))
+        with open(output_path, "w") as f:
+            f.write("video")
+        return False
+
+    async def fake_compress(path, progress_cb=None, label=None):
+        calls.append(("compress", path))
+        if compress_fails:
+            raise RuntimeError("encode failed")
+        return True
+
+    async def fake_split(path):
+        return [path]
+
+    async def fake_probe(path, thumb_path):
+        return {"width": 1920, "height": 1080, "duration": 10, "has_thumb": False, "size": 5}
+
+    async def fake_create(**kwargs):
+        return {"_id": "movie-id"}
+
+    monkeypatch.setattr(config, "OVERSIZE_MODE", "compress")
+    monkeypatch.setattr(movie_job, "_video_path", lambda job_id: video_path)
+    monkeypatch.setattr(movie_job, "set_job_stage", fake_set_stage)
+    monkeypatch.setattr(movie_job, "get_movie_m3u8", fake_m3u8)
+    monkeypatch.setattr(movie_job, "run_ffmpeg", fake_run_ffmpeg)
+    monkeypatch.setattr(movie_job, "compress_to_limit", fake_compress)
+    monkeypatch.setattr(movie_job, "split_to_limit", fake_split)
+    monkeypatch.setattr(movie_job, "probe_media", fake_probe)
+    monkeypatch.setattr(movie_job, "upload_input", lambda bot, path: path)
+    monkeypatch.setitem(movie_job._CONTENT["movie"], "create", fake_create)
+    return job, video_path, calls
+
+
+def test_download_is_checkpointed_before_compression(monkeypatch, tmp_path):
+    job, video_path, calls = _run(monkeypatch, tmp_path, {"poster": {"file_id": None}},
+                                  compress_fails=True)
+
+    try:
+        asyncio.run(movie_job._run_stages(FakeBot(), job, FakeReporter()))
+    except RuntimeError:
+        pass
+
+    assert calls == [("download", "split"), ("stage", "downloaded"), ("compress", video_path)]
+
+
+def test_resume_after_download_only_compresses(monkeypatch, tmp_path):
+    job, video_path, calls = _run(monkeypatch, tmp_path, {"poster": {"file_id": None},
+                                                          "downloaded": {"size": 5}})
+    with open(video_path, "w") as f:
+        f.write("video")
+    reporter = FakeReporter()
+
+    movie_id, _ = asyncio.run(movie_job._run_stages(FakeBot(), job, reporter))
+
+    assert movie_id == "movie-id"
+    assert ("download", "split") not in calls
+    assert calls[:2] == [("compress", video_path), ("stage", "compressed")]
+    assert reporter.notes == ["Файл перевищував 1.9 ГБ — перекодовано для Telegram"]
@@ -0,0 +1,28 @@
+"""429 handling of the per-host rate limiter."""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from bot.utils import rate_limiter
+from bot.utils.rate_limiter import HostRateLimiter, parse_retry_after
+
+
+def test_long_retry_after_is_capped():
+    limiter = HostRateLimiter(2.0, 4)
+
+    assert limiter.on_rate_limited(3600) == rate_limiter._MAX_BACKOFF
+
+
+def test_far_future_http_date_is_capped():
+    when = datetime.now(timezone.utc) + timedelta(days=1)
+    limiter = HostRateLimiter(2.0, 4)
+
+    assert limiter.on_rate_limited(parse_retry_after(format_datetime(when, usegmt=True))) \
+        == rate_limiter._MAX_BACKOFF
+
+
+def test_short_retry_after_and_backoff_are_kept():
+    limiter = HostRateLimiter(2.0, 4)
+
+    assert limiter.on_rate_limited(5) == 5
+    assert limiter.on_rate_limited(None) == rate_limiter._BASE_BACKOFF * 2
@@ -0,0 +1,21 @@
+"""The ashdi serial cache keeps only fresh trees."""
+
+import asyncio
+
+from bot.utils import scraper
+
+
+def test_expired_trees_and_idle_locks_are_pruned(monkeypatch):
+    now = 10_000.0
+    cache = {
+        "old": (now - scraper._ASHDI_SERIAL_TTL - 1, ["old tree"]),
+        "fresh": (now - 1, ["fresh tree"]),
+    }
+    locks = {"old": asyncio.Lock(), "fresh": asyncio.Lock(), "gone": asyncio.Lock()}
+    monkeypatch.setattr(scraper, "_ashdi_serial_cache", cache)
+    monkeypatch.setattr(scraper, "_ashdi_serial_locks", locks)
+
+    scraper._prune_ashdi_serial_cache(now)
+
+    assert list(cache) == ["fresh"]
+    assert list(locks) == ["fresh"]
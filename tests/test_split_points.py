@@ -0,0 +1,29 @@
+"""Lossless split points for movies over the Telegram limit."""
+
+import pytest
+
+from bot.utils.ffmpeg_runner import _split_points
+
+
+def test_parts_start_on_keyframes_within_budget():
+    # (time, byte offset): a keyframe every 10 s / 100 bytes
+    keyframes = [(t * 10.0, t * 100) for t in range(10)]
+
+    starts = _split_points(keyframes, 1000, 350)
+
+    assert starts == [0.0, 30.0, 60.0, 90.0]
+
+
+def test_file_within_budget_is_one_part():
+    assert _split_points([(0.0, 0), (10.0, 100)], 300, 350) == [0.0]
+
+
+def test_no_keyframes_cannot_be_split():
+    with pytest.raises(RuntimeError):
+        _split_points([], 1000, 350)
+
+
+def test_single_gop_over_the_budget_cannot_be_split():
+    # The only keyframe after the start lies beyond the budget
+    with pytest.raises(RuntimeError, match="single GOP"):
+        _split_points([(0.0, 0), (50.0, 500)], 1000, 350)
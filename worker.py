@@ -0,0 +1,57 @@
+"""
+Окремий воркер черги завантажень (TASK_QUEUE=1).
+
+Бере задачі-серії з MongoDB і виконує їх: завантаження, ffmpeg, вивантаження
+в канал зберігання. Воркерів можна запускати скільки завгодно — на цій чи
+інших машинах, з тією ж базою. На іншій машині потрібен свій Bot API сервер
+(WORKER_BOT_API_URL); якщо він запущений без --local, задайте
+WORKER_BOT_API_LOCAL=0 — тоді файли вивантажуються через multipart.
+"""
+
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+
+from bot.config import config
+from bot.database import db
+from bot.utils.download_loop import run_worker
+from bot.utils.http_client import close_sessions
+
+
+async def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    config.validate()
+    if not config.TASK_QUEUE:
+        logging.warning("TASK_QUEUE вимкнено — бот не ставить задачі в чергу")
+
+    session = AiohttpSession(
+        api=TelegramAPIServer.from_base(
+            config.WORKER_BOT_API_URL, is_local=config.WORKER_BOT_API_LOCAL
+        ),
+        timeout=7200,
+    )
+    bot = Bot(
+        token=config.BOT_TOKEN,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+    await db.connect()
+    try:
+        logging.info("🛠 Воркер завантажень запущено")
+        await run_worker(bot, max(1, config.WORKER_SLOTS))
+    finally:
+        await close_sessions()
+        await db.close()
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())